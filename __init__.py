@@ -1,9 +1,22 @@
 """Full mock of the builtin 'os' module for blazing-fast unit-testing."""
 # pylint: disable=import-self
 from fakeos import FakeOS
+from asyncfakeos import AsyncFakeOS, AsyncFakeFile, InlineExecutor
 from filesystem import (FakeFilesystem, FakeDirectory, FakeFile,
-                        FakeFilesystemWithPermissions)
+                        FakeFilesystemWithPermissions, FakeFilesystemWithLocks,
+                        FakeFilesystemWithCosts)
 from environment import FakeEnvironment
+from direntry import FakeDirEntry
+from blobs import BlobStore
+from cache import cached
+from contents import FakeContents
+from costs import CostModel, VirtualClock
+from fileio import FakeFileIO
+from image import FakeImage
+from inodes import InodeTable
+from locks import ReadWriteLock
+from resolver import PathResolver
+from stats import CallStats, OperationStats
 from device import FakeDevice
 from fakeuser import FakeUser, Root
 from operating_system import FakeUnix, FakeWindows
@@ -0,0 +1,239 @@
+"""Awaitable mock of the builtin 'os' module, for testing asyncio code."""
+import asyncio
+import random
+import typing
+from concurrent.futures import Executor, Future
+
+from fakeos import FakeOS
+
+
+class InlineExecutor(Executor):
+    """I run whatever is submitted to me right away, in the calling thread.
+
+    Passing me to 'loop.run_in_executor' runs the call inline, so code
+    handing FakeOS calls to an executor needs no thread pool.
+    """
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+
+        except BaseException as error:  # pylint: disable=broad-except
+            future.set_exception(error)
+
+        return future
+
+
+class AsyncFakeFile(object):
+    """I am an open fake file with awaitable methods, like an aiofiles file.
+
+    Attributes:
+        file: the open FakeOS file I await.
+    """
+    def __init__(self, file, pause: typing.Callable):
+        self.file = file
+        self._pause = pause
+
+    @property
+    def name(self) -> str:
+        """Return the path the file was opened with."""
+        return self.file.name
+
+    @property
+    def closed(self) -> bool:
+        """Return whether or not the file is closed."""
+        return self.file.closed
+
+    async def read(self, size: int = -1):
+        """Read and return at most size bytes or characters, or everything
+        up to the end of the file."""
+        await self._pause()
+        return self.file.read(size)
+
+    async def readline(self, size: int = -1):
+        """Read and return a line."""
+        await self._pause()
+        return self.file.readline(size)
+
+    async def readlines(self) -> list:
+        """Read and return every line left."""
+        await self._pause()
+        return self.file.readlines()
+
+    async def write(self, data) -> int:
+        """Write data and return how much of it was written."""
+        await self._pause()
+        return self.file.write(data)
+
+    async def writelines(self, lines: typing.Iterable):
+        """Write every line."""
+        await self._pause()
+        self.file.writelines(lines)
+
+    async def seek(self, offset: int, whence: int = 0) -> int:
+        """Move to offset and return the new position."""
+        await self._pause()
+        return self.file.seek(offset, whence)
+
+    async def tell(self) -> int:
+        """Return the current position."""
+        await self._pause()
+        return self.file.tell()
+
+    async def truncate(self, size: int = None) -> int:
+        """Truncate the file to size, or to the current position."""
+        await self._pause()
+        return self.file.truncate(size)
+
+    async def flush(self):
+        """Flush what was written to the file."""
+        await self._pause()
+        self.file.flush()
+
+    async def close(self):
+        """Close the file."""
+        await self._pause()
+        self.file.close()
+
+    async def __aenter__(self) -> 'AsyncFakeFile':
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    def __aiter__(self) -> 'AsyncFakeFile':
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+
+        return line
+
+
+class _AsyncOpening(object):
+    """I am an opening of a file, which can be awaited or used as an
+    asynchronous context manager, as the result of 'aiofiles.open' can."""
+    def __init__(self, opening: typing.Awaitable[AsyncFakeFile]):
+        self._opening = opening
+        self._file = None
+
+    def __await__(self):
+        return self._opening.__await__()
+
+    async def __aenter__(self) -> AsyncFakeFile:
+        self._file = await self._opening
+        return self._file
+
+    async def __aexit__(self, *_):
+        await self._file.close()
+
+
+class AsyncFakeOS(object):
+    """I mock the 'os' module for asyncio code, running every call inline on
+    the event loop instead of in a thread.
+
+    Every call first lets the other coroutines run, and then runs on my
+    FakeOS at once, so calls never overlap and thousands of coroutines can
+    share one fake filesystem. Without a seed, every call lets the others
+    run exactly once, so coroutines take turns in the order the event loop
+    runs them. With a seed, how many times is drawn from a generator seeded
+    with it, so a seed picks one interleaving and always replays it.
+
+    Attributes:
+        os (FakeOS): the fake os every call runs on.
+        executor (InlineExecutor): for 'loop.run_in_executor'.
+        MAX_PAUSES (int): the most times a seeded call lets others run.
+    """
+    MAX_PAUSES = 3
+
+    def __init__(self, os: FakeOS = None, seed: int = None):
+        self.os = os or FakeOS()
+        self.executor = InlineExecutor()
+        self._random = random.Random(seed) if seed is not None else None
+
+    async def _pause(self):
+        """Let the other coroutines run before a call."""
+        pauses = (self._random.randint(0, self.MAX_PAUSES)
+                  if self._random is not None else 1)
+        for _ in range(pauses):
+            await asyncio.sleep(0)
+
+    async def _call(self, method: typing.Callable, *args, **kwargs):
+        await self._pause()
+        return method(*args, **kwargs)
+
+    async def mkdir(self, path: str, mode: int = 0o777):
+        """Create a directory, as FakeOS.mkdir does."""
+        return await self._call(self.os.mkdir, path, mode=mode)
+
+    async def makedirs(self, name: str, mode: int = 0o777,
+                       exist_ok: bool = False):
+        """Create a directory and its parents, as FakeOS.makedirs does."""
+        return await self._call(self.os.makedirs, name, mode=mode,
+                                exist_ok=exist_ok)
+
+    async def listdir(self, path: str) -> list:
+        """List a directory, as FakeOS.listdir does."""
+        return await self._call(self.os.listdir, path)
+
+    async def scandir(self, path: str = ".") -> list:
+        """Scan a directory, as FakeOS.scandir does, returning every entry
+        at once."""
+        return await self._call(lambda: list(self.os.scandir(path)))
+
+    async def stat(self, path: str):
+        """Get the status of a file, as FakeOS.stat does."""
+        return await self._call(self.os.stat, path)
+
+    async def lstat(self, path: str):
+        """Get the status of a file, as FakeOS.lstat does."""
+        return await self._call(self.os.lstat, path)
+
+    async def access(self, path: str, mode: int,
+                     effective_ids: bool = False) -> bool:
+        """Test access to a file, as FakeOS.access does."""
+        return await self._call(self.os.access, path, mode,
+                                effective_ids=effective_ids)
+
+    async def rename(self, src: str, dst: str):
+        """Rename a file or a directory, as FakeOS.rename does."""
+        return await self._call(self.os.rename, src, dst)
+
+    async def remove(self, path: str):
+        """Remove a file, as FakeOS.remove does."""
+        return await self._call(self.os.remove, path)
+
+    async def unlink(self, path: str):
+        """Remove a file, as FakeOS.unlink does."""
+        return await self._call(self.os.unlink, path)
+
+    async def rmdir(self, path: str):
+        """Remove a directory, as FakeOS.rmdir does."""
+        return await self._call(self.os.rmdir, path)
+
+    async def chmod(self, path: str, mode: int):
+        """Change the mode of a file, as FakeOS.chmod does."""
+        return await self._call(self.os.chmod, path, mode)
+
+    async def chown(self, path: str, uid: int = -1, gid: int = -1):
+        """Change the owner of a file, as FakeOS.chown does."""
+        return await self._call(self.os.chown, path, uid, gid)
+
+    async def truncate(self, path: str, length: int):
+        """Truncate a file, as FakeOS.truncate does."""
+        return await self._call(self.os.truncate, path, length)
+
+    def open(self, path: str, mode: str = "r",
+             encoding: str = None) -> _AsyncOpening:
+        """Open a file, as FakeOS.open does, returning an AsyncFakeFile.
+
+        Both 'await fake.open(path)' and 'async with fake.open(path)' work,
+        as they do with aiofiles."""
+        async def opening() -> AsyncFakeFile:
+            file = await self._call(self.os.open, path, mode,
+                                    encoding=encoding)
+            return AsyncFakeFile(file, self._pause)
+
+        return _AsyncOpening(opening())
@@ -0,0 +1,353 @@
+"""Benchmarks of how the calls to a fake os scale with the size of the tree.
+
+Running 'python benchmarks.py run -o results.json' times every benchmarked
+call on trees of every size and shape, and writes the results as JSON.
+Running 'python benchmarks.py compare old.json new.json' compares two such
+files, for example from two commits, and fails if a call got slower or
+scales worse."""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import typing
+from pathlib import Path
+from time import perf_counter_ns
+
+from fakeos import FakeOS
+from filesystem import FakeFilesystem, FakeFilesystemWithPermissions
+
+SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+
+# How many directories each directory holds, by shape; a flat tree holds
+# everything in its root, and a chain holds one directory in each.
+SHAPES = {"flat": None, "wide": 100, "balanced": 10, "deep": 2, "chain": 1}
+
+# The deepest a chain goes; the directories that do not fit in it are in the
+# root, so a chain is as deep at every size from there on.
+CHAIN_DEPTH = 1000
+
+FORMAT = 1
+
+
+class Tree(object):
+    """I am a tree of directories to benchmark calls on, of a given size
+    and shape, filled breadth first. A chain is filled CHAIN_DEPTH deep at
+    most, and the rest of it is in the root.
+
+    Attributes:
+        size (int): how many directories I hold, counting the root.
+        shape (str): the name of my shape.
+        fanout (int): how many directories each directory holds.
+        os (FakeOS): the fake os holding me.
+        deepest (str): the path of my last directory, which is as deep as
+            any.
+        depth (int): how many directories deep my deepest directory is.
+        subtree (str): the path of the first directory in my root, the
+            biggest subtree below it.
+    """
+    def __init__(self, size: int, shape: str):
+        self.size = size
+        self.shape = shape
+        self.fanout = SHAPES[shape] or size
+        self.deepest = "/"
+        entries = list(self._entries())
+        filesystem = FakeFilesystem()
+        filesystem.populate(entries)
+        self.os = FakeOS(filesystem=FakeFilesystemWithPermissions(filesystem))
+        self.depth = self.deepest.count("/") if self.deepest != "/" else 0
+        self.subtree = entries[1][0] if len(entries) > 1 else "/"
+        self._snapshot = self.os.filesystem.snapshot()
+
+    def _entries(self) -> typing.Iterator[tuple]:
+        yield "/", "directory"
+        frontier, count, depth = ["/"], 1, 0
+        while count < self.size and (self.fanout > 1 or depth < CHAIN_DEPTH):
+            below = list()
+            for parent in frontier:
+                for index in range(min(self.fanout, self.size - count)):
+                    path = parent.rstrip("/") + "/d%d" % index
+                    below.append(path)
+                    count += 1
+                    yield path, "directory"
+
+            frontier, depth = below, depth + 1
+            self.deepest = frontier[-1]
+
+        for index in range(self.size - count):
+            yield "/r%d" % index, "directory"
+
+    def restore(self):
+        """Undo every change made since I was built."""
+        self.os.filesystem.restore(self._snapshot)
+
+
+def _mkdir(tree: Tree, calls: int) -> int:
+    paths = ["%s/new%d" % (tree.deepest, index) for index in range(calls)]
+    start = perf_counter_ns()
+    for path in paths:
+        tree.os.mkdir(path)
+
+    return perf_counter_ns() - start
+
+
+def _makedirs(tree: Tree, calls: int) -> int:
+    paths = ["%s/new%d/a/b/c" % (tree.deepest, index)
+             for index in range(calls)]
+    start = perf_counter_ns()
+    for path in paths:
+        tree.os.makedirs(path)
+
+    return perf_counter_ns() - start
+
+
+def _listdir(tree: Tree, calls: int) -> int:
+    path = str(Path(tree.deepest).parent)
+    start = perf_counter_ns()
+    for _ in range(calls):
+        tree.os.listdir(path)
+
+    return perf_counter_ns() - start
+
+
+def _rename_file(tree: Tree, calls: int) -> int:
+    source, target = tree.deepest + "/file", tree.deepest + "/renamed"
+    tree.os.open(source, "w").close()
+    start = perf_counter_ns()
+    for _ in range(calls // 2):
+        tree.os.rename(source, target)
+        tree.os.rename(target, source)
+
+    return perf_counter_ns() - start
+
+
+def _rename_directory(tree: Tree, calls: int) -> int:
+    source, target = tree.subtree, "/renamed"
+    start = perf_counter_ns()
+    for _ in range(calls // 2):
+        tree.os.rename(source, target)
+        tree.os.rename(target, source)
+
+    return perf_counter_ns() - start
+
+
+def _rmdir(tree: Tree, calls: int) -> int:
+    paths = ["%s/new%d" % (tree.deepest, index) for index in range(calls)]
+    for path in paths:
+        tree.os.mkdir(path)
+
+    start = perf_counter_ns()
+    for path in paths:
+        tree.os.rmdir(path)
+
+    return perf_counter_ns() - start
+
+
+def _access(tree: Tree, calls: int) -> int:
+    start = perf_counter_ns()
+    for _ in range(calls):
+        tree.os.access(tree.deepest, FakeOS.R_OK)
+
+    return perf_counter_ns() - start
+
+
+def _chmod(tree: Tree, calls: int) -> int:
+    start = perf_counter_ns()
+    for index in range(calls):
+        tree.os.chmod(tree.deepest, 0o755 if index % 2 else 0o775)
+
+    return perf_counter_ns() - start
+
+
+# Every benchmark makes some calls on a tree and returns how many
+# nanoseconds they took, leaving out whatever it sets up beforehand.
+BENCHMARKS = {
+    "mkdir": _mkdir,
+    "makedirs": _makedirs,
+    "listdir": _listdir,
+    "rename_file": _rename_file,
+    "rename_directory": _rename_directory,
+    "rmdir": _rmdir,
+    "access": _access,
+    "chmod": _chmod,
+}
+
+
+def _calls(benchmark: typing.Callable[[Tree, int], int], tree: Tree,
+           calls: int, repeat: int, budget: float) -> int:
+    """Return how many calls benchmark should make on tree, at most calls,
+    for repeat runs to take about budget seconds."""
+    elapsed = benchmark(tree, 2)
+    tree.restore()
+    affordable = int(budget * 10 ** 9 * 2 / (max(elapsed, 1) * repeat))
+    return max(2, min(calls, affordable)) // 2 * 2
+
+
+def run(sizes: typing.Iterable[int] = SIZES,
+        shapes: typing.Iterable[str] = tuple(SHAPES),
+        benchmarks: typing.Iterable[str] = tuple(BENCHMARKS),
+        calls: int = 100, repeat: int = 5, budget: float = 2.0,
+        log: typing.Callable[[str], None] = None) -> dict:
+    """Time every benchmark on a tree of every size and shape, and return
+    the results.
+
+    Every benchmark makes up to calls calls, fewer if making them repeat
+    times would take more than about budget seconds. It is run repeat
+    times, on a tree brought back to how it was built before each, and its
+    fastest run is kept, as timeit does."""
+    results = list()
+    for shape in shapes:
+        for size in sizes:
+            tree = Tree(size, shape)
+            for name in benchmarks:
+                made = _calls(BENCHMARKS[name], tree, calls, repeat, budget)
+                fastest = None
+                for _ in range(repeat):
+                    elapsed = BENCHMARKS[name](tree, made)
+                    tree.restore()
+                    fastest = elapsed if fastest is None \
+                        else min(fastest, elapsed)
+
+                results.append({
+                    "benchmark": name,
+                    "shape": shape,
+                    "size": size,
+                    "fanout": tree.fanout,
+                    "depth": tree.depth,
+                    "calls": made,
+                    "nanoseconds_per_call": fastest / made,
+                })
+                if log is not None:
+                    log("%-16s %-8s %8d %12.0f ns/call" % (
+                        name, shape, size, fastest / made))
+
+            del tree
+
+    return {
+        "format": FORMAT,
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def _commit() -> typing.Optional[str]:
+    """Return the commit the benchmarks are run on, if known."""
+    try:
+        process = subprocess.run(["git", "rev-parse", "HEAD"],
+                                 cwd=str(Path(__file__).parent),
+                                 capture_output=True, text=True, check=True)
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return process.stdout.strip()
+
+
+def exponent(points: typing.Iterable[typing.Tuple[int, float]]) -> float:
+    """Return how time grows with size, as the slope of the least squares
+    fit of the log of the time against the log of the size: 0 for constant
+    time, 1 for linear time."""
+    logs = [(math.log(size), math.log(max(time, 1.0)))
+            for size, time in points]
+    if len(logs) < 2:
+        return 0.0
+
+    mean_x = sum(x for x, _ in logs) / len(logs)
+    mean_y = sum(y for _, y in logs) / len(logs)
+    variance = sum((x - mean_x) ** 2 for x, _ in logs)
+    if not variance:
+        return 0.0
+
+    return sum((x - mean_x) * (y - mean_y) for x, y in logs) / variance
+
+
+def _series(results: dict) -> typing.Dict[tuple, typing.Dict[int, float]]:
+    series = dict()
+    for result in results["results"]:
+        series.setdefault((result["benchmark"], result["shape"]), dict())[
+            result["size"]] = result["nanoseconds_per_call"]
+
+    return series
+
+
+def compare(old: dict, new: dict, slower: float = 1.5,
+            steeper: float = 0.25) -> typing.List[str]:
+    """Compare the results of two runs, and return a description of every
+    regression: a benchmark over slower times as slow as it was at some
+    size, or whose time grows with size more than steeper faster than it
+    did, as an exponent."""
+    regressions = list()
+    old_series = _series(old)
+    for key, times in sorted(_series(new).items()):
+        before = old_series.get(key)
+        if before is None:
+            continue
+
+        sizes = sorted(set(before) & set(times))
+        for size in sizes:
+            ratio = times[size] / max(before[size], 1.0)
+            if ratio > slower:
+                regressions.append("%s on %s tree of %d: %.1fx slower" % (
+                    key[0], key[1], size, ratio))
+
+        old_exponent = exponent((size, before[size]) for size in sizes)
+        new_exponent = exponent((size, times[size]) for size in sizes)
+        if new_exponent - old_exponent > steeper:
+            regressions.append("%s on %s tree: scales as n^%.2f, was n^%.2f"
+                               % (key[0], key[1], new_exponent, old_exponent))
+
+    return regressions
+
+
+def main(argv: typing.List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    running = commands.add_parser("run", help="run the benchmarks")
+    running.add_argument("-o", "--output", help="JSON file to write to")
+    running.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    running.add_argument("--shapes", nargs="+", default=list(SHAPES),
+                         choices=list(SHAPES))
+    running.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS),
+                         choices=list(BENCHMARKS))
+    running.add_argument("--calls", type=int, default=100)
+    running.add_argument("--repeat", type=int, default=5)
+    running.add_argument("--budget", type=float, default=2.0,
+                         help="seconds to spend on each benchmark, roughly")
+
+    comparing = commands.add_parser("compare",
+                                    help="compare the results of two runs")
+    comparing.add_argument("old")
+    comparing.add_argument("new")
+    comparing.add_argument("--slower", type=float, default=1.5)
+    comparing.add_argument("--steeper", type=float, default=0.25)
+
+    arguments = parser.parse_args(argv)
+    if arguments.command == "run":
+        results = run(arguments.sizes, arguments.shapes, arguments.benchmarks,
+                      arguments.calls, arguments.repeat, arguments.budget,
+                      log=lambda line: print(line, file=sys.stderr))
+        if arguments.output:
+            with open(arguments.output, "w") as output:
+                json.dump(results, output, indent=1)
+
+        else:
+            json.dump(results, sys.stdout, indent=1)
+
+        return 0
+
+    with open(arguments.old) as old, open(arguments.new) as new:
+        regressions = compare(json.load(old), json.load(new),
+                              arguments.slower, arguments.steeper)
+
+    for regression in regressions:
+        print(regression)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
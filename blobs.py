@@ -0,0 +1,80 @@
+"""Everything needed for sharing identical file data."""
+import hashlib
+import threading
+
+
+class BlobStore(object):
+    """I keep a single copy of every distinct piece of file data.
+
+    Data is keyed by its digest, so interning the same bytes twice returns
+    the very same object. Every blob is reference counted and forgotten once
+    its last reference is released. Blobs are immutable; whoever wants to
+    change one copies it and releases their reference.
+
+    Contents in every thread share one store and release their blobs when
+    they are collected, in whichever thread that happens, so every count
+    is kept under a lock. The lock is reentrant, as a collection may release
+    blobs while the same thread holds it.
+    """
+    def __init__(self):
+        self._blobs = dict()
+        self._digests = dict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._blobs)
+
+    def __contains__(self, data) -> bool:
+        digest = self._digest(data)
+        with self._lock:
+            return digest in self._blobs
+
+    @property
+    def size(self) -> int:
+        """Return how many bytes the blobs take, counting each one once."""
+        with self._lock:
+            return sum(len(blob) for blob, _ in self._blobs.values())
+
+    @staticmethod
+    def _digest(data) -> bytes:
+        return hashlib.blake2b(data, digest_size=20).digest()
+
+    def intern(self, data) -> bytes:
+        """Return the blob holding data, and take a reference to it."""
+        digest = self._digest(data)
+        with self._lock:
+            entry = self._blobs.get(digest)
+            if entry is None:
+                blob = bytes(data)
+                entry = self._blobs[digest] = [blob, 0]
+                self._digests[id(blob)] = digest
+
+            entry[1] += 1
+            return entry[0]
+
+    def acquire(self, blob: bytes) -> bytes:
+        """Take another reference to blob, which must have been interned."""
+        with self._lock:
+            self._blobs[self._digests[id(blob)]][1] += 1
+
+        return blob
+
+    def release(self, blob: bytes):
+        """Give up a reference to blob, forgetting it if it was the last."""
+        with self._lock:
+            digest = self._digests[id(blob)]
+            entry = self._blobs[digest]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._blobs[digest]
+                del self._digests[id(blob)]
+
+    def refcount(self, blob: bytes) -> int:
+        """Return how many references blob has."""
+        with self._lock:
+            digest = self._digests.get(id(blob))
+            return 0 if digest is None else self._blobs[digest][1]
+
+
+BLOBS = BlobStore()
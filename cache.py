@@ -0,0 +1,58 @@
+"""Everything needed for caching prebuilt fake filesystems on disk."""
+import functools
+import hashlib
+import inspect
+import os as _os
+import tempfile
+import typing
+
+from filesystem import AbstractFilesystem, FakeFilesystem
+from image import MAGIC
+
+
+def _digest(builder: typing.Callable, args: tuple, kwargs: dict) -> str:
+    """Return what identifies what builder builds out of args and kwargs:
+    its source, its arguments and the version of the image format."""
+    try:
+        source = inspect.getsource(builder).encode()
+
+    except (OSError, TypeError):
+        source = builder.__code__.co_code
+
+    digest = hashlib.blake2b(MAGIC + source, digest_size=20)
+    digest.update(repr((builder.__module__, builder.__qualname__, args,
+                        sorted(kwargs.items()))).encode())
+    return digest.hexdigest()
+
+
+def cached(directory: str = None) -> typing.Callable:
+    """Cache the filesystems built by the decorated function on disk.
+
+    The first call with some arguments builds the filesystem and saves an
+    image of it in directory, named after a hash of the source of the
+    function and of the arguments; every call then loads that image, which
+    takes constant time. Changing the function makes a new image. The
+    arguments must have a repr that tells them apart.
+
+    For example:
+        @cached()
+        def tree(width):
+            return FakeFilesystem.from_manifest(...)"""
+    directory = directory or _os.path.join(tempfile.gettempdir(), "fakeos")
+
+    def decorator(builder: typing.Callable[..., AbstractFilesystem]):
+        @functools.wraps(builder)
+        def build(*args, **kwargs) -> FakeFilesystem:
+            path = _os.path.join(directory,
+                                 _digest(builder, args, kwargs) + ".img")
+            if not _os.path.exists(path):
+                _os.makedirs(directory, exist_ok=True)
+                partial = "%s.%d" % (path, _os.getpid())
+                builder(*args, **kwargs).save(partial)
+                _os.replace(partial, path)
+
+            return FakeFilesystem.load(path)
+
+        return build
+
+    return decorator
@@ -0,0 +1,282 @@
+"""Everything needed for storing the data of fake files."""
+import typing
+import weakref
+from bisect import bisect_left, bisect_right
+
+from blobs import BLOBS
+
+
+class FakeContents(object):
+    """I am the data in a fake file.
+
+    I only store what was written to me, as sorted extents of data that
+    never overlap; the holes between them read back as zeros.
+    My size is kept apart from my extents, so truncating me costs nothing no
+    matter how far I grow, and a file that is mostly a hole only costs the
+    bytes that were actually written to it.
+
+    Once sealed, my extents are blobs shared through a BlobStore, so
+    identical data is stored once no matter how many files, snapshots or
+    forks hold it. An extent is copied out of its blob when it is written to.
+    Sealing cuts extents into blobs of at most EXTENT bytes, and writing
+    right after a full blob starts a new extent, so appending to a file and
+    closing it again only copies and hashes its last blob, however big the
+    file is.
+
+    Until something is written to me I hold no lists of extents at all,
+    since most files are empty or written to just once.
+
+    Attributes:
+        store (BlobStore): where my sealed extents are shared.
+        EXTENT (int): the most bytes a sealed extent holds.
+    """
+    __slots__ = ("_starts", "_extents", "_size", "_view")
+    store = BLOBS
+    EXTENT = 1 << 16
+
+    def __init__(self, data: bytes = b"", size: int = None):
+        self._starts = self._extents = ()
+        self._size = 0
+        self._view = None
+        if data:
+            self.write(0, data)
+
+        if size is not None:
+            self.truncate(size)
+
+        self.seal()
+
+    @classmethod
+    def from_extents(cls, extents: typing.Iterable[typing.Tuple[int, bytes]],
+                     size: int) -> 'FakeContents':
+        """Return contents of size bytes holding the data of every extent at
+        its start, with holes in between."""
+        contents = cls()
+        for start, data in extents:
+            contents.write(start, data)
+
+        contents.truncate(size)
+        contents.seal()
+        return contents
+
+    def __del__(self):
+        for extent in self._extents:
+            if not isinstance(extent, bytearray):
+                self.store.release(extent)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bytes__(self) -> bytes:
+        return self.read(0, self._size)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (FakeContents, bytes, bytearray)):
+            return len(self) == len(other) and bytes(self) == bytes(other)
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "FakeContents(size=%d, allocated=%d)" % (self._size,
+                                                        self.allocated)
+
+    @property
+    def allocated(self) -> int:
+        """Return how many bytes are actually stored."""
+        return sum(len(extent) for extent in self._extents)
+
+    def copy(self) -> 'FakeContents':
+        """Return a copy of the contents, sharing their data until written."""
+        self.seal()
+        contents = FakeContents()
+        if self._extents:
+            contents._starts = list(self._starts)
+            contents._extents = [
+                bytearray(extent) if isinstance(extent, bytearray)
+                else self.store.acquire(extent) for extent in self._extents]
+
+        contents._size = self._size
+        return contents
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo: dict) -> 'FakeContents':
+        return self.copy()
+
+    def extents(self) -> typing.Iterator[typing.Tuple[int, memoryview]]:
+        """Yield where every extent of data starts, and a view of it,
+        skipping the holes."""
+        for start, extent in zip(self._starts, self._extents):
+            yield start, memoryview(extent)
+
+    def seal(self):
+        """Share my extents through the store.
+
+        Nothing is sealed while a view returned by getbuffer is alive, since
+        the view must keep writing to the contents."""
+        view = self._view and self._view()
+        if view is not None:
+            try:
+                view.nbytes
+                return
+
+            except ValueError:
+                pass
+
+        self._view = None
+        index = 0
+        while index < len(self._extents):
+            extent = self._extents[index]
+            if not isinstance(extent, bytearray):
+                index += 1
+                continue
+
+            start = self._starts[index]
+            with memoryview(extent) as view:
+                blobs = [self.store.intern(view[offset:offset + self.EXTENT])
+                         for offset in range(0, len(extent), self.EXTENT)]
+
+            self._starts[index:index + 1] = range(start, start + len(extent),
+                                                  self.EXTENT)
+            self._extents[index:index + 1] = blobs
+            index += len(blobs)
+
+    def _own(self, index: int) -> bytearray:
+        """Return the extent at index, copying it out of the store first."""
+        extent = self._extents[index]
+        if not isinstance(extent, bytearray):
+            self._extents[index] = bytearray(extent)
+            self.store.release(extent)
+
+        return self._extents[index]
+
+    def _apart(self, index: int, offset: int) -> bool:
+        """Return whether data written at offset is kept out of the extent at
+        index, because it ends before offset, or is a full blob ending at
+        offset."""
+        extent = self._extents[index]
+        end = self._starts[index] + len(extent)
+        return end < offset or (end == offset and len(extent) >= self.EXTENT
+                                and not isinstance(extent, bytearray))
+
+    def _pieces(self, offset: int, end: int) -> typing.Iterator:
+        """Yield the data between offset and end, with zeros for holes."""
+        index = max(bisect_right(self._starts, offset) - 1, 0)
+        position = offset
+        while position < end:
+            if index < len(self._starts) and self._starts[index] <= position:
+                start, extent = self._starts[index], self._extents[index]
+                stop = min(start + len(extent), end)
+                if stop > position:
+                    yield memoryview(extent)[position - start:stop - start]
+                    position = stop
+
+                index += 1
+
+            else:
+                stop = end
+                if index < len(self._starts):
+                    stop = min(self._starts[index], end)
+
+                yield bytes(stop - position)
+                position = stop
+
+    def read(self, offset: int, size: int) -> bytes:
+        """Return up to size bytes starting at offset."""
+        end = min(offset + size, self._size)
+        return b"".join(self._pieces(offset, end))
+
+    def readinto(self, offset: int, buffer) -> int:
+        """Read starting at offset into buffer and return how much was read.
+
+        The data is copied once, straight into buffer."""
+        with memoryview(buffer) as view, view.cast("B") as target:
+            end = min(offset + len(target), self._size)
+            position = 0
+            for piece in self._pieces(offset, end):
+                target[position:position + len(piece)] = piece
+                position += len(piece)
+
+            return position
+
+    def write(self, offset: int, data) -> int:
+        """Write data at offset, growing if needed, and return its length."""
+        with memoryview(data) as view, view.cast("B") as source:
+            if not source:
+                return 0
+
+            if not self._extents:
+                self._starts, self._extents = list(), list()
+
+            end = offset + len(source)
+            first = bisect_right(self._starts, offset) - 1
+            if first < 0 or self._apart(first, offset):
+                first += 1
+
+            last = bisect_right(self._starts, end)
+            if first < last and self._starts[first] <= offset:
+                start, extent = self._starts[first], self._own(first)
+
+            else:
+                start, extent = offset, bytearray()
+                self._starts.insert(first, start)
+                self._extents.insert(first, extent)
+                last += 1
+
+            extent[offset - start:end - start] = source
+            for index in range(first + 1, last):
+                other_start, other = self._starts[index], self._extents[index]
+                if other_start + len(other) > end:
+                    extent += memoryview(other)[end - other_start:]
+
+                if not isinstance(other, bytearray):
+                    self.store.release(other)
+
+            del self._starts[first + 1:last]
+            del self._extents[first + 1:last]
+            self._size = max(self._size, end)
+            return len(source)
+
+    def truncate(self, size: int):
+        """Shrink or grow to size; growing only moves the end of file."""
+        if size < 0:
+            raise ValueError("negative size value %d" % size)
+
+        if size < self._size and self._extents:
+            index = bisect_left(self._starts, size)
+            for extent in self._extents[index:]:
+                if not isinstance(extent, bytearray):
+                    self.store.release(extent)
+
+            del self._starts[index:]
+            del self._extents[index:]
+            if self._extents and self._starts[-1] + len(
+                    self._extents[-1]) > size:
+                del self._own(-1)[size - self._starts[-1]:]
+
+        self._size = size
+
+    def getbuffer(self) -> memoryview:
+        """Return a view of the contents without copying them.
+
+        Only contents without holes can be viewed, and they cannot grow or
+        shrink while the view is held. Contents sealed in several blobs are
+        joined into one extent first, which copies them once."""
+        if not self._size:
+            return memoryview(bytearray())
+
+        if (not self._extents or self._starts[0] != 0 or
+                self.allocated != self._size):
+            raise BufferError("contents with holes cannot be viewed")
+
+        if len(self._extents) > 1:
+            extent = bytearray().join(self._extents)
+            for blob in self._extents:
+                if not isinstance(blob, bytearray):
+                    self.store.release(blob)
+
+            self._starts, self._extents = [0], [extent]
+
+        view = memoryview(self._own(0))
+        self._view = weakref.ref(view)
+        return view
@@ -0,0 +1,120 @@
+"""Everything needed for simulating how long fake I/O takes."""
+import heapq
+import typing
+
+NANOSECONDS = 10 ** 9
+
+
+class VirtualClock(object):
+    """I am a clock that only moves when told to.
+
+    Calling me returns the time in nanoseconds, so I can be used as the
+    clock of a FakeFilesystem, which then stamps everything with simulated
+    time.
+
+    Attributes:
+        now (int): the time, in nanoseconds.
+    """
+    def __init__(self, now: int = 0):
+        self.now = now
+
+    def __call__(self) -> int:
+        return self.now
+
+    @property
+    def seconds(self) -> float:
+        """Return the time, in seconds."""
+        return self.now / NANOSECONDS
+
+    def advance(self, nanoseconds: int):
+        """Move the time forward by nanoseconds."""
+        self.now += nanoseconds
+
+    def advance_to(self, now: int):
+        """Move the time forward to now, unless it is already later."""
+        self.now = max(self.now, now)
+
+
+class CostModel(object):
+    """I charge simulated time for every operation on a fake device.
+
+    An operation takes its latency, plus the seek penalty unless it reads or
+    writes right where the last read or write ended, and then the time to
+    transfer its bytes at the given bandwidth. The device works on up to
+    queue_depth operations at once, but transfers one at a time, so a
+    deeper queue hides latency and seeks but not a lack of bandwidth.
+
+    Operations that return something, such as reads, stat and listdir, keep
+    the caller waiting until they are done; the others are queued, and keep
+    the caller waiting only until there is room in the queue. Draining waits
+    for everything queued.
+
+    Attributes:
+        clock (VirtualClock): the clock I charge.
+        latency (float): the seconds every operation takes, at least.
+        latencies (dict): the latency of some operations, by name.
+        bandwidth (float): bytes transferred per second; None for no limit.
+        queue_depth (int): how many operations the device works on at once.
+        seek (float): the seconds lost moving to another position.
+        WAITED (frozenset): the operations whose callers wait for them.
+    """
+    WAITED = frozenset({"read", "stat", "fstat", "listdir", "walk", "access",
+                        "open"})
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = None,
+                 queue_depth: int = 1, seek: float = 0.0,
+                 latencies: typing.Dict[str, float] = None,
+                 clock: VirtualClock = None):
+        if queue_depth < 1:
+            raise ValueError("Queue depth must be positive")
+
+        self.clock = clock or VirtualClock()
+        self.latency = latency
+        self.latencies = dict(latencies or ())
+        self.bandwidth = bandwidth
+        self.queue_depth = queue_depth
+        self.seek = seek
+        self._busy = list()
+        self._transferring = 0
+        self._head = None
+
+    def _overhead(self, operation: str, size: int,
+                  position: typing.Optional[typing.Tuple[int, int]]) -> int:
+        """Return the nanoseconds operation takes before transferring size
+        bytes at position, which is a stream and an offset in it."""
+        seconds = self.latencies.get(operation, self.latency)
+        if position is not None:
+            if position != self._head:
+                seconds += self.seek
+
+            self._head = (position[0], position[1] + size)
+
+        return round(seconds * NANOSECONDS)
+
+    def charge(self, operation: str, size: int = 0,
+               position: typing.Tuple[int, int] = None) -> int:
+        """Charge the clock for operation, moving size bytes at position,
+        which is a stream and an offset in it, if given, and return when
+        operation is done."""
+        while self._busy and self._busy[0] <= self.clock.now:
+            heapq.heappop(self._busy)
+
+        start = self.clock.now
+        if len(self._busy) >= self.queue_depth:
+            start = heapq.heappop(self._busy)
+
+        done = start + self._overhead(operation, size, position)
+        if size and self.bandwidth is not None:
+            done = max(done, self._transferring) + round(
+                size * NANOSECONDS / self.bandwidth)
+            self._transferring = done
+
+        heapq.heappush(self._busy, done)
+        self.clock.advance_to(done if operation in self.WAITED else start)
+        return done
+
+    def drain(self):
+        """Wait for everything queued to be done."""
+        if self._busy:
+            self.clock.advance_to(max(self._busy))
+            self._busy = list()
@@ -0,0 +1,88 @@
+"""Everything needed for scanning fake directories."""
+import os as _os
+import typing
+
+from filesystem import FakeDirectory, FakeFile, FakeFileLikeObject
+
+
+class FakeDirEntry(object):
+    """I mock an 'os.DirEntry'.
+
+    I hold the file-like object I was scanned from, so answering is_dir,
+    is_file and stat never looks anything up again. As with the real thing,
+    my stat result is cached the first time it is asked for.
+
+    Attributes:
+        name (str): the name of the entry.
+        path (str): the path of the directory being scanned joined with name.
+    """
+    def __init__(self, directory: str, file_object: FakeFileLikeObject,
+                 stat: typing.Callable[[FakeFileLikeObject], _os.stat_result]):
+        self.name = file_object.name
+        self.path = _os.path.join(directory, self.name)
+        self._file_object = file_object
+        self._fstat = stat
+        self._stat = None
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def __repr__(self) -> str:
+        return "<FakeDirEntry %r>" % self.name
+
+    def inode(self) -> int:
+        """Return the inode number of the entry."""
+        return self._file_object.ino
+
+    def is_dir(self, *, follow_symlinks: bool = True) -> bool:
+        """Return True if the entry is a directory."""
+        return isinstance(self._file_object, FakeDirectory)
+
+    def is_file(self, *, follow_symlinks: bool = True) -> bool:
+        """Return True if the entry is a file."""
+        return isinstance(self._file_object, FakeFile)
+
+    def is_symlink(self) -> bool:
+        """Return True if the entry is a symbolic link, which it never is."""
+        return False
+
+    def stat(self, *, follow_symlinks: bool = True) -> _os.stat_result:
+        """Return the stat result of the entry, caching it."""
+        if self._stat is None:
+            self._stat = self._fstat(self._file_object)
+
+        return self._stat
+
+
+class FakeScandirIterator(object):
+    """I mock the iterator returned by 'os.scandir'.
+
+    I create every entry only when it is reached, and can be used as a
+    context manager, which closes me.
+    """
+    def __init__(self, directory: str,
+                 file_objects: typing.Iterator[FakeFileLikeObject],
+                 stat: typing.Callable[[FakeFileLikeObject], _os.stat_result]):
+        self._directory = directory
+        self._file_objects = file_objects
+        self._stat = stat
+
+    def __iter__(self) -> 'FakeScandirIterator':
+        return self
+
+    def __next__(self) -> FakeDirEntry:
+        if self._file_objects is None:
+            raise StopIteration
+
+        return FakeDirEntry(self._directory, next(self._file_objects),
+                            self._stat)
+
+    def close(self):
+        """Stop scanning the directory."""
+        self._file_objects = None
+
+    def __enter__(self) -> 'FakeScandirIterator':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -1,13 +1,18 @@
 """Full mock of the builtin 'os' module for blazing-fast unit-testing."""
+import os as _os
 from pathlib import Path
+import io
 import typing
+from contextlib import contextmanager
 
 from device import FakeDevice
+from direntry import FakeScandirIterator
 from environment import FakeEnvironment
-from filesystem import FakeFilesystem, FakeFilesystemWithPermissions, \
-    AbstractFilesystem
+from filesystem import FakeFile, FakeFilesystem, \
+    FakeFilesystemWithPermissions, AbstractFilesystem
 from operating_system import FakeOperatingSystem, FakeUnix
 from fakeuser import FakeUser, Root
+from stats import CallStats, Meter, OperationStats
 
 
 class FakeOS(object):
@@ -20,6 +25,14 @@ class FakeOS(object):
     X_OK = 0b001
     F_OK = 0b000
 
+    # The calls that can be measured, and how many of their first arguments
+    # are paths.
+    MEASURED = {"mkdir": 1, "makedirs": 1, "open": 1, "listdir": 1,
+                "scandir": 1, "stat": 1, "lstat": 1, "fstat": 0, "walk": 1,
+                "fwalk": 1, "getcwd": 0, "chdir": 1, "chown": 1, "chmod": 1,
+                "truncate": 1, "rmdir": 1, "remove": 1, "unlink": 1,
+                "rename": 2, "access": 1}
+
     def __init__(self, cwd: Path = None,
                  filesystem: AbstractFilesystem = None,
                  environment: FakeEnvironment = None,
@@ -27,14 +40,18 @@ class FakeOS(object):
                  operating_system: FakeOperatingSystem = None,
                  fake_device: typing.Type[FakeDevice]=FakeDevice):
 
-        self.cwd = cwd or Path(__file__)
         self.filesystem = filesystem or FakeFilesystemWithPermissions(
             FakeFilesystem(user=user, operating_system=operating_system))
 
+        if cwd is not None:
+            self.cwd = cwd
+
         self.environment = environment or FakeEnvironment()
         self.device = fake_device
         self.user = user or Root()
         self.operating_system = operating_system or FakeUnix()
+        self._meter = Meter(self, self.MEASURED)
+        self._stats = CallStats()
 
     def mkdir(self, path: str, mode: int = 0o777):
         """Create a directory named path with numeric mode mode.
@@ -51,6 +68,32 @@ class FakeOS(object):
         explicitly to set them."""
         self.filesystem.mkdir(Path(path), mode=mode)
 
+    def open(self, path: str, mode: str = "r", encoding: str = None):
+        """Open file path and return a corresponding file object.
+        mode is one of 'r', 'w', 'a' or 'x', optionally followed by '+' to
+        both read and write, and by 'b' for binary mode, as in the builtin
+        open().
+
+        Binary modes return an unbuffered file object reading from and
+        writing to the fake file directly, so readinto() copies the data
+        once, straight into the given buffer, and getbuffer() returns a view
+        of the contents without copying them at all.
+        Text modes wrap it in a buffered io.TextIOWrapper."""
+        raw = self.filesystem.open(Path(path), mode=mode)
+        if "b" in mode:
+            return raw
+
+        if "+" in mode:
+            buffered = io.BufferedRandom(raw)
+
+        elif raw.writable():
+            buffered = io.BufferedWriter(raw)
+
+        else:
+            buffered = io.BufferedReader(raw)
+
+        return io.TextIOWrapper(buffered, encoding=encoding)
+
     def listdir(self, path: str) -> list:
         """Return a list containing the names of the entries in the directory
         given by path. The list is in arbitrary order, and does not include the
@@ -59,21 +102,165 @@ class FakeOS(object):
         file_objects = self.filesystem.listdir(Path(path))
         return [file_object.name for file_object in file_objects]
 
+    def scandir(self, path: str = ".") -> FakeScandirIterator:
+        """Return an iterator of DirEntry objects corresponding to the entries
+        in the directory given by path. The entries are yielded in arbitrary
+        order, and the special entries '.' and '..' are not included.
+
+        The iterator can be used as a context manager, which closes it."""
+        file_objects = self.filesystem.listdir(Path(path))
+        return FakeScandirIterator(path, iter(file_objects),
+                                   self.filesystem.fstat)
+
+    def stat(self, path: str, *, dir_fd: int = None,
+             follow_symlinks: bool = True) -> _os.stat_result:
+        """Get the status of a file. Return a stat_result object.
+        There are no symbolic links, so follow_symlinks is ignored, and
+        dir_fd is not supported."""
+        return self.filesystem.stat(Path(path))
+
+    def lstat(self, path: str, *, dir_fd: int = None) -> _os.stat_result:
+        """Like stat(), but do not follow symbolic links, of which there
+        are none."""
+        return self.filesystem.stat(Path(path))
+
+    def fstat(self, fd) -> _os.stat_result:
+        """Get the status of an open file, as returned by open(). There are
+        no file descriptors, so the file object itself is given instead."""
+        raw = getattr(getattr(fd, "buffer", fd), "raw", fd)
+        return self.filesystem.fstat(raw.file_object)
+
+    def walk(self, top: str, topdown: bool = True,
+             onerror: typing.Callable = None, followlinks: bool = False):
+        """Generate the file names in a directory tree by walking the tree
+        either top-down or bottom-up. For each directory in the tree rooted
+        at directory top (including top itself), it yields a 3-tuple
+        (dirpath, dirnames, filenames).
+
+        When topdown is True, the caller can modify the dirnames list
+        in-place, and walk() will only recurse into the subdirectories whose
+        names remain in dirnames. Errors are reported to onerror, if given.
+        There are no symbolic links, so followlinks is ignored."""
+        for dirpath, dirnames, filenames, _ in self.filesystem.walk(
+                Path(top), topdown=topdown, onerror=onerror):
+            yield dirpath, dirnames, filenames
+
+    def fwalk(self, top: str = ".", topdown: bool = True,
+              onerror: typing.Callable = None, *,
+              follow_symlinks: bool = False, dir_fd: int = None):
+        """This behaves exactly like walk(), except that it yields a 4-tuple
+        (dirpath, dirnames, filenames, dirfd).
+
+        There are no file descriptors in a fake filesystem, so the fake
+        directory itself is yielded in place of dirfd. follow_symlinks and
+        dir_fd are ignored."""
+        yield from self.filesystem.walk(Path(top), topdown=topdown,
+                                        onerror=onerror)
+
+    @property
+    def cwd(self) -> Path:
+        """Return the current working directory.
+
+        Relative paths given to any method are resolved against it."""
+        return self.filesystem.resolver.cwd
+
+    @cwd.setter
+    def cwd(self, path: Path):
+        self.filesystem.resolver.cwd = path
+
     def getcwd(self) -> str:
         """"Return a string representing the current working directory."""
-        return str(self.cwd.absolute())
+        return self.filesystem.resolver.cwd_key
 
     def chdir(self, path: str):
         """Change the current working directory to path.
         If the directory does not exist FileNotFound is raised.
-        If the file is not a directory, NotADirectory is raised."""
-        if not self.filesystem.has(Path(path)):
+        If the file is not a directory, NotADirectory is raised.
+        If the directory, or one leading to it, cannot be searched,
+        PermissionError is raised."""
+        handle = self.filesystem.search(Path(path))
+        if handle.target is None:
             raise FileNotFoundError(path)
 
-        if self.filesystem.has_file(Path(path)):
+        if isinstance(handle.target, FakeFile):
             raise NotADirectoryError(path)
 
-        self.cwd = Path(path)
+        self.cwd = Path(handle.key)
+
+    @contextmanager
+    def transaction(self):
+        """Apply every operation made inside the with block, or none.
+
+        Entering the block takes a snapshot of the filesystem and the
+        operations are then applied as usual, copying what they change
+        rather than recording how to undo it. The first change inside a
+        directory copies its table of entries, and those of the directories
+        leading to it, which takes time in proportion to how many entries
+        they hold: a single chmod in a directory of 100,000 files takes a
+        few milliseconds instead of a few microseconds. What was changed
+        since earlier snapshots is merged now and then as well, which takes
+        time in proportion to how much was changed. If the block raises,
+        the filesystem and the current working directory are brought back
+        to the snapshot before the exception is re-raised. Transactions can
+        be nested.
+
+        Files opened before the block share their contents with the
+        snapshot until the file is first changed otherwise inside the block,
+        for example by chmod, rename or opening it again for writing, so
+        what is written to them until then is not rolled back. After a roll
+        back, they are openings of a file that is no longer in the
+        filesystem, as if it had been removed."""
+        snapshot = self.filesystem.snapshot()
+        cwd = self.getcwd()
+        try:
+            yield self
+
+        except BaseException:
+            self.filesystem.restore(snapshot)
+            self.cwd = Path(cwd)
+            raise
+
+    def enable_stats(self):
+        """Start counting and timing the calls to the filesystem.
+
+        Until then, and after disable_stats(), calls are not measured and
+        cost nothing extra."""
+        if self._stats not in self._meter.recorders:
+            self._meter.attach(self._stats)
+
+    def disable_stats(self):
+        """Stop counting and timing the calls to the filesystem, keeping what
+        was recorded so far."""
+        if self._stats in self._meter.recorders:
+            self._meter.detach(self._stats)
+
+    def stats(self) -> typing.Dict[str, OperationStats]:
+        """Return, for every call recorded since stats were enabled or
+        reset, how many times it was made, a Counter of the paths it was
+        given, a histogram of how long it took, by power of two nanoseconds,
+        and how long it took in total.
+
+        Only the calls made by the caller are recorded: unlink calling
+        remove is one call to unlink."""
+        return self._stats.stats()
+
+    def reset_stats(self):
+        """Forget every call recorded."""
+        self._stats.reset()
+
+    @contextmanager
+    def measure(self):
+        """Count and time the calls made inside the with block only, into
+        the CallStats yielded, whose stats() can be read once the block is
+        done. Measurements can be nested, and do not need stats to be
+        enabled."""
+        stats = CallStats()
+        self._meter.attach(stats)
+        try:
+            yield stats
+
+        finally:
+            self._meter.detach(stats)
 
     def environ(self) -> dict:
         """A dictionary representing the string environment.
@@ -145,6 +332,12 @@ class FakeOS(object):
             stat.S_IXOTH"""
         self.filesystem.chmod(Path(path), mode)
 
+    def truncate(self, path: str, length: int):
+        """Truncate the file corresponding to path, so that it is at most
+        length bytes in size. Growing a file leaves a hole that reads
+        as zeros and costs no memory."""
+        self.filesystem.truncate(Path(path), length)
+
     def rmdir(self, path: str):
         """Remove (delete) the directory path. Only works when the directory
         is empty, otherwise, OSError is raised. """
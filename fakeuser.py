@@ -1,5 +1,19 @@
 """Everything related to configuring a virtual user."""
-from typing import Tuple
+
+OWNER, GROUP, EVERYONE = 0b100, 0b010, 0b001
+
+
+def _grants(mode: int, action_mask: int) -> int:
+    """Return which of the owner, group and everyone may perform an action
+    on a file with mode, as OWNER, GROUP and EVERYONE bits."""
+    return ((OWNER if mode >> 6 & action_mask == action_mask else 0) |
+            (GROUP if mode >> 3 & action_mask == action_mask else 0) |
+            (EVERYONE if mode & action_mask == action_mask else 0))
+
+
+# GRANTS[action_mask][mode] for every action mask and permission mode.
+GRANTS = tuple(bytes(_grants(mode, action_mask) for mode in range(0o1000))
+               for action_mask in range(0o10))
 
 
 class FakeUser(object):
@@ -37,22 +51,14 @@ class FakeUser(object):
     def _can_access(self, mode: int, file_gid: int, action_mask: int,
                     file_uid: int) -> bool:
         """Whether or not the user can perform an action on the file"""
-        owner, group, everyone = self._parse_mode(mode)
-        return any([self.is_sudoer,
-                    owner & action_mask == action_mask and file_uid == self.uid,
-                    group & action_mask == action_mask and file_gid == self.gid,
-                    everyone & action_mask == action_mask])
-
-    @staticmethod
-    def _parse_mode(mode: int) -> Tuple[int, int, int]:
-        """Return the root byte, group byte and everyone byte of a mode"""
-        octal = "{:o}".format(mode).zfill(3)
-
-        if len(octal) != 3:
+        if not 0 <= mode <= 0o777:
             raise ValueError("Illegal mode %d" % mode)
 
-        owner, group, everyone = octal
-        return int(owner), int(group), int(everyone)
+        grants = GRANTS[action_mask][mode] if 0 <= action_mask <= 7 else 0
+        return bool(self.is_sudoer or
+                    grants & EVERYONE or
+                    (grants & GROUP and file_gid == self.gid) or
+                    (grants & OWNER and file_uid == self.uid))
 
 
 class Root(FakeUser):
@@ -0,0 +1,176 @@
+"""Everything needed for reading and writing fake files."""
+import io
+import typing
+from contextlib import nullcontext
+
+from locks import ReadWriteLock
+
+MODES = frozenset("rwaxbt+")
+
+
+class FakeFileIO(io.RawIOBase):
+    """I am an open fake file.
+
+    I read from and write to the contents of the file directly, without any
+    buffering of my own: readinto copies straight from the contents into the
+    given buffer, and getbuffer returns a view of the contents themselves.
+    Seeking past the end and writing leaves a hole that reads as zeros.
+
+    Attributes:
+        file_object (FakeFile): the file I am an opening of.
+        name (str): the path the file was opened with.
+        mode (str): the mode the file was opened with.
+        touch (callable): called whenever the file is changed, if given.
+        charge (callable): called with "read" or "write", the position and
+            how many bytes, whenever the file is read or written, if given.
+        lock (ReadWriteLock): held for reading while I read, and for writing
+            while I write, truncate or close, if given. A view returned by
+            getbuffer is not guarded by it.
+    """
+    def __init__(self, file_object: 'FakeFile', name: str, mode: str = "r",
+                 touch: typing.Callable = None,
+                 charge: typing.Callable = None,
+                 lock: ReadWriteLock = None):
+        super().__init__()
+        self.file_object = file_object
+        self.name = name
+        self.mode = mode
+        self.touch = touch
+        self.charge = charge
+        self.lock = lock
+        self._readable = "r" in mode or "+" in mode
+        self._writable = "r" not in mode or "+" in mode
+        self._append = "a" in mode
+        self._position = len(file_object.contents) if self._append else 0
+
+    @staticmethod
+    def check_mode(mode: str):
+        """Raise ValueError unless mode is a valid mode to open a file with."""
+        if (not set(mode) <= MODES or len(set(mode) & set("rwax")) != 1 or
+                ("b" in mode and "t" in mode)):
+            raise ValueError("invalid mode: %r" % mode)
+
+    def _reading(self):
+        return self.lock.reading() if self.lock is not None else nullcontext()
+
+    def _writing(self):
+        return self.lock.writing() if self.lock is not None else nullcontext()
+
+    def close(self):
+        """Close the file, sharing what was written with identical files."""
+        if not self.closed and self._writable:
+            with self._writing():
+                self.file_object.contents.seal()
+
+        super().close()
+
+    def readable(self) -> bool:
+        self._checkClosed()
+        return self._readable
+
+    def writable(self) -> bool:
+        self._checkClosed()
+        return self._writable
+
+    def seekable(self) -> bool:
+        self._checkClosed()
+        return True
+
+    def readinto(self, buffer) -> int:
+        """Read into buffer, copying straight from the contents."""
+        self._checkClosed()
+        if not self._readable:
+            raise io.UnsupportedOperation("read")
+
+        with self._reading():
+            read = self.file_object.contents.readinto(self._position, buffer)
+
+        if self.charge is not None:
+            self.charge("read", self._position, read)
+
+        self._position += read
+        return read
+
+    def readall(self) -> bytes:
+        """Read everything from the current position on."""
+        self._checkClosed()
+        if not self._readable:
+            raise io.UnsupportedOperation("read")
+
+        contents = self.file_object.contents
+        with self._reading():
+            data = contents.read(self._position,
+                                 len(contents) - self._position)
+
+        if self.charge is not None:
+            self.charge("read", self._position, len(data))
+
+        self._position += len(data)
+        return data
+
+    def write(self, data) -> int:
+        """Write data at the current position, or at the end if appending."""
+        self._checkClosed()
+        if not self._writable:
+            raise io.UnsupportedOperation("write")
+
+        contents = self.file_object.contents
+        with self._writing():
+            if self._append:
+                self._position = len(contents)
+
+            written = contents.write(self._position, data)
+            if written and self.touch is not None:
+                self.touch()
+
+        if self.charge is not None:
+            self.charge("write", self._position, written)
+
+        self._position += written
+
+        return written
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            position = offset
+
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+
+        elif whence == io.SEEK_END:
+            position = len(self.file_object.contents) + offset
+
+        else:
+            raise ValueError("invalid whence (%r)" % whence)
+
+        if position < 0:
+            raise OSError("negative seek position %d" % position)
+
+        self._position = position
+        return position
+
+    def tell(self) -> int:
+        self._checkClosed()
+        return self._position
+
+    def truncate(self, size: int = None) -> int:
+        self._checkClosed()
+        if not self._writable:
+            raise io.UnsupportedOperation("truncate")
+
+        size = self._position if size is None else size
+        with self._writing():
+            self.file_object.contents.truncate(size)
+            if self.touch is not None:
+                self.touch()
+
+        return size
+
+    def getbuffer(self) -> memoryview:
+        """Return a view of the contents of the file, without copying them.
+
+        As with io.BytesIO, the file cannot grow or shrink while the view
+        is held, and files with holes cannot be viewed."""
+        self._checkClosed()
+        return self.file_object.contents.getbuffer()
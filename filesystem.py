@@ -1,14 +1,51 @@
 """Everything needed for being able to create a virtual filesystem."""
+import errno
+import os as _os
+import sys
+import threading
+import time
 import typing
+import weakref
+from collections import namedtuple
+from functools import partial
+from itertools import chain
 from abc import ABC, abstractmethod, abstractproperty
 from pathlib import Path
+from multiprocessing import shared_memory
+from stat import S_IFDIR, S_IFREG
 
 from operating_system import FakeOperatingSystem, FakeUnix, FakeWindows
 from fakeuser import FakeUser, Root
+from contents import FakeContents
+from costs import CostModel
+from fileio import FakeFileIO
+from image import FakeImage, ImageRow
+from inodes import InodeTable
+from layers import LayeredDict
+from locks import ReadWriteLock
+from resolver import PathResolver, SEPARATOR, parent_of, name_of, child_of
+from sources import HostSource, SourceEntry
 
 
 class FakeFileLikeObject(ABC):
-    """I am what's common between a file, a directory, a symlink and a mount."""
+    """I am what's common between a file, a directory, a symlink and a mount.
+
+    I only know my name and my parent, which is either the directory I am in
+    or, while I am not inside a directory, the path of that directory. My path
+    is derived from those, so moving a directory moves everything inside it.
+
+    Like everything below me, I have slots rather than a dictionary of
+    attributes. An entry in a populated filesystem costs about 400 bytes on
+    CPython 3.11, counting its key, its index entry, its entry in its
+    directory, its inode and, for a file, its empty contents.
+
+    Attributes:
+        FORMAT (int): the file type bits of my stat mode.
+        ino (int): my inode number, given when I am put in a filesystem.
+    """
+    __slots__ = ("_name", "_parent", "uid", "gid", "mode", "ino", "_source")
+    FORMAT = 0
+
     def __init__(self, path: Path,
                  mode: int = 0o777,
                  uid: int = -1,
@@ -17,6 +54,25 @@ class FakeFileLikeObject(ABC):
         self.uid = uid
         self.gid = gid
         self.mode = mode
+        self.ino = 0
+        self._source = None
+
+    @property
+    def path(self) -> Path:
+        """Return this file-like object's path, walking up the directories
+        containing it in a loop, so it works at any depth."""
+        names = [self._name]
+        parent = self._parent
+        while isinstance(parent, FakeDirectory):
+            names.append(parent._name)
+            parent = parent._parent
+
+        return parent.joinpath(*reversed(names))
+
+    @path.setter
+    def path(self, path: Path):
+        self._parent = path.parent
+        self._name = path.name
 
     @property
     def parent(self) -> Path:
@@ -26,16 +82,86 @@ class FakeFileLikeObject(ABC):
     @property
     def name(self) -> str:
         """Return this file-like object's name"""
-        return self.path.absolute().name
+        return self._name
+
+    @property
+    def size(self) -> int:
+        """Return how many bytes this file-like object holds."""
+        return 0
+
+    def clone(self) -> 'FakeFileLikeObject':
+        """Clone the file-like object"""
+        file_object = object.__new__(type(self))
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                setattr(file_object, name, getattr(self, name))
+
+        return file_object
 
 
 class FakeFile(FakeFileLikeObject):
-    """I mock a file"""
-    pass
+    """I mock a file.
+
+    A file mirroring a real one, or frozen in an image, only knows its
+    source until my contents are needed, and then reads them.
+
+    Attributes:
+        contents (FakeContents): the data in me.
+    """
+    __slots__ = ("contents",)
+    FORMAT = S_IFREG
+
+    def __init__(self, path: Path,
+                 mode: int = 0o777,
+                 uid: int = -1,
+                 gid: int = -1,
+                 contents: bytes = b""):
+        super().__init__(path, mode=mode, uid=uid, gid=gid)
+        if not isinstance(contents, FakeContents):
+            contents = FakeContents(contents)
+
+        self.contents = contents
+
+    @property
+    def size(self) -> int:
+        """Return the size of my contents, without reading mirrored ones."""
+        if self._source is not None:
+            return self._source.size()
+
+        return len(self.contents)
+
+    def clone(self) -> 'FakeFile':
+        """Clone the file, copying its contents."""
+        file_object = super().clone()
+        file_object.contents = self.contents.copy()
+        return file_object
 
 
 class FakeDirectory(FakeFileLikeObject):
-    """I mock a directory."""
+    """I mock a directory.
+
+    A directory mirroring a real one, or frozen in an image, only knows its
+    source until my children are needed, and then loads them.
+
+    Attributes:
+        children (dict): the file-like objects inside me, by name.
+    """
+    __slots__ = ("children",)
+    FORMAT = S_IFDIR
+
+    def __init__(self, path: Path,
+                 mode: int = 0o777,
+                 uid: int = -1,
+                 gid: int = -1):
+        super().__init__(path, mode=mode, uid=uid, gid=gid)
+        self.children = dict()
+
+    def clone(self) -> 'FakeDirectory':
+        """Clone the directory, sharing its children."""
+        directory = super().clone()
+        directory.children = dict(self.children)
+        return directory
+
     def parts(self) -> typing.List[Path]:
         """returns the parts the directory is made of"""
         path_so_far = Path()
@@ -44,8 +170,34 @@ class FakeDirectory(FakeFileLikeObject):
             yield path_so_far
 
 
+FakeFilesystemSnapshot = namedtuple('FakeFilesystemSnapshot',
+                                    ['index', 'detached', 'inodes',
+                                     'user', 'effective_user'])
+
+FakeEntry = namedtuple('FakeEntry', ['path', 'kind', 'mode', 'uid', 'gid'],
+                       defaults=(0o777, None, None))
+
+FakeHandle = namedtuple('FakeHandle', ['path', 'key', 'target', 'parent'])
+
+KINDS = {'file': FakeFile, 'directory': FakeDirectory}
+
+_UNPLACED = Path()
+
+
 class AbstractFilesystem(ABC):
     # pylint: disable=missing-docstring
+    @abstractmethod
+    def resolve(self, path: Path) -> FakeHandle:
+        pass
+
+    @abstractmethod
+    def lookup(self, key: str) -> typing.Optional[FakeFileLikeObject]:
+        pass
+
+    @abstractmethod
+    def search(self, path: Path) -> FakeHandle:
+        pass
+
     @abstractmethod
     def has_directory(self, path: Path) -> bool:
         pass
@@ -106,37 +258,374 @@ class AbstractFilesystem(ABC):
     def access(self, path: Path, mode: int, effective_ids: bool):
         pass
 
+    @abstractproperty
+    def resolver(self) -> PathResolver:
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> FakeFilesystemSnapshot:
+        pass
+
+    @abstractmethod
+    def restore(self, snapshot: FakeFilesystemSnapshot):
+        pass
+
+    @abstractmethod
+    def fork(self) -> 'AbstractFilesystem':
+        pass
+
+    @abstractmethod
+    def populate(self, entries: typing.Iterable[tuple]):
+        pass
+
+    @abstractmethod
+    def truncate(self, path: Path, length: int):
+        pass
+
+    @abstractmethod
+    def stat(self, path: Path) -> _os.stat_result:
+        pass
+
+    @abstractmethod
+    def fstat(self, file_object: FakeFileLikeObject) -> _os.stat_result:
+        pass
+
+    @abstractmethod
+    def walk(self, path: Path, topdown: bool, onerror: typing.Callable,
+             can_list: typing.Callable) -> typing.Iterator[tuple]:
+        pass
+
+    @abstractmethod
+    def open(self, path: Path, mode: str) -> FakeFileIO:
+        pass
+
+    @abstractmethod
+    def image(self, root: Path) -> bytes:
+        pass
+
+    @abstractmethod
+    def share(self, root: Path, name: str) -> shared_memory.SharedMemory:
+        pass
+
+    @abstractmethod
+    def save(self, path: str, root: Path):
+        pass
+
 class FakeFilesystem(AbstractFilesystem):
-    """I mock the behaviour of an entire filesystem."""
+    """I mock the behaviour of an entire filesystem.
+
+    The link counts and timestamps of everything in me are kept in an
+    InodeTable rather than on the file-like objects themselves.
+
+    Attributes:
+        clock (callable): returns the current time in nanoseconds.
+    """
     def __init__(self,
                  directories=None,
                  files=None,
                  operating_system: FakeOperatingSystem = None,
-                 user: FakeUser = None):
+                 user: FakeUser = None,
+                 resolver: PathResolver = None):
+
+        self._resolver = resolver or PathResolver()
+        self._lazy = False
+        self._index = LayeredDict()
+        self._detached = LayeredDict()
+        self._inodes = InodeTable()
+        self._loading = threading.Lock()
+        self._opened = weakref.WeakSet()
+        self.clock = time.time_ns
+        for file_object in chain(directories or (), files or ()):
+            key = self._key(file_object.path)
+            if key not in self._index:
+                self._link(key, file_object)
 
-        self.directories = directories or list()
-        self.files = files or list()
         self._user = user or Root()
         self._effective_user = self._user.clone()
         self.operating_system = operating_system or FakeUnix()
 
-    def __getitem__(self, path: Path) -> FakeFileLikeObject:
-        if isinstance(path, str):
-            path = Path(path)
+    def __getstate__(self) -> dict:
+        """Return what copying or pickling me copies, which leaves out the
+        lock held while loading, as locks cannot be copied, and the files I
+        opened, which stay with me."""
+        state = dict(self.__dict__)
+        del state["_loading"]
+        del state["_opened"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._loading = threading.Lock()
+        self._opened = weakref.WeakSet()
+
+    def _key(self, path: Path) -> str:
+        """Return the key path is indexed by."""
+        key = self._resolver.key(path)
+        if self._lazy:
+            self._materialize(key)
+
+        return key
+
+    def _materialize(self, key: str):
+        """Load the mirrored directories leading to key, and key itself."""
+        names = list()
+        while key not in self._index:
+            if key == SEPARATOR:
+                return
+
+            names.append(name_of(key))
+            key = parent_of(key)
+
+        while isinstance(self._index.get(key), FakeDirectory):
+            if self._index[key]._source is not None:
+                self._load(key)
+
+            if not names:
+                return
+
+            key = child_of(key, names.pop())
+
+    def _load(self, key: str):
+        """Copy the children of the directory at key from its source.
+
+        Only the directory itself is read; the directories inside it are
+        loaded when they are needed. Reading a path may load directories, so
+        loading holds a lock of its own, and the directory is marked as
+        loaded only once all its children are in."""
+        with self._loading:
+            if self._index[key]._source is not None:
+                self._load_children(key)
+
+    def _load_children(self, key: str):
+        """Copy the children of the directory at key from its source."""
+        directory = self._writable(key)
+        for entry in directory._source.entries():
+            file_object = self._lazy_node(entry)
+            if directory.children.setdefault(entry.name,
+                                             file_object) is file_object:
+                file_object._name = entry.name
+                file_object._parent = directory
+                self._index[child_of(key, entry.name)] = file_object
+
+        directory._source = None
+
+    def _lazy_node(self, entry: SourceEntry) -> FakeFileLikeObject:
+        """Create the object described by entry, which loads its children or
+        its contents from the source of entry once they are needed. It is
+        given its name and parent when it is put in a directory."""
+        kind = FakeDirectory if entry.is_directory else FakeFile
+        file_object = kind(_UNPLACED, entry.mode,
+                           uid=entry.uid, gid=entry.gid)
+        file_object._source = entry.source
+        file_object.ino = self._inodes.allocate(entry.nlink, entry.atime,
+                                                entry.mtime, entry.ctime)
+        return file_object
+
+    @staticmethod
+    def _read_source(file_object: 'FakeFile'):
+        """Copy the contents of a file from its source, once."""
+        file_object.contents = FakeContents.from_extents(
+            file_object._source.extents(), file_object._source.size())
+        file_object._source = None
+
+    def _writable(self, key: str) -> FakeFileLikeObject:
+        """Return the object at key, ready to be changed.
+
+        Objects shared with a snapshot or a fork are copied first, together
+        with the directories leading to them which are shared as well."""
+        shared = list()
+        ancestor = key
+        while not self._index.owns(ancestor):
+            shared.append(ancestor)
+            parent = parent_of(ancestor)
+            if (ancestor == SEPARATOR or
+                    not isinstance(self._index.get(parent), FakeDirectory)):
+                break
+
+            ancestor = parent
+
+        for ancestor in reversed(shared):
+            file_object = self._clone(self._index[ancestor])
+            self._index[ancestor] = file_object
+            self._attach(ancestor, file_object)
+
+        return self._index[key]
+
+    def _clone(self, file_object: FakeFileLikeObject) -> FakeFileLikeObject:
+        """Return a copy of file_object to change instead of it, moving the
+        files I opened on it to the copy, so what is written to them stays
+        in me rather than in a snapshot or a fork."""
+        clone = file_object.clone()
+        if isinstance(file_object, FakeFile):
+            for file in list(self._opened):
+                if file.closed:
+                    self._opened.discard(file)
+
+                elif file.file_object is file_object:
+                    file.file_object = clone
+
+        return clone
+
+    def _writable_detached(self, key: str) -> dict:
+        """Return the detached objects waiting for key, ready to be changed.
+
+        Objects whose parent directory is not in the filesystem are kept
+        detached until that directory is created."""
+        if not self._detached.owns(key):
+            self._detached[key] = dict(self._detached.get(key, dict()))
+
+        return self._detached[key]
+
+    def _attach(self, key: str, file_object: FakeFileLikeObject):
+        """Put file_object inside the directory containing key."""
+        file_object._name = sys.intern(name_of(key))
+        if key == SEPARATOR:
+            file_object._parent = Path(SEPARATOR)
+            return
+
+        parent = self._index.get(parent_of(key))
+        if isinstance(parent, FakeDirectory):
+            parent = self._writable(parent_of(key))
+            parent.children[file_object.name] = file_object
+            file_object._parent = parent
+
+        else:
+            self._writable_detached(parent_of(key))[
+                file_object.name] = file_object
+            file_object._parent = Path(parent_of(key))
+
+    def _detach(self, key: str):
+        """Take the object at key out of the directory containing it."""
+        if key == SEPARATOR:
+            return
 
-        for file_object in self:
-            if file_object.path.absolute() == path.absolute():
-                return file_object
+        parent = self._index.get(parent_of(key))
+        if isinstance(parent, FakeDirectory):
+            del self._writable(parent_of(key)).children[name_of(key)]
+
+        else:
+            siblings = self._writable_detached(parent_of(key))
+            del siblings[name_of(key)]
+            if not siblings:
+                del self._detached[parent_of(key)]
+
+    def _link(self, key: str, file_object: FakeFileLikeObject):
+        """Put file_object in the filesystem at key."""
+        is_directory = isinstance(file_object, FakeDirectory)
+        if not file_object.ino:
+            now = self.clock()
+            file_object.ino = self._inodes.allocate(2 if is_directory else 1,
+                                                    now, now, now)
+
+        self._index[key] = file_object
+        self._attach(key, file_object)
+        self._count_link(key, 1 if is_directory else 0)
+
+        if is_directory and key in self._detached:
+            for name, orphan in self._detached.pop(key).items():
+                if not self._index.owns(child_of(key, name)):
+                    orphan = self._clone(orphan)
+                    self._index[child_of(key, name)] = orphan
+
+                orphan._parent = file_object
+                if (file_object.children.setdefault(name, orphan) is orphan and
+                        isinstance(orphan, FakeDirectory)):
+                    self._inodes[file_object.ino, "nlink"] += 1
+
+    def _unlink(self, key: str) -> FakeFileLikeObject:
+        """Take the object at key out of the filesystem and return it."""
+        self._detach(key)
+        file_object = self._index.pop(key)
+        self._count_link(key, -1 if isinstance(file_object, FakeDirectory)
+                         else 0)
+        return file_object
+
+    def _count_link(self, key: str, links: int):
+        """Touch the directory containing key after linking or unlinking,
+        adding links to its link count."""
+        parent = self._index.get(parent_of(key))
+        if key != SEPARATOR and isinstance(parent, FakeDirectory):
+            self._touch(parent.ino)
+            self._inodes[parent.ino, "nlink"] += links
+
+    def _touch(self, ino: int, *columns: str):
+        """Set the timestamps of ino to now; modification and change
+        times unless columns are given."""
+        now = self.clock()
+        for column in columns or ("mtime", "ctime"):
+            self._inodes[ino, column] = now
+
+    def _rekey(self, directory: 'FakeDirectory', src: str, dst: str):
+        """Move everything inside a moved directory to its new keys.
+
+        Objects shared with a snapshot or a fork still point at the
+        directories they were in before the move, so they are copied."""
+        stack = [(directory, src, dst)]
+        while stack:
+            directory, src, dst = stack.pop()
+            for name, file_object in list(directory.children.items()):
+                old, new = child_of(src, name), child_of(dst, name)
+                if not self._index.owns(old):
+                    file_object = self._clone(file_object)
+                    directory.children[name] = file_object
+
+                del self._index[old]
+                self._index[new] = file_object
+                file_object._parent = directory
+                if isinstance(file_object, FakeDirectory):
+                    stack.append((file_object, old, new))
+
+    def resolve(self, path: Path) -> FakeHandle:
+        """Resolve path, once, into a handle on what it leads to and on the
+        directory containing that. A handle is returned as it is, so it can
+        be passed on instead of path."""
+        if isinstance(path, FakeHandle):
+            return path
+
+        key = self._key(path)
+        parent = None if key == SEPARATOR else self._index.get(parent_of(key))
+        return FakeHandle(path, key, self._index.get(key), parent)
+
+    def search(self, path: Path) -> FakeHandle:
+        """Resolve path for entering the directory it leads to, as chdir
+        does. There are no permissions to check, so this is resolve."""
+        return self.resolve(path)
+
+    def lookup(self, key: str) -> typing.Optional[FakeFileLikeObject]:
+        """Return what is at a key that was already resolved, if anything."""
+        return self._index.get(key)
 
-        raise FileNotFoundError(path)
+    def __getitem__(self, path: Path) -> FakeFileLikeObject:
+        handle = self.resolve(path)
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
+
+        return handle.target
 
     def __iter__(self) -> typing.Iterator[FakeFileLikeObject]:
         return iter(self.directories + self.files)
 
+    @property
+    def directories(self) -> typing.List['FakeDirectory']:
+        """Return all the directories in the filesystem."""
+        return [file_object for file_object in self._index.values()
+                if isinstance(file_object, FakeDirectory)]
+
+    @property
+    def files(self) -> typing.List['FakeFile']:
+        """Return all the files in the filesystem."""
+        return [file_object for file_object in self._index.values()
+                if isinstance(file_object, FakeFile)]
+
     @property
     def user(self):
         return self._user
 
+    @property
+    def resolver(self) -> PathResolver:
+        """Return the resolver turning paths into keys."""
+        return self._resolver
+
     @property
     def curdir(self):
         """Return a path representing the current directory."""
@@ -144,115 +633,530 @@ class FakeFilesystem(AbstractFilesystem):
 
     def has(self, path) -> bool:
         """Whether or not path already exists"""
-        return self.has_directory(path) or self.has_file(path)
+        return self.resolve(path).target is not None
+
+    def _can_create(self, handle: FakeHandle) -> bool:
+        """Whether or not the directory containing handle exists, or is the
+        current directory and handle was given a relative path."""
+        parent = parent_of(handle.key)
+        return (handle.parent is not None or parent == handle.key or
+                (parent == self.resolver.cwd_key and
+                 not Path(handle.path).is_absolute()))
 
     def mkdir(self, path: Path, mode: int = 0o777):
         """Create an empty directory."""
-        if self.has(path):
+        handle = self.resolve(path)
+        if handle.target is not None:
             raise FileExistsError
 
-        if (path.parent != self.curdir and
-                path.parent != path and not self.has(path.parent)):
+        if not self._can_create(handle):
             raise FileNotFoundError
 
-        self.directories.append(FakeDirectory(path,
-                                              mode,
-                                              uid=self.user.uid,
-                                              gid=self.user.gid)
-                               )
+        self._link(handle.key, FakeDirectory(handle.path,
+                                             mode,
+                                             uid=self.user.uid,
+                                             gid=self.user.gid))
+
+    def open(self, path: Path, mode: str = "r") -> FakeFileIO:
+        """Open a file, creating it first unless mode is for reading only."""
+        FakeFileIO.check_mode(mode)
+        handle = self.resolve(path)
+        key, file_object = handle.key, handle.target
+        if isinstance(file_object, FakeDirectory):
+            raise IsADirectoryError(handle.path)
+
+        if file_object is None:
+            if "r" in mode:
+                raise FileNotFoundError(handle.path)
+
+            if isinstance(handle.parent, FakeFile):
+                raise NotADirectoryError(handle.path)
+
+            if not self._can_create(handle):
+                raise FileNotFoundError(handle.path)
+
+            file_object = FakeFile(handle.path, 0o666,
+                                   uid=self.user.uid,
+                                   gid=self.user.gid)
+            self._link(key, file_object)
+
+        elif "x" in mode:
+            raise FileExistsError(handle.path)
+
+        if ("r" not in mode or "+" in mode or
+                file_object._source is not None):
+            file_object = self._writable(key)
+
+        if "w" in mode:
+            file_object.contents = FakeContents()
+            file_object._source = None
+            self._touch(file_object.ino)
+
+        elif file_object._source is not None:
+            self._read_source(file_object)
+
+        file = FakeFileIO(file_object, name=str(handle.path), mode=mode,
+                          touch=partial(self._touch, file_object.ino))
+        self._opened.add(file)
+        return file
+
+    def stat(self, path: Path) -> _os.stat_result:
+        """Return the status of a file-like object."""
+        return self.fstat(self[path])
+
+    def fstat(self, file_object: FakeFileLikeObject) -> _os.stat_result:
+        """Return the status of a file-like object that was already looked
+        up, straight from its row in the inode table."""
+        nlink, atime, mtime, ctime = self._inodes.row(file_object.ino)
+        return _os.stat_result((
+            file_object.FORMAT | file_object.mode, file_object.ino, 0, nlink,
+            file_object.uid, file_object.gid, file_object.size,
+            atime // 10 ** 9, mtime // 10 ** 9, ctime // 10 ** 9,
+            atime / 10 ** 9, mtime / 10 ** 9, ctime / 10 ** 9,
+            atime, mtime, ctime))
 
     def makedirs(self, path: Path, mode: int = 0o777, exist_ok=False):
-        """Recursively make path to a directory."""
-        if self.has(path) and not exist_ok:
-            raise OSError(path)
+        """Recursively make path to a directory.
+
+        Only path itself is resolved; the directories leading to it are
+        found by walking up its key, up to the current directory when path
+        is relative."""
+        handle = self.resolve(path)
+        if handle.target is not None and not exist_ok:
+            raise OSError(handle.path)
 
-        for part in FakeDirectory(path).parts():
-            if self.has_file(part):
-                raise FileExistsError
+        relative = not Path(handle.path).is_absolute()
+        missing, key = list(), handle.key
+        while key not in self._index:
+            if relative and key == self.resolver.cwd_key:
+                break
+
+            missing.append(key)
+            if key == SEPARATOR:
+                break
+
+            key = parent_of(key)
+
+        if isinstance(self._index.get(key), FakeFile):
+            raise FileExistsError
 
-            if not self.has_directory(part):
-                self.mkdir(part, mode)
+        for key in reversed(missing):
+            self._link(key, FakeDirectory(Path(key),
+                                          mode,
+                                          uid=self.user.uid,
+                                          gid=self.user.gid))
 
     def has_directory(self, path: Path) -> bool:
         """Whether or not such a directory exists."""
-        return path.absolute() in (d.path.absolute() for d in self.directories)
+        return isinstance(self.resolve(path).target, FakeDirectory)
 
     def has_file(self, path: Path) -> bool:
         """Whether or not such a file exists."""
-        return path.absolute() in (f.path.absolute() for f in self.files)
+        return isinstance(self.resolve(path).target, FakeFile)
 
     def listdir(self, path: Path) -> typing.Iterator[FakeFileLikeObject]:
         """List all files in a directory"""
-        for file_object in self:
-            if file_object.parent.absolute() == path.absolute():
-                yield file_object
+        handle = self.resolve(path)
+        children = self._children(handle.key, handle.target)
+        yield from list((children or dict()).values())
+
+    def _children(self, key: str, directory: typing.Optional[
+            FakeFileLikeObject]) -> typing.Optional[dict]:
+        """Return the children of directory, found at key, or None if it is
+        not a directory. Directories missing from me but holding detached
+        objects are listed as well."""
+        if isinstance(directory, FakeDirectory):
+            if directory._source is not None:
+                self._load(key)
+                directory = self._index[key]
+
+            return directory.children
+
+        if directory is None:
+            return self._detached.get(key)
+
+        return None
+
+    def walk(self, path: Path, topdown: bool = True,
+             onerror: typing.Callable = None,
+             can_list: typing.Callable = None) -> typing.Iterator[tuple]:
+        """Walk the tree rooted at path, as os.walk does.
+
+        Yield a (dirpath, dirnames, filenames, directory) tuple for every
+        directory, straight from the children of each directory without
+        resolving any path but the first. With topdown, removing names from
+        dirnames prunes them from the walk. Errors are passed to onerror,
+        and so are directories for which can_list returns False."""
+        handle = self.resolve(path)
+        stack = [(False, _os.fspath(handle.path), handle.key, handle.target)]
+        while stack:
+            done, dirpath, key, directory = stack.pop()
+            if done:
+                yield dirpath
+                continue
+
+            children = self._children(key, directory)
+            if children is None:
+                if onerror is not None:
+                    error = (NotADirectoryError if directory is not None
+                             else FileNotFoundError)
+                    onerror(error(dirpath))
+
+                continue
+
+            directory = self._index.get(key)
+            if (can_list is not None and directory is not None and
+                    not can_list(directory)):
+                if onerror is not None:
+                    onerror(PermissionError(dirpath))
+
+                continue
+
+            dirnames, subdirectories = list(), dict()
+            filenames = list()
+            for name, child in children.items():
+                if isinstance(child, FakeDirectory):
+                    dirnames.append(name)
+                    subdirectories[name] = child
+
+                else:
+                    filenames.append(name)
+
+            if topdown:
+                yield dirpath, dirnames, filenames, directory
+
+            else:
+                stack.append((True, (dirpath, dirnames, filenames, directory),
+                              None, None))
+
+            for name in reversed(dirnames):
+                stack.append((False, _os.path.join(dirpath, name),
+                              child_of(key, name), subdirectories.get(name)))
 
     def chown(self, path: Path, uid: int = -1, gid: int = -1):
         """Change the ownership of a file."""
+        handle = self.resolve(path)
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
+
         if uid != -1:
-            self[path].uid = uid
+            self._writable(handle.key).uid = uid
 
         if gid != -1:
-            self[path].gid = gid
+            self._writable(handle.key).gid = gid
+
+        self._touch(handle.target.ino, "ctime")
 
     def chmod(self, path: Path, mode: int):
         """Chnage the mode of a file."""
         if not isinstance(mode, int):
             raise TypeError(mode)
 
-        self[path].mode = mode
+        handle = self.resolve(path)
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
+
+        self._writable(handle.key).mode = mode
+        self._touch(handle.target.ino, "ctime")
+
+    def truncate(self, path: Path, length: int):
+        """Truncate a file to length bytes, leaving a hole if it grows."""
+        handle = self.resolve(path)
+        if isinstance(handle.target, FakeDirectory):
+            raise IsADirectoryError(handle.path)
+
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
+
+        file_object = self._writable(handle.key)
+        if file_object._source is not None:
+            self._read_source(file_object)
+
+        file_object.contents.truncate(length)
+        self._touch(file_object.ino)
 
     def rmdir(self, path: Path):
         """Remove a directory."""
-        if self.has_file(path):
-            raise NotADirectoryError(path)
+        handle = self.resolve(path)
+        if isinstance(handle.target, FakeFile):
+            raise NotADirectoryError(handle.path)
 
-        if not self.has_directory(path):
-            raise FileNotFoundError(path)
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
 
-        if list(self.listdir(path)):
-            raise OSError(path)
+        if handle.target.children:
+            raise OSError(handle.path)
 
-        for directory in self.directories:
-            if directory.path.absolute() == path.absolute():
-                self.directories.remove(directory)
+        self._unlink(handle.key)
 
     def remove(self, path: Path):
         """Remove a file."""
-        if self.has_directory(path):
-            raise IsADirectoryError(path)
+        handle = self.resolve(path)
+        if isinstance(handle.target, FakeDirectory):
+            raise IsADirectoryError(handle.path)
 
-        if not self.has_file(path):
-            raise FileNotFoundError(path)
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
 
-        for file in self.files:
-            if file.path.absolute() == path.absolute():
-                self.files.remove(file)
+        self._unlink(handle.key)
 
     def rename(self, src: Path, dst: Path):
-        """Rename a file."""
-        if src == dst:
+        """Rename a file, or a directory unless it is to somewhere inside
+        itself."""
+        source, destination = self.resolve(src), self.resolve(dst)
+        if source.key == destination.key:
             return
 
-        if self.has_directory(dst):
-            raise FileExistsError(dst)
-
-        if isinstance(self.operating_system, FakeWindows) and self.has(dst):
-            raise FileExistsError(dst)
-
-        self[src].path = dst
-
-        for file_object in self:
-            if src in file_object.path.parents:
-                file_object.path = dst / file_object.path.relative_to(src)
+        if isinstance(destination.target, FakeDirectory):
+            raise FileExistsError(destination.path)
+
+        if (isinstance(self.operating_system, FakeWindows) and
+                destination.target is not None):
+            raise FileExistsError(destination.path)
+
+        if source.target is None:
+            raise FileNotFoundError(source.path)
+
+        if destination.key.startswith(source.key.rstrip(SEPARATOR) +
+                                      SEPARATOR):
+            raise OSError(errno.EINVAL, _os.strerror(errno.EINVAL),
+                          str(source.path), None, str(destination.path))
+
+        if destination.target is not None:
+            self._unlink(destination.key)
+
+        self._writable(source.key)
+        file_object = self._unlink(source.key)
+
+        if isinstance(file_object, FakeDirectory):
+            self._rekey(file_object, source.key, destination.key)
+
+        self._link(destination.key, file_object)
+
+    @classmethod
+    def from_manifest(cls, manifest: dict, root: Path = Path("/"),
+                      **kwargs) -> 'FakeFilesystem':
+        """Create a filesystem holding root and everything in manifest.
+
+        A manifest maps names to their contents: a dictionary for a
+        directory and None for a file. For example:
+            {"etc": {"hosts": None}, "tmp": {}}"""
+        filesystem = cls(**kwargs)
+        filesystem.populate(cls._manifest_entries(manifest,
+                                                  filesystem._key(root)))
+        return filesystem
+
+    @classmethod
+    def mirror(cls, root: Path, **kwargs) -> 'FakeFilesystem':
+        """Create a filesystem mirroring the real directory root.
+
+        Nothing but root itself is read up front. Every directory is read
+        the first time something in it is looked up, and from then on lives
+        only in the fake filesystem, which never changes the real one."""
+        filesystem = cls(**kwargs)
+        root_entry = HostSource.entry(_os.path.abspath(root))
+        filesystem._link(filesystem._key(root),
+                         filesystem._lazy_node(root_entry))
+        filesystem._lazy = True
+        return filesystem
+
+    @classmethod
+    def from_image(cls, image: FakeImage, **kwargs) -> 'FakeFilesystem':
+        """Create a filesystem over image.
+
+        The image is a read-only lower layer: every directory is copied out
+        of it the first time something in it is looked up, and every change
+        is made to the filesystem alone."""
+        filesystem = cls(**kwargs)
+        root = image.entry(0)
+        filesystem._link(filesystem._key(Path(root.name)),
+                         filesystem._lazy_node(root))
+        filesystem._lazy = True
+        return filesystem
+
+    def image(self, root: Path = Path(SEPARATOR)) -> bytes:
+        """Return an image of root and everything inside it, which
+        FakeImage reads.
+
+        Directories and files that were not loaded yet are read from their
+        source first. Only the first of their link counts and timestamps
+        is kept, and user and group ids must fit in 64 bits. Only the data
+        files hold is stored, so their holes take no room."""
+        root = self.resolve(root)
+        if root.target is None:
+            raise FileNotFoundError(root.path)
+
+        return FakeImage.dump(self._image_rows(root.key, root.target))
+
+    def _image_rows(self, key: str, root: FakeFileLikeObject
+                    ) -> typing.Iterator[ImageRow]:
+        """Yield a row for root and for everything inside it, breadth first
+        so the children of every directory are next to each other."""
+        nodes = [(key, root)]
+        for index, (key, file_object) in enumerate(nodes):
+            children = self._children(key, file_object) or dict()
+            first = len(nodes)
+            nodes.extend((child_of(key, name), child)
+                         for name, child in children.items())
+            if isinstance(file_object, FakeDirectory):
+                size, extents = 0, ()
+
+            elif file_object._source is not None:
+                size = file_object._source.size()
+                extents = file_object._source.extents()
+
+            else:
+                size = len(file_object.contents)
+                extents = file_object.contents.extents()
+
+            yield ImageRow(key if index == 0 else file_object.name,
+                           isinstance(file_object, FakeDirectory),
+                           file_object.mode, file_object.uid, file_object.gid,
+                           *self._inodes.row(file_object.ino),
+                           first, len(children), size, extents)
+
+    def share(self, root: Path = Path(SEPARATOR),
+              name: str = None) -> shared_memory.SharedMemory:
+        """Put an image of root and everything inside it in a new block of
+        shared memory, and return that block.
+
+        Processes attach to the block by its name. Whoever shares it owns
+        it, and should close and unlink it once no process needs it."""
+        image = self.image(root)
+        memory = shared_memory.SharedMemory(name=name, create=True,
+                                            size=len(image))
+        memory.buf[:len(image)] = image
+        return memory
+
+    def save(self, path: str, root: Path = Path(SEPARATOR)):
+        """Save an image of root and everything inside it in the real file
+        at path, which load maps back."""
+        with open(path, "wb") as file:
+            file.write(self.image(root))
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'FakeFilesystem':
+        """Create a filesystem over the image saved in the real file at
+        path. The file is mapped read-only, so loading takes constant time
+        and only the directories looked at are ever read."""
+        return cls.from_image(FakeImage.open(path), **kwargs)
+
+    @classmethod
+    def attach(cls, name: str, **kwargs) -> 'FakeFilesystem':
+        """Create a filesystem over the image shared in the block of shared
+        memory called name, mapped read-only and read in place."""
+        return cls.from_image(FakeImage.attach(name), **kwargs)
+
+    @staticmethod
+    def _manifest_entries(manifest: dict,
+                          root: str) -> typing.Iterator[FakeEntry]:
+        """Flatten a manifest into entries."""
+        yield FakeEntry(root, FakeDirectory)
+        stack = [(root, manifest)]
+        while stack:
+            directory, contents = stack.pop()
+            for name, value in contents.items():
+                key = child_of(directory, name)
+                if isinstance(value, dict):
+                    yield FakeEntry(key, FakeDirectory)
+                    stack.append((key, value))
+
+                else:
+                    yield FakeEntry(key, FakeFile)
+
+    def populate(self, entries: typing.Iterable[tuple]):
+        """Add many file-like objects in a single pass.
+
+        Every entry is a (path, kind, mode, uid, gid) record, where kind is
+        'file', 'directory' or a file-like class and the rest are optional.
+        Unlike mkdir, parents are not checked as entries are added, so they
+        may come in any order. The result is validated once at the end, and
+        the filesystem is restored if it is invalid. As with mkdir, entries
+        given relative paths may be put in the current directory even if it
+        is not in the filesystem."""
+        snapshot = self.snapshot()
+        added = list()
+        try:
+            for entry in entries:
+                entry = FakeEntry(*entry)
+                key = self._key(entry.path)
+                if key in self._index:
+                    raise FileExistsError(entry.path)
+
+                kind = KINDS.get(entry.kind, entry.kind)
+                uid = self.user.uid if entry.uid is None else entry.uid
+                gid = self.user.gid if entry.gid is None else entry.gid
+                self._link(key, kind(Path(key), entry.mode, uid=uid, gid=gid))
+                if (parent_of(key) != self.resolver.cwd_key or
+                        Path(entry.path).is_absolute()):
+                    added.append(key)
+
+            self._validate(added)
+
+        except Exception:
+            self.restore(snapshot)
+            raise
+
+    def _validate(self, keys: typing.Iterable[str]):
+        """Make sure the parents of the objects at keys are directories."""
+        for key in keys:
+            parent = parent_of(key)
+            if key == SEPARATOR:
+                continue
+
+            if isinstance(self._index.get(parent), FakeFile):
+                raise NotADirectoryError(parent)
+
+            if parent not in self._index:
+                raise FileNotFoundError(parent)
+
+    def snapshot(self) -> FakeFilesystemSnapshot:
+        """Capture the current state of the filesystem in constant time,
+        but for merging what was changed since earlier snapshots now and
+        then, in time proportional to how much was changed.
+
+        Everything in the filesystem becomes shared with the snapshot and is
+        copied the first time it is changed through the filesystem, along
+        with the directories leading to it and their tables of entries.
+        Objects fetched before the snapshot should not be changed directly.
+        Files opened from the filesystem move to the copy of what they are
+        an opening of, but what is written to them before it is copied is
+        written to the snapshot as well."""
+        return FakeFilesystemSnapshot(index=self._index.freeze(),
+                                      detached=self._detached.freeze(),
+                                      inodes=self._inodes.freeze(),
+                                      user=self.user.clone(),
+                                      effective_user=self.effective_user.clone())
+
+    def restore(self, snapshot: FakeFilesystemSnapshot):
+        """Bring the filesystem back to a snapshot in constant time."""
+        self._index = LayeredDict(snapshot.index)
+        self._detached = LayeredDict(snapshot.detached)
+        self._inodes = InodeTable(*snapshot.inodes)
+        self._user = snapshot.user.clone()
+        self._effective_user = snapshot.effective_user.clone()
+
+    def fork(self) -> 'FakeFilesystem':
+        """Return an independent copy of the filesystem in constant time.
+
+        Both filesystems share everything until it is changed in either."""
+        filesystem = FakeFilesystem(
+            operating_system=self.operating_system,
+            resolver=PathResolver(cwd=self.resolver.cwd,
+                                  cache_size=self.resolver.cache_size))
+        filesystem.restore(self.snapshot())
+        filesystem._lazy = self._lazy
+        filesystem.clock = self.clock
+        return filesystem
 
     def access(self, path: Path, mode: int, effective_ids: bool):
         """Test access for a file object."""
+        handle = self.resolve(path)
         if mode == 0:
-            return self.has(path)
+            return handle.target is not None
 
         user = self.user if not effective_ids else self.effective_user
-        return user.can_access(self[path], action_mask=mode)
+        return user.can_access(self[handle], action_mask=mode)
 
     def set_user(self, user: FakeUser):
         """Set the user."""
@@ -269,11 +1173,102 @@ class FakeFilesystem(AbstractFilesystem):
 class FakeFilesystemWithPermissions(AbstractFilesystem):
     """A filesystem decorator implementing user permissions.
 
+    As in POSIX, reaching anything requires permission to search (execute)
+    every directory leading to it. Whether a user may search all the way
+    down to a directory is cached per uid and gid, and forgotten for a whole
+    subtree when chmod, chown, rename or rmdir change it. Only directories
+    whose every ancestor exists are cached, so creating a directory never
+    makes the cache stale.
+
+    Every path is resolved once, by the encapsulated filesystem, and the
+    permissions are checked against the handle it returns, which is then
+    passed on in place of the path.
+
     Attributes:
         filesystem (FakeFilesystem): encapsulated file system.
     """
+    SEARCH_CACHE_SIZE = 4096
+
     def __init__(self, filesystem: AbstractFilesystem):
         self.filesystem = filesystem
+        self._searchable = dict()
+
+    def _can_search(self, key: str, user: FakeUser = None) -> bool:
+        """Whether or not the user, or the given user, can search every
+        directory up to and including the one at key."""
+        user = user or self.user
+        if user.is_sudoer:
+            return True
+
+        cache = self._searchable.setdefault((user.uid, user.gid), dict())
+        if len(cache) > self.SEARCH_CACHE_SIZE:
+            cache.clear()
+
+        pending = list()
+        searchable = cache.get(key)
+        while searchable is None:
+            pending.append(key)
+            if key == SEPARATOR:
+                break
+
+            key = parent_of(key)
+            searchable = cache.get(key)
+
+        complete = searchable is not None
+        searchable = searchable is not False
+        for key in reversed(pending):
+            directory = self.filesystem.lookup(key)
+            if not isinstance(directory, FakeDirectory):
+                complete = False
+                continue
+
+            searchable = searchable and user.can_execute(directory)
+            if complete or key == SEPARATOR:
+                complete = True
+                cache[key] = searchable
+
+        return searchable
+
+    def _check_search(self, handle: FakeHandle):
+        """Raise PermissionError unless the user can search every directory
+        leading to handle."""
+        key = handle.key
+        if key != SEPARATOR and not self._can_search(parent_of(key)):
+            raise PermissionError(handle.path)
+
+    def _resolve_target(self, path: Path) -> FakeHandle:
+        """Resolve path, checking it can be searched for and that it
+        exists."""
+        handle = self.resolve(path)
+        self._check_search(handle)
+        if handle.target is None:
+            raise FileNotFoundError(handle.path)
+
+        return handle
+
+    def _forget(self, key: str):
+        """Forget what was cached about searching key and everything
+        inside it."""
+        prefix = key if key == SEPARATOR else key + SEPARATOR
+        for cache in self._searchable.values():
+            for cached in [cached for cached in cache
+                           if cached == key or cached.startswith(prefix)]:
+                del cache[cached]
+
+    def resolve(self, path: Path) -> FakeHandle:
+        return self.filesystem.resolve(path)
+
+    def search(self, path: Path) -> FakeHandle:
+        handle = self.resolve(path)
+        self._check_search(handle)
+        if (isinstance(handle.target, FakeDirectory) and
+                not self._can_search(handle.key)):
+            raise PermissionError(handle.path)
+
+        return handle
+
+    def lookup(self, key: str) -> typing.Optional[FakeFileLikeObject]:
+        return self.filesystem.lookup(key)
 
     def __getitem__(self, item):
         return self.filesystem[item]
@@ -282,57 +1277,105 @@ class FakeFilesystemWithPermissions(AbstractFilesystem):
         return iter(self.filesystem)
 
     def chown(self, path: Path, uid: int = -1, gid: int = -1):
-        if not self.user.can_write(self[path]):
-            raise PermissionError(path)
+        handle = self._resolve_target(path)
+        if not self.user.can_write(handle.target):
+            raise PermissionError(handle.path)
 
-        return self.filesystem.chown(path=path, uid=uid, gid=gid)
+        self._forget(handle.key)
+        return self.filesystem.chown(path=handle, uid=uid, gid=gid)
 
     def chmod(self, path: Path, mode: int):
-        if not self.user.can_write(self[path]):
-            raise PermissionError(path)
+        handle = self._resolve_target(path)
+        if not self.user.can_write(handle.target):
+            raise PermissionError(handle.path)
 
-        return self.filesystem.chmod(path=path, mode=mode)
+        self._forget(handle.key)
+        return self.filesystem.chmod(path=handle, mode=mode)
+
+    def truncate(self, path: Path, length: int):
+        handle = self._resolve_target(path)
+        if not self.user.can_write(handle.target):
+            raise PermissionError(handle.path)
+
+        return self.filesystem.truncate(path=handle, length=length)
+
+    def stat(self, path: Path) -> _os.stat_result:
+        handle = self.resolve(path)
+        self._check_search(handle)
+        return self.filesystem.stat(path=handle)
+
+    def fstat(self, file_object: FakeFileLikeObject) -> _os.stat_result:
+        return self.filesystem.fstat(file_object)
+
+    def walk(self, path: Path, topdown: bool = True,
+             onerror: typing.Callable = None,
+             can_list: typing.Callable = None) -> typing.Iterator[tuple]:
+        def listable(directory):
+            return (self.user.can_execute(directory) and
+                    (can_list is None or can_list(directory)))
+
+        handle = self.resolve(path)
+        self._check_search(handle)
+        return self.filesystem.walk(path=handle, topdown=topdown,
+                                    onerror=onerror, can_list=listable)
 
     def mkdir(self, path: Path, mode: int = 0o777):
-        if self.has_directory(path.parent) and not self.user.can_write(
-                self[path.parent]):
-            raise PermissionError(path.parent)
+        handle = self.resolve(path)
+        self._check_search(handle)
+        if (isinstance(handle.parent, FakeDirectory) and
+                not self.user.can_write(handle.parent)):
+            raise PermissionError(handle.path.parent)
 
-        return self.filesystem.mkdir(path=path, mode=mode)
+        return self.filesystem.mkdir(path=handle, mode=mode)
 
     def listdir(self, path: Path):
-        if not self.user.can_execute(self[path]):
-            raise PermissionError(path)
+        handle = self._resolve_target(path)
+        if not self.user.can_execute(handle.target):
+            raise PermissionError(handle.path)
 
-        return self.filesystem.listdir(path=path)
+        return self.filesystem.listdir(path=handle)
 
     def rmdir(self, path: Path):
-        if not self.user.can_write(self[path]):
-            raise PermissionError(path)
+        handle = self._resolve_target(path)
+        if not self.user.can_write(handle.target):
+            raise PermissionError(handle.path)
 
-        return self.filesystem.rmdir(path=path)
+        self.filesystem.rmdir(path=handle)
+        self._forget(handle.key)
 
     def remove(self, path: Path):
-        if not self.user.can_write(self[path]):
-            raise PermissionError(path)
+        handle = self._resolve_target(path)
+        if not self.user.can_write(handle.target):
+            raise PermissionError(handle.path)
 
-        return self.filesystem.remove(path=path)
+        return self.filesystem.remove(path=handle)
 
     def rename(self, src: Path, dst: Path):
-        if not self.user.can_write(self[src]):
-            raise PermissionError(src)
+        source, destination = self.resolve(src), self.resolve(dst)
+        self._check_search(source)
+        self._check_search(destination)
+        if source.target is None:
+            raise FileNotFoundError(source.path)
 
-        if self.has_directory(dst.parent) and not self.user.can_write(
-                self[dst.parent]):
-            raise PermissionError(dst)
+        if not self.user.can_write(source.target):
+            raise PermissionError(source.path)
 
-        return self.filesystem.rename(src=src, dst=dst)
+        if (isinstance(destination.parent, FakeDirectory) and
+                not self.user.can_write(destination.parent)):
+            raise PermissionError(destination.path)
+
+        self.filesystem.rename(src=source, dst=destination)
+        self._forget(source.key)
+        self._forget(destination.key)
 
     def has(self, path: Path) -> bool:
         return self.filesystem.has(path=path)
 
     def makedirs(self, path: Path, mode: int = 0o777, exist_ok: bool = False):
-        return self.filesystem.makedirs(path=path, mode=mode, exist_ok=exist_ok)
+        handle = self.resolve(path)
+        self._check_search(handle)
+        return self.filesystem.makedirs(path=handle, mode=mode,
+                                        exist_ok=exist_ok)
 
     @property
     def user(self):
@@ -345,13 +1388,408 @@ class FakeFilesystemWithPermissions(AbstractFilesystem):
         return self.filesystem.has_file(path=path)
 
     def access(self, path: Path, mode: int, effective_ids: bool):
+        handle = self.resolve(path)
+        user = self.effective_user if effective_ids else self.user
+        if (handle.key != SEPARATOR and
+                not self._can_search(parent_of(handle.key), user)):
+            return False
+
+        return self.filesystem.access(path=handle,
+                                      mode=mode,
+                                      effective_ids=effective_ids)
+
+    def set_user(self, user: FakeUser):
+        return self.filesystem.set_user(user)
+
+    @property
+    def resolver(self) -> PathResolver:
+        return self.filesystem.resolver
+
+    def snapshot(self) -> FakeFilesystemSnapshot:
+        return self.filesystem.snapshot()
+
+    def restore(self, snapshot: FakeFilesystemSnapshot):
+        self._searchable.clear()
+        return self.filesystem.restore(snapshot)
+
+    def fork(self) -> 'FakeFilesystemWithPermissions':
+        return FakeFilesystemWithPermissions(self.filesystem.fork())
+
+    def populate(self, entries: typing.Iterable[tuple]):
+        return self.filesystem.populate(entries)
+
+    def image(self, root: Path = Path(SEPARATOR)) -> bytes:
+        return self.filesystem.image(root)
+
+    def share(self, root: Path = Path(SEPARATOR),
+              name: str = None) -> shared_memory.SharedMemory:
+        return self.filesystem.share(root, name)
+
+    def save(self, path: str, root: Path = Path(SEPARATOR)):
+        return self.filesystem.save(path, root)
+
+    def open(self, path: Path, mode: str = "r") -> FakeFileIO:
+        handle = self.resolve(path)
+        self._check_search(handle)
+        if isinstance(handle.target, FakeFile):
+            if (("r" in mode or "+" in mode) and
+                    not self.user.can_read(handle.target)):
+                raise PermissionError(handle.path)
+
+            if (("r" not in mode or "+" in mode) and
+                    not self.user.can_write(handle.target)):
+                raise PermissionError(handle.path)
+
+        elif (isinstance(handle.parent, FakeDirectory) and
+              not self.user.can_write(handle.parent)):
+            raise PermissionError(handle.path.parent)
+
+        return self.filesystem.open(path=handle, mode=mode)
+
+    @property
+    def effective_user(self) -> FakeUser:
+        return self.filesystem.effective_user
+
+
+class FakeFilesystemWithLocks(AbstractFilesystem):
+    """A filesystem decorator for sharing a filesystem between threads.
+
+    Every call holds a single ReadWriteLock for as long as it runs. Calls
+    that only look things up, such as has, listdir, access and stat, hold it
+    for reading and never wait for each other; every other call holds it for
+    writing. open writes, since it may create, empty or load a file, and the
+    files it opens hold the lock for reading while they are read and for
+    writing while they are written, truncated or closed. listdir and walk
+    gather what they list while holding the lock.
+
+    A handle resolved outside of me, for example by a permissions decorator
+    around me, may be out of date by the time the lock is held, so I pass
+    on the path it was resolved from, to be resolved again under the lock.
+    Permissions checked outside of me are checked before the lock is held;
+    to check them under it, put the permissions decorator inside me.
+
+    Attributes:
+        filesystem (AbstractFilesystem): encapsulated file system.
+        lock (ReadWriteLock): the lock held by every call.
+    """
+    def __init__(self, filesystem: AbstractFilesystem):
+        self.filesystem = filesystem
+        self.lock = ReadWriteLock()
+
+    @staticmethod
+    def _path(path: Path) -> Path:
+        """Return the path a handle was resolved from, or path itself."""
+        return path.path if isinstance(path, FakeHandle) else path
+
+    def resolve(self, path: Path) -> FakeHandle:
+        with self.lock.reading():
+            return self.filesystem.resolve(self._path(path))
+
+    def search(self, path: Path) -> FakeHandle:
+        with self.lock.reading():
+            return self.filesystem.search(self._path(path))
+
+    def lookup(self, key: str) -> typing.Optional[FakeFileLikeObject]:
+        with self.lock.reading():
+            return self.filesystem.lookup(key)
+
+    def __getitem__(self, item):
+        with self.lock.reading():
+            return self.filesystem[self._path(item)]
+
+    def __iter__(self):
+        with self.lock.reading():
+            return iter(list(self.filesystem))
+
+    def has(self, path: Path) -> bool:
+        with self.lock.reading():
+            return self.filesystem.has(path=self._path(path))
+
+    def has_directory(self, path: Path) -> bool:
+        with self.lock.reading():
+            return self.filesystem.has_directory(path=self._path(path))
+
+    def has_file(self, path: Path) -> bool:
+        with self.lock.reading():
+            return self.filesystem.has_file(path=self._path(path))
+
+    def access(self, path: Path, mode: int, effective_ids: bool):
+        with self.lock.reading():
+            return self.filesystem.access(path=self._path(path),
+                                          mode=mode,
+                                          effective_ids=effective_ids)
+
+    def listdir(self, path: Path):
+        with self.lock.reading():
+            return iter(list(self.filesystem.listdir(
+                path=self._path(path))))
+
+    def stat(self, path: Path) -> _os.stat_result:
+        with self.lock.reading():
+            return self.filesystem.stat(path=self._path(path))
+
+    def fstat(self, file_object: FakeFileLikeObject) -> _os.stat_result:
+        with self.lock.reading():
+            return self.filesystem.fstat(file_object)
+
+    def walk(self, path: Path, topdown: bool = True,
+             onerror: typing.Callable = None,
+             can_list: typing.Callable = None) -> typing.Iterator[tuple]:
+        walker = None
+        while True:
+            with self.lock.reading():
+                if walker is None:
+                    walker = self.filesystem.walk(path=self._path(path),
+                                                  topdown=topdown,
+                                                  onerror=onerror,
+                                                  can_list=can_list)
+
+                step = next(walker, None)
+
+            if step is None:
+                return
+
+            yield step
+
+    def mkdir(self, path: Path, mode: int = 0o777):
+        with self.lock.writing():
+            return self.filesystem.mkdir(path=self._path(path), mode=mode)
+
+    def makedirs(self, path: Path, mode: int = 0o777, exist_ok: bool = False):
+        with self.lock.writing():
+            return self.filesystem.makedirs(path=self._path(path), mode=mode,
+                                            exist_ok=exist_ok)
+
+    def open(self, path: Path, mode: str = "r") -> FakeFileIO:
+        with self.lock.writing():
+            file = self.filesystem.open(path=self._path(path), mode=mode)
+
+        file.lock = self.lock
+        return file
+
+    def chown(self, path: Path, uid: int = -1, gid: int = -1):
+        with self.lock.writing():
+            return self.filesystem.chown(path=self._path(path),
+                                         uid=uid, gid=gid)
+
+    def chmod(self, path: Path, mode: int):
+        with self.lock.writing():
+            return self.filesystem.chmod(path=self._path(path), mode=mode)
+
+    def truncate(self, path: Path, length: int):
+        with self.lock.writing():
+            return self.filesystem.truncate(path=self._path(path),
+                                            length=length)
+
+    def rmdir(self, path: Path):
+        with self.lock.writing():
+            return self.filesystem.rmdir(path=self._path(path))
+
+    def remove(self, path: Path):
+        with self.lock.writing():
+            return self.filesystem.remove(path=self._path(path))
+
+    def rename(self, src: Path, dst: Path):
+        with self.lock.writing():
+            return self.filesystem.rename(src=self._path(src),
+                                          dst=self._path(dst))
+
+    @property
+    def user(self):
+        return self.filesystem.user
+
+    def set_user(self, user: FakeUser):
+        with self.lock.writing():
+            return self.filesystem.set_user(user)
+
+    @property
+    def effective_user(self) -> FakeUser:
+        return self.filesystem.effective_user
+
+    @property
+    def resolver(self) -> PathResolver:
+        return self.filesystem.resolver
+
+    def snapshot(self) -> FakeFilesystemSnapshot:
+        with self.lock.writing():
+            return self.filesystem.snapshot()
+
+    def restore(self, snapshot: FakeFilesystemSnapshot):
+        with self.lock.writing():
+            return self.filesystem.restore(snapshot)
+
+    def fork(self) -> 'FakeFilesystemWithLocks':
+        with self.lock.writing():
+            return FakeFilesystemWithLocks(self.filesystem.fork())
+
+    def populate(self, entries: typing.Iterable[tuple]):
+        with self.lock.writing():
+            return self.filesystem.populate(entries)
+
+    def image(self, root: Path = Path(SEPARATOR)) -> bytes:
+        with self.lock.writing():
+            return self.filesystem.image(root)
+
+    def share(self, root: Path = Path(SEPARATOR),
+              name: str = None) -> shared_memory.SharedMemory:
+        with self.lock.writing():
+            return self.filesystem.share(root, name)
+
+    def save(self, path: str, root: Path = Path(SEPARATOR)):
+        with self.lock.writing():
+            return self.filesystem.save(path, root)
+
+
+class FakeFilesystemWithCosts(AbstractFilesystem):
+    """A filesystem decorator charging simulated time for every call.
+
+    Every call is charged to a CostModel under its own name, and so is
+    every read and write of a file opened through me, with its size and
+    position. Nothing ever sleeps: the time only passes on the clock of the
+    cost model.
+
+    Attributes:
+        filesystem (AbstractFilesystem): encapsulated file system.
+        costs (CostModel): what every call is charged to.
+    """
+    def __init__(self, filesystem: AbstractFilesystem,
+                 costs: CostModel = None):
+        self.filesystem = filesystem
+        self.costs = costs or CostModel()
+
+    def _charge(self, operation: str):
+        self.costs.charge(operation)
+
+    def _charge_file(self, ino: int, operation: str, position: int,
+                     size: int):
+        self.costs.charge(operation, size, (ino, position))
+
+    def resolve(self, path: Path) -> FakeHandle:
+        return self.filesystem.resolve(path)
+
+    def search(self, path: Path) -> FakeHandle:
+        self._charge("stat")
+        return self.filesystem.search(path)
+
+    def lookup(self, key: str) -> typing.Optional[FakeFileLikeObject]:
+        return self.filesystem.lookup(key)
+
+    def __getitem__(self, item):
+        return self.filesystem[item]
+
+    def __iter__(self):
+        return iter(self.filesystem)
+
+    def has(self, path: Path) -> bool:
+        self._charge("stat")
+        return self.filesystem.has(path=path)
+
+    def has_directory(self, path: Path) -> bool:
+        self._charge("stat")
+        return self.filesystem.has_directory(path=path)
+
+    def has_file(self, path: Path) -> bool:
+        self._charge("stat")
+        return self.filesystem.has_file(path=path)
+
+    def access(self, path: Path, mode: int, effective_ids: bool):
+        self._charge("access")
         return self.filesystem.access(path=path,
                                       mode=mode,
                                       effective_ids=effective_ids)
 
+    def listdir(self, path: Path):
+        self._charge("listdir")
+        return self.filesystem.listdir(path=path)
+
+    def stat(self, path: Path) -> _os.stat_result:
+        self._charge("stat")
+        return self.filesystem.stat(path=path)
+
+    def fstat(self, file_object: FakeFileLikeObject) -> _os.stat_result:
+        self._charge("fstat")
+        return self.filesystem.fstat(file_object)
+
+    def walk(self, path: Path, topdown: bool = True,
+             onerror: typing.Callable = None,
+             can_list: typing.Callable = None) -> typing.Iterator[tuple]:
+        for step in self.filesystem.walk(path=path, topdown=topdown,
+                                         onerror=onerror, can_list=can_list):
+            self._charge("walk")
+            yield step
+
+    def mkdir(self, path: Path, mode: int = 0o777):
+        self._charge("mkdir")
+        return self.filesystem.mkdir(path=path, mode=mode)
+
+    def makedirs(self, path: Path, mode: int = 0o777, exist_ok: bool = False):
+        self._charge("makedirs")
+        return self.filesystem.makedirs(path=path, mode=mode,
+                                        exist_ok=exist_ok)
+
+    def open(self, path: Path, mode: str = "r") -> FakeFileIO:
+        self._charge("open")
+        file = self.filesystem.open(path=path, mode=mode)
+        file.charge = partial(self._charge_file, file.file_object.ino)
+        return file
+
+    def chown(self, path: Path, uid: int = -1, gid: int = -1):
+        self._charge("chown")
+        return self.filesystem.chown(path=path, uid=uid, gid=gid)
+
+    def chmod(self, path: Path, mode: int):
+        self._charge("chmod")
+        return self.filesystem.chmod(path=path, mode=mode)
+
+    def truncate(self, path: Path, length: int):
+        self._charge("truncate")
+        return self.filesystem.truncate(path=path, length=length)
+
+    def rmdir(self, path: Path):
+        self._charge("rmdir")
+        return self.filesystem.rmdir(path=path)
+
+    def remove(self, path: Path):
+        self._charge("remove")
+        return self.filesystem.remove(path=path)
+
+    def rename(self, src: Path, dst: Path):
+        self._charge("rename")
+        return self.filesystem.rename(src=src, dst=dst)
+
+    @property
+    def user(self):
+        return self.filesystem.user
+
     def set_user(self, user: FakeUser):
         return self.filesystem.set_user(user)
 
     @property
     def effective_user(self) -> FakeUser:
         return self.filesystem.effective_user
+
+    @property
+    def resolver(self) -> PathResolver:
+        return self.filesystem.resolver
+
+    def snapshot(self) -> FakeFilesystemSnapshot:
+        return self.filesystem.snapshot()
+
+    def restore(self, snapshot: FakeFilesystemSnapshot):
+        return self.filesystem.restore(snapshot)
+
+    def fork(self) -> 'FakeFilesystemWithCosts':
+        return FakeFilesystemWithCosts(self.filesystem.fork(), self.costs)
+
+    def populate(self, entries: typing.Iterable[tuple]):
+        return self.filesystem.populate(entries)
+
+    def image(self, root: Path = Path(SEPARATOR)) -> bytes:
+        return self.filesystem.image(root)
+
+    def share(self, root: Path = Path(SEPARATOR),
+              name: str = None) -> shared_memory.SharedMemory:
+        return self.filesystem.share(root, name)
+
+    def save(self, path: str, root: Path = Path(SEPARATOR)):
+        return self.filesystem.save(path, root)
@@ -0,0 +1,218 @@
+"""Everything needed for freezing a fake filesystem into a compact image."""
+import mmap
+import os as _os
+import struct
+import sys
+import typing
+import weakref
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from sources import SourceEntry
+
+ImageRow = namedtuple('ImageRow', ['name', 'is_directory', 'mode', 'uid',
+                                   'gid', 'nlink', 'atime', 'mtime', 'ctime',
+                                   'first', 'count', 'size', 'extents'])
+
+MAGIC = b"FAKEOS" + (b"<" if sys.byteorder == "little" else b">") + b"\x02"
+HEADER = struct.Struct("<8sQQQQ")
+COLUMNS = (("uid", "q"), ("gid", "q"), ("atime", "q"), ("mtime", "q"),
+           ("ctime", "q"), ("extent", "Q"), ("size", "Q"), ("mode", "I"),
+           ("nlink", "I"), ("first", "I"), ("count", "I"), ("extents", "I"),
+           ("name", "I"), ("kind", "B"))
+
+
+def _padded(size: int) -> int:
+    """Round size up to a multiple of 8, so every section stays aligned."""
+    return -(-size // 8) * 8
+
+
+class FakeImage(object):
+    """I am a frozen filesystem, read straight from a buffer.
+
+    An image is a header, a table of nodes stored column by column, a table
+    of names, a table of extents and their data. Every file lists the
+    extents of data it holds, each one where it starts in the file, where
+    its data is and how long it is, so the holes of sparse files take no
+    room in the image. Node 0 is the root and is named
+    after the key it was frozen from; the children of every directory are
+    stored next to each other. Nothing is copied out of my buffer until it
+    is asked for, so I can be backed by shared memory or by a mapped file
+    as well as by bytes. Once I am closed, or collected, I stop reading
+    from my buffer and close whatever owns it.
+
+    Attributes:
+        buffer: what I read from.
+        owner: whatever owns buffer, kept open for as long as I am.
+    """
+    def __init__(self, buffer, owner=None):
+        self.buffer = buffer
+        self.owner = owner
+        view = memoryview(buffer)
+        magic, self._count, names, extents, data = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a filesystem image")
+
+        offset = HEADER.size
+        self._columns = dict()
+        for column, typecode in COLUMNS:
+            size = array(typecode).itemsize * (
+                self._count + (column == "name"))
+            self._columns[column] = view[offset:offset + size].cast(typecode)
+            offset += _padded(size)
+
+        self._names = view[offset:offset + names]
+        offset += _padded(names)
+        size = array("Q").itemsize * 3 * extents
+        self._extents = view[offset:offset + size].cast("Q")
+        offset += size
+        self._data = view[offset:offset + data]
+        self._finalizer = weakref.finalize(
+            self, self._close,
+            list(self._columns.values()) +
+            [self._names, self._extents, self._data], owner)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @classmethod
+    def open(cls, path: str) -> 'FakeImage':
+        """Map the image saved in the real file at path, read-only."""
+        with open(path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(mapping, owner=mapping)
+
+    @classmethod
+    def attach(cls, name: str) -> 'FakeImage':
+        """Map the image in the block of shared memory called name,
+        read-only.
+
+        Attaching a SharedMemory on POSIX registers the block with the
+        resource tracker of this process, which unlinks it when this process
+        exits, so the block is mapped directly instead."""
+        try:
+            import _posixshmem  # pylint: disable=import-outside-toplevel
+
+        except ImportError:
+            memory = shared_memory.SharedMemory(name=name)
+            return cls(memory.buf, owner=memory)
+
+        descriptor = _posixshmem.shm_open("/" + name, _os.O_RDONLY,
+                                          mode=0o600)
+        try:
+            mapping = mmap.mmap(descriptor, _os.fstat(descriptor).st_size,
+                                prot=mmap.PROT_READ)
+
+        finally:
+            _os.close(descriptor)
+
+        return cls(mapping, owner=mapping)
+
+    @staticmethod
+    def dump(rows: typing.Iterable[ImageRow]) -> bytes:
+        """Return the image of rows, the first of which is the root."""
+        columns = {column: array(typecode) for column, typecode in COLUMNS}
+        extents = array("Q")
+        names, data = [], []
+        names_size = data_size = 0
+        for row in rows:
+            name = row.name.encode("utf-8", "surrogateescape")
+            columns["name"].append(names_size)
+            columns["extent"].append(len(extents) // 3)
+            columns["kind"].append(row.is_directory)
+            for column in ("uid", "gid", "atime", "mtime", "ctime", "mode",
+                           "nlink", "first", "count", "size"):
+                columns[column].append(getattr(row, column))
+
+            count = 0
+            for start, extent in row.extents:
+                extents.extend((start, data_size, len(extent)))
+                data.append(extent)
+                data_size += len(extent)
+                count += 1
+
+            columns["extents"].append(count)
+            names.append(name)
+            names_size += len(name)
+
+        columns["name"].append(names_size)
+        sections = [HEADER.pack(MAGIC, len(columns["kind"]), names_size,
+                                len(extents) // 3, data_size)]
+        for column, _ in COLUMNS:
+            section = columns[column].tobytes()
+            sections.append(section + bytes(_padded(len(section)) -
+                                            len(section)))
+
+        sections.append(b"".join(names) + bytes(_padded(names_size) -
+                                                names_size))
+        sections.append(extents.tobytes())
+        sections.append(b"".join(data))
+        return b"".join(sections)
+
+    def entry(self, index: int) -> SourceEntry:
+        """Return the entry of the node at index."""
+        columns = self._columns
+        name = bytes(self._names[columns["name"][index]:
+                                 columns["name"][index + 1]])
+        return SourceEntry(name.decode("utf-8", "surrogateescape"),
+                           bool(columns["kind"][index]),
+                           columns["mode"][index], columns["uid"][index],
+                           columns["gid"][index], columns["nlink"][index],
+                           columns["atime"][index], columns["mtime"][index],
+                           columns["ctime"][index], ImageSource(self, index))
+
+    def entries(self, index: int) -> typing.Iterator[SourceEntry]:
+        """Return the entries of the children of the node at index."""
+        first = self._columns["first"][index]
+        for child in range(first, first + self._columns["count"][index]):
+            yield self.entry(child)
+
+    def size(self, index: int) -> int:
+        """Return how many bytes the file at index holds."""
+        return self._columns["size"][index]
+
+    def extents(self, index: int) -> typing.Iterator[typing.Tuple[int,
+                                                                  bytes]]:
+        """Yield where every extent of the file at index starts, and a copy
+        of its data."""
+        first = self._columns["extent"][index]
+        for extent in range(first, first + self._columns["extents"][index]):
+            start, offset, size = self._extents[extent * 3:extent * 3 + 3]
+            yield start, bytes(self._data[offset:offset + size])
+
+    def close(self):
+        """Stop reading from my buffer and close my owner, if any."""
+        self._finalizer()
+
+    @staticmethod
+    def _close(views: typing.List[memoryview], owner):
+        for view in views:
+            view.release()
+
+        if owner is not None:
+            owner.close()
+
+
+class ImageSource(namedtuple('ImageSource', ['image', 'index'])):
+    """I am a node of an image, read only once it is needed.
+
+    Attributes:
+        image (FakeImage): the image I am in.
+        index (int): where I am in its node table.
+    """
+    __slots__ = ()
+
+    def size(self) -> int:
+        """Return how many bytes the file holds."""
+        return self.image.size(self.index)
+
+    def extents(self) -> typing.Iterator[typing.Tuple[int, bytes]]:
+        """Yield where every extent of data in the file starts, and its
+        data."""
+        return self.image.extents(self.index)
+
+    def entries(self) -> typing.Iterator[SourceEntry]:
+        """Return the entries of the directory."""
+        return self.image.entries(self.index)
@@ -0,0 +1,78 @@
+"""Everything needed for keeping the metadata of fake inodes."""
+import typing
+from array import array
+
+
+class InodeTable(object):
+    """I hold the metadata of every inode in a filesystem.
+
+    Every inode is a row of integer columns, stored in fixed-size pages of
+    machine integers rather than in Python objects, so a row costs a few
+    dozen bytes no matter how many inodes there are. Freezing me shares
+    every page with whoever froze me, and a shared page is copied the first
+    time one of its rows is changed.
+
+    Inode numbers start at 1 and are never reused, so 0 means no inode.
+
+    Attributes:
+        COLUMNS (tuple): the names of the columns of every row.
+        PAGE_SIZE (int): how many rows a page holds.
+    """
+    COLUMNS = ("nlink", "atime", "mtime", "ctime")
+    PAGE_SIZE = 1024
+    _OFFSETS = {column: offset for offset, column in enumerate(COLUMNS)}
+
+    def __init__(self, pages: typing.Tuple[array, ...] = (), count: int = 0):
+        self._pages = list(pages)
+        self._owned = set()
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _locate(self, ino: int, column: str) -> typing.Tuple[int, int]:
+        """Return the page and the offset in it of a column of ino."""
+        if not 0 < ino <= self._count:
+            raise KeyError(ino)
+
+        page, row = divmod(ino - 1, self.PAGE_SIZE)
+        return page, row * len(self.COLUMNS) + self._OFFSETS[column]
+
+    def _writable(self, page: int) -> array:
+        """Return a page, ready to be changed."""
+        if page not in self._owned:
+            self._pages[page] = array("q", self._pages[page])
+            self._owned.add(page)
+
+        return self._pages[page]
+
+    def allocate(self, nlink: int, atime: int, mtime: int, ctime: int) -> int:
+        """Add a row and return its inode number."""
+        if self._count == len(self._pages) * self.PAGE_SIZE:
+            self._pages.append(
+                array("q", bytes(8 * self.PAGE_SIZE * len(self.COLUMNS))))
+            self._owned.add(len(self._pages) - 1)
+
+        self._count += 1
+        page, offset = self._locate(self._count, self.COLUMNS[0])
+        self._writable(page)[offset:offset + len(self.COLUMNS)] = array(
+            "q", (nlink, atime, mtime, ctime))
+        return self._count
+
+    def row(self, ino: int) -> typing.Tuple[int, ...]:
+        """Return every column of ino, in the order of COLUMNS."""
+        page, offset = self._locate(ino, self.COLUMNS[0])
+        return tuple(self._pages[page][offset:offset + len(self.COLUMNS)])
+
+    def __getitem__(self, item: typing.Tuple[int, str]) -> int:
+        page, offset = self._locate(*item)
+        return self._pages[page][offset]
+
+    def __setitem__(self, item: typing.Tuple[int, str], value: int):
+        page, offset = self._locate(*item)
+        self._writable(page)[offset] = value
+
+    def freeze(self) -> typing.Tuple[typing.Tuple[array, ...], int]:
+        """Share every page and return what is needed to build a copy."""
+        self._owned = set()
+        return tuple(self._pages), self._count
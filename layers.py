@@ -0,0 +1,124 @@
+"""Everything needed for sharing dictionaries between copies of a filesystem."""
+import typing
+
+_MISSING = object()
+_DELETED = object()
+
+
+class LayeredDict(object):
+    """A dictionary made of a writable top layer over frozen lower layers.
+
+    Freezing pushes the top layer below the others and starts a new empty
+    one, which takes constant time. Frozen layers are never written to again,
+    so they can be shared by as many dictionaries as needed; deletions of
+    keys that live in a lower layer are recorded in the top layer. Once there
+    are more than MAX_LAYERS frozen layers, freezing merges the newest ones
+    with the older ones no bigger than them, so each key is copied about
+    log n times over n writes, however big the oldest layers are.
+
+    Attributes:
+        top (dict): the writable layer.
+        layers (tuple): the frozen layers, newest first.
+    """
+    MAX_LAYERS = 16
+
+    def __init__(self, layers: typing.Tuple[dict, ...] = ()):
+        self.top = dict()
+        self.layers = tuple(layers)
+
+    def owns(self, key) -> bool:
+        """Whether or not key lives in the writable layer."""
+        return self.top.get(key, _DELETED) is not _DELETED
+
+    def get(self, key, default=None):
+        """Return the value of key if it exists, otherwise return default."""
+        value = self.top.get(key, _MISSING)
+        if value is _MISSING:
+            for layer in self.layers:
+                value = layer.get(key, _MISSING)
+                if value is not _MISSING:
+                    break
+
+        if value is _MISSING or value is _DELETED:
+            return default
+
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        self.top[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+
+        if any(key in layer for layer in self.layers):
+            self.top[key] = _DELETED
+
+        else:
+            del self.top[key]
+
+    def pop(self, key, default=_MISSING):
+        """Remove key and return its value."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+
+            return default
+
+        del self[key]
+        return value
+
+    def items(self) -> typing.Iterator[tuple]:
+        """Return the key-value pairs of every layer, newest values winning."""
+        merged = dict()
+        for layer in reversed((self.top,) + self.layers):
+            merged.update(layer)
+
+        return ((key, value) for key, value in merged.items()
+                if value is not _DELETED)
+
+    def values(self) -> typing.Iterator:
+        """Return the values of every layer."""
+        return (value for _, value in self.items())
+
+    def freeze(self) -> typing.Tuple[dict, ...]:
+        """Freeze the writable layer and return all the frozen layers."""
+        if self.top:
+            self.layers = (self.top,) + self.layers
+            self.top = dict()
+
+        if len(self.layers) > self.MAX_LAYERS:
+            self._merge()
+
+        return self.layers
+
+    def _merge(self):
+        """Merge the newest frozen layers into one, along with every older
+        layer no bigger than them, so merging costs what was written since
+        rather than what the dictionary holds."""
+        count, size = 2, len(self.layers[0]) + len(self.layers[1])
+        while (count < len(self.layers) and
+               len(self.layers[count]) <= size):
+            size += len(self.layers[count])
+            count += 1
+
+        merged = dict()
+        for layer in reversed(self.layers[:count]):
+            merged.update(layer)
+
+        if count == len(self.layers):
+            merged = {key: value for key, value in merged.items()
+                      if value is not _DELETED}
+
+        self.layers = (merged,) + self.layers[count:]
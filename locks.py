@@ -0,0 +1,91 @@
+"""Everything needed for sharing a fake filesystem between threads."""
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock(object):
+    """I let in either any number of readers at once, or a single writer.
+
+    Writers waiting for me keep new readers out, so a steady stream of
+    readers cannot starve them. A thread may read again while it reads, and
+    read or write again while it writes, but a reader must release every
+    read before it writes.
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting = 0
+        self._writer = None
+        self._writes = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        """Wait until no writer holds or waits for me, then read."""
+        reads = getattr(self._local, "reads", 0)
+        with self._condition:
+            if not reads and self._writer != threading.get_ident():
+                while self._writer is not None or self._waiting:
+                    self._condition.wait()
+
+            self._readers += 1
+
+        self._local.reads = reads + 1
+
+    def release_read(self):
+        """Stop reading."""
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+        self._local.reads -= 1
+
+    def acquire_write(self):
+        """Wait until nobody else reads or writes, then write."""
+        thread = threading.get_ident()
+        with self._condition:
+            if self._writer == thread:
+                self._writes += 1
+                return
+
+            if getattr(self._local, "reads", 0):
+                raise RuntimeError("cannot write while reading")
+
+            self._waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+
+            finally:
+                self._waiting -= 1
+
+            self._writer = thread
+            self._writes = 1
+
+    def release_write(self):
+        """Stop writing."""
+        with self._condition:
+            self._writes -= 1
+            if not self._writes:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def reading(self):
+        """Hold me for reading inside the with block."""
+        self.acquire_read()
+        try:
+            yield
+
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def writing(self):
+        """Hold me for writing inside the with block."""
+        self.acquire_write()
+        try:
+            yield
+
+        finally:
+            self.release_write()
@@ -0,0 +1,90 @@
+"""Everything needed for turning paths into canonical keys."""
+import os as _os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+SEPARATOR = "/"
+
+
+def parent_of(key: str) -> str:
+    """Return the key of the directory containing key."""
+    return key.rpartition(SEPARATOR)[0] or SEPARATOR
+
+
+def name_of(key: str) -> str:
+    """Return the last component of key."""
+    return key.rpartition(SEPARATOR)[2]
+
+
+def child_of(key: str, name: str) -> str:
+    """Return the key of name inside the directory key."""
+    if key == SEPARATOR:
+        return SEPARATOR + name
+
+    return key + SEPARATOR + name
+
+
+class PathResolver(object):
+    """I turn paths into canonical keys.
+
+    A key is an absolute path string without '.' or '..' components.
+    Relative paths are resolved against my current working directory, in
+    pure Python, and the keys I hand out are interned and memoized in a
+    bounded cache so resolving the same path twice is a single lookup.
+
+    Attributes:
+        cache_size (int): how many keys are memoized.
+    """
+    def __init__(self, cwd: Path = None, cache_size: int = 4096):
+        self.cache_size = cache_size
+        self._cwd = SEPARATOR
+        self._canonical = lru_cache(maxsize=cache_size)(self._canonicalise)
+        self.cwd = cwd if cwd is not None else _os.getcwd()
+
+    def __getstate__(self) -> dict:
+        """Return what copying or pickling me copies, which leaves out the
+        cache, as it is bound to me rather than to the copy."""
+        state = dict(self.__dict__)
+        del state["_canonical"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._canonical = lru_cache(maxsize=self.cache_size)(
+            self._canonicalise)
+
+    @property
+    def cwd(self) -> Path:
+        """Return the current working directory."""
+        return Path(self._cwd)
+
+    @cwd.setter
+    def cwd(self, path: Path):
+        self._cwd = self.key(path)
+        self._canonical.cache_clear()
+
+    @property
+    def cwd_key(self) -> str:
+        """Return the key of the current working directory."""
+        return self._cwd
+
+    def key(self, path: Path) -> str:
+        """Return the canonical key of path."""
+        return self._canonical(_os.fspath(path))
+
+    def _canonicalise(self, path: str) -> str:
+        """Resolve path against the current working directory."""
+        if not path.startswith(SEPARATOR):
+            path = self._cwd + SEPARATOR + path
+
+        parts = list()
+        for part in path.split(SEPARATOR):
+            if part == "..":
+                if parts:
+                    parts.pop()
+
+            elif part and part != ".":
+                parts.append(part)
+
+        return sys.intern(SEPARATOR + SEPARATOR.join(parts))
@@ -0,0 +1,62 @@
+"""Everything needed for loading fake file-like objects lazily."""
+import os as _os
+import typing
+from collections import namedtuple
+from stat import S_ISDIR
+
+SourceEntry = namedtuple('SourceEntry', ['name', 'is_directory', 'mode',
+                                         'uid', 'gid', 'nlink', 'atime',
+                                         'mtime', 'ctime', 'source'])
+
+
+class HostSource(namedtuple('HostSource', ['path'])):
+    """I am a real file or directory, read only once it is needed.
+
+    Attributes:
+        path (str): where I am on the host.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def entry(cls, path: str, name: str = None) -> SourceEntry:
+        """Return the entry of the real file or directory at path."""
+        return cls._entry(name if name is not None else path,
+                          path, _os.stat(path))
+
+    @classmethod
+    def _entry(cls, name: str, path: str, stat: _os.stat_result):
+        return SourceEntry(name, S_ISDIR(stat.st_mode), stat.st_mode & 0o777,
+                           stat.st_uid, stat.st_gid, stat.st_nlink,
+                           stat.st_atime_ns, stat.st_mtime_ns,
+                           stat.st_ctime_ns, cls(path))
+
+    def size(self) -> int:
+        """Return how many bytes the real file holds."""
+        return _os.stat(self.path).st_size
+
+    def extents(self) -> typing.Iterator[typing.Tuple[int, bytes]]:
+        """Yield the contents of the real file, as a single extent."""
+        with open(self.path, "rb") as source:
+            data = source.read()
+
+        if data:
+            yield 0, data
+
+    def entries(self) -> typing.Iterator[SourceEntry]:
+        """Return the entries of the real directory, skipping those that
+        cannot be read."""
+        try:
+            with _os.scandir(self.path) as entries:
+                entries = list(entries)
+
+        except OSError:
+            return
+
+        for entry in entries:
+            try:
+                stat = entry.stat()
+
+            except OSError:
+                continue
+
+            yield self._entry(entry.name, entry.path, stat)
@@ -0,0 +1,167 @@
+"""Everything needed for counting and timing the calls made to a fake os."""
+import functools
+import inspect
+import threading
+import typing
+from collections import Counter, namedtuple
+from time import perf_counter_ns
+
+OperationStats = namedtuple('OperationStats', ['calls', 'paths', 'histogram',
+                                               'nanoseconds'])
+
+
+class CallStats(object):
+    """I record how many times each operation was called, on which paths,
+    and how long the calls took.
+
+    The durations are kept in a histogram whose buckets are powers of two
+    nanoseconds, each counting the calls that took less than it and at least
+    half of it. Threads may record to me at once.
+
+    Attributes:
+        calls (Counter): how many times each operation was called.
+        paths (dict): a Counter of the paths given to each operation.
+        histograms (dict): a Counter of the durations of each operation.
+        nanoseconds (Counter): how long the calls to each operation took.
+    """
+    def __init__(self):
+        self.calls = Counter()
+        self.paths = dict()
+        self.histograms = dict()
+        self.nanoseconds = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, paths: typing.Iterable[str],
+               nanoseconds: int):
+        """Record a call to operation, given paths, which took nanoseconds."""
+        with self._lock:
+            self.calls[operation] += 1
+            self.paths.setdefault(operation, Counter()).update(paths)
+            self.histograms.setdefault(operation, Counter())[
+                1 << nanoseconds.bit_length()] += 1
+            self.nanoseconds[operation] += nanoseconds
+
+    def stats(self) -> typing.Dict[str, OperationStats]:
+        """Return what was recorded of each operation called, with its
+        histogram sorted by bucket."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> typing.Dict[str, OperationStats]:
+        return {
+            operation: OperationStats(
+                calls=calls,
+                paths=Counter(self.paths[operation]),
+                histogram=dict(sorted(self.histograms[operation].items())),
+                nanoseconds=self.nanoseconds[operation])
+            for operation, calls in self.calls.items()
+        }
+
+    def reset(self):
+        """Forget everything recorded."""
+        with self._lock:
+            self.calls.clear()
+            self.paths.clear()
+            self.histograms.clear()
+            self.nanoseconds.clear()
+
+
+class Meter(object):
+    """I time the calls to some methods of an object, and record them to
+    every CallStats attached to me.
+
+    While nothing is attached, the object is left untouched, so its calls
+    cost nothing extra. Attaching the first CallStats shadows the methods
+    with timing wrappers set on the object itself, and detaching the last
+    one removes them. Calls made while another measured call runs, such as
+    unlink calling remove, are part of it and not recorded on their own.
+    Calls only nest within a thread, so calls made by several threads at
+    once are all recorded. Generators, such as walk, are timed while they
+    run, and recorded once they are exhausted or closed.
+
+    Attributes:
+        target: the object whose methods are measured.
+        methods (dict): how many of the first arguments of each measured
+            method are paths.
+        recorders (list): the attached CallStats.
+    """
+    def __init__(self, target, methods: typing.Dict[str, int]):
+        self.target = target
+        self.methods = methods
+        self.recorders = list()
+        self._local = threading.local()
+
+    def attach(self, recorder: CallStats):
+        """Record every measured call to recorder."""
+        if not self.recorders:
+            self._install()
+
+        self.recorders.append(recorder)
+
+    def detach(self, recorder: CallStats):
+        """Stop recording to recorder."""
+        self.recorders.remove(recorder)
+        if not self.recorders:
+            self._uninstall()
+
+    def _install(self):
+        for name, paths in self.methods.items():
+            method = getattr(self.target, name)
+            measure = (self._iterate if inspect.isgeneratorfunction(method)
+                       else self._call)
+            setattr(self.target, name, functools.wraps(method)(
+                functools.partial(measure, name, paths, method)))
+
+    def _uninstall(self):
+        for name in self.methods:
+            delattr(self.target, name)
+
+    def _record(self, name: str, paths: int, args: tuple, nanoseconds: int):
+        paths = [str(path) for path in args[:paths]
+                 if isinstance(path, (str, bytes)) or hasattr(path,
+                                                              "__fspath__")]
+        for recorder in self.recorders:
+            recorder.record(name, paths, nanoseconds)
+
+    def _call(self, name: str, paths: int, method: typing.Callable,
+              *args, **kwargs):
+        local = self._local
+        if getattr(local, "depth", 0):
+            return method(*args, **kwargs)
+
+        local.depth = 1
+        start = perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+
+        finally:
+            elapsed = perf_counter_ns() - start
+            local.depth = 0
+            self._record(name, paths, args, elapsed)
+
+    def _iterate(self, name: str, paths: int, method: typing.Callable,
+                 *args, **kwargs):
+        local = self._local
+        outermost = not getattr(local, "depth", 0)
+        iterator = method(*args, **kwargs)
+        elapsed = 0
+        try:
+            while True:
+                local.depth = getattr(local, "depth", 0) + 1
+                start = perf_counter_ns()
+                try:
+                    item = next(iterator)
+
+                except StopIteration:
+                    return
+
+                finally:
+                    elapsed += perf_counter_ns() - start
+                    local.depth -= 1
+
+                yield item
+
+        finally:
+            iterator.close()
+            if outermost:
+                self._record(name, paths, args, elapsed)
@@ -0,0 +1,106 @@
+import asyncio
+from unittest import TestCase
+
+from asyncfakeos import AsyncFakeOS
+from fakeos import FakeOS
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class AsyncFakeOSCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS()
+        self.os.mkdir("/")
+        self.aos = AsyncFakeOS(self.os)
+
+    def test_calls_run_on_the_fake_os(self):
+        async def main():
+            await self.aos.makedirs("/a/b")
+            await self.aos.rename("/a/b", "/a/c")
+            await self.aos.chmod("/a/c", 0o700)
+            return await self.aos.listdir("/a"), await self.aos.stat("/a/c")
+
+        listing, stat = run(main())
+
+        assert listing == ["c"]
+        assert stat.st_mode & 0o777 == 0o700
+        assert self.os.listdir("/a") == ["c"]
+
+    def test_errors_are_raised(self):
+        async def main():
+            await self.aos.rmdir("/missing")
+
+        with self.assertRaises(FileNotFoundError):
+            run(main())
+
+    def test_open(self):
+        async def main():
+            async with self.aos.open("/file", "w") as file:
+                await file.write("first\nsecond\n")
+
+            file = await self.aos.open("/file")
+            lines = [line async for line in file]
+            await file.close()
+            return lines, file.closed
+
+        assert run(main()) == (["first\n", "second\n"], True)
+
+    def test_thousands_of_coroutines(self):
+        async def worker(index):
+            await self.aos.mkdir("/%d" % index)
+            async with self.aos.open("/%d/file" % index, "wb") as file:
+                await file.write(b"%d" % index)
+
+            async with self.aos.open("/%d/file" % index, "rb") as file:
+                return int(await file.read())
+
+        async def main():
+            return await asyncio.gather(*[worker(index)
+                                          for index in range(2000)])
+
+        assert run(main()) == list(range(2000))
+        assert len(self.os.listdir("/")) == 2000
+
+    def test_coroutines_take_turns(self):
+        async def worker(name, order):
+            for step in range(3):
+                await self.aos.mkdir("/%s%d" % (name, step))
+                order.append(name)
+
+        async def main():
+            order = list()
+            await asyncio.gather(worker("a", order), worker("b", order))
+            return order
+
+        assert run(main()) == ["a", "b"] * 3
+
+    def test_seed_replays_an_interleaving(self):
+        def interleaving(seed):
+            aos = AsyncFakeOS(seed=seed)
+            aos.os.mkdir("/")
+            order = list()
+
+            async def worker(name):
+                for step in range(5):
+                    await aos.mkdir("/%s%d" % (name, step))
+                    order.append(name)
+
+            async def main():
+                await asyncio.gather(*[worker(name) for name in "abcd"])
+
+            run(main())
+            return order
+
+        assert interleaving(1) == interleaving(1)
+        assert len({tuple(interleaving(seed)) for seed in range(10)}) > 1
+
+    def test_run_in_executor(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.aos.executor, self.os.mkdir, "/a")
+            return await loop.run_in_executor(self.aos.executor,
+                                              self.os.listdir, "/")
+
+        assert run(main()) == ["a"]
@@ -0,0 +1,92 @@
+import json
+import os as _os
+import tempfile
+from unittest import TestCase
+
+from benchmarks import BENCHMARKS, CHAIN_DEPTH, Tree, compare, exponent, \
+    main, run
+
+
+def results(times: dict) -> dict:
+    return {"results": [
+        {"benchmark": "rename_directory", "shape": "deep", "size": size,
+         "nanoseconds_per_call": time}
+        for size, time in times.items()
+    ]}
+
+
+class TreeCase(TestCase):
+    def test_shape(self):
+        tree = Tree(111, "balanced")
+
+        assert len(tree.os.listdir("/")) == 10
+        assert tree.deepest == "/d9/d9"
+        assert tree.depth == 2
+        assert tree.subtree == "/d0"
+
+    def test_chain(self):
+        short, long = Tree(10, "chain"), Tree(CHAIN_DEPTH + 10, "chain")
+
+        assert short.deepest == "/d0" * 9
+        assert short.depth == 9
+        assert long.depth == CHAIN_DEPTH
+        assert len(long.os.listdir("/")) == 10
+
+    def test_restore(self):
+        tree = Tree(10, "flat")
+        tree.os.mkdir("/new")
+        tree.restore()
+
+        assert len(tree.os.listdir("/")) == 9
+
+
+class RunCase(TestCase):
+    def test_run(self):
+        run_results = run(sizes=[10, 100], shapes=["flat", "deep"], calls=4,
+                          repeat=1)
+
+        assert len(run_results["results"]) == 2 * 2 * len(BENCHMARKS)
+        assert all(result["nanoseconds_per_call"] > 0
+                   for result in run_results["results"])
+
+    def test_main_writes_and_compares(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = _os.path.join(directory.name, "results.json")
+
+        assert main(["run", "-o", path, "--sizes", "10", "--shapes", "flat",
+                     "--calls", "2", "--repeat", "1"]) == 0
+        with open(path) as output:
+            assert {result["benchmark"]
+                    for result in json.load(output)["results"]} == \
+                set(BENCHMARKS)
+
+        assert main(["compare", path, path]) == 0
+
+
+class CompareCase(TestCase):
+    def test_exponent(self):
+        assert round(exponent([(10, 5.0), (100, 5.0)]), 6) == 0.0
+        assert round(exponent([(10, 10.0), (100, 100.0),
+                               (1000, 1000.0)]), 6) == 1.0
+
+    def test_nothing_changed(self):
+        times = results({100: 1000.0, 1000: 1000.0})
+
+        assert compare(times, times) == []
+
+    def test_slower(self):
+        assert len(compare(results({100: 1000.0}),
+                           results({100: 2000.0}))) == 1
+
+    def test_steeper(self):
+        assert compare(results({100: 1000.0, 10000: 1000.0}),
+                       results({100: 1000.0, 10000: 1400.0}),
+                       slower=2.0) == []
+
+        regressions = compare(results({100: 1000.0, 10000: 1000.0}),
+                              results({100: 1000.0, 10000: 100000.0}),
+                              slower=1000.0)
+
+        assert regressions == [
+            "rename_directory on deep tree: scales as n^1.00, was n^0.00"]
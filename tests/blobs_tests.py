@@ -0,0 +1,122 @@
+import sys
+import threading
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import binary
+
+from blobs import BlobStore, BLOBS
+from contents import FakeContents
+from fakeos import FakeOS
+from filesystem import FakeFilesystem, FakeFilesystemWithLocks
+
+
+class BlobStoreCase(TestCase):
+    @given(binary())
+    def test_interning_twice_returns_the_same_blob(self, data):
+        store = BlobStore()
+        blob = store.intern(data)
+
+        assert store.intern(bytearray(data)) is blob
+        assert store.refcount(blob) == 2
+        assert len(store) == 1
+
+    def test_last_release_forgets_the_blob(self):
+        store = BlobStore()
+        blob = store.intern(b"hello")
+        store.acquire(blob)
+
+        store.release(blob)
+        assert b"hello" in store
+
+        store.release(blob)
+        assert b"hello" not in store
+        assert store.refcount(blob) == 0
+        assert store.size == 0
+
+
+class SharedContentsCase(TestCase):
+    def test_identical_contents_share_a_blob(self):
+        data = b"identical template" * 1000
+        first, second = FakeContents(data), FakeContents(data)
+
+        assert first._extents[0] is second._extents[0]
+        assert BLOBS.refcount(first._extents[0]) >= 2
+
+    def test_writing_copies_the_blob(self):
+        data = b"copy on write" * 1000
+        first, second = FakeContents(data), FakeContents(data)
+        second.write(0, b"C")
+
+        assert bytes(first) == data
+        assert bytes(second) == b"C" + data[1:]
+        assert first._extents[0] is not second._extents[0]
+
+    def test_dropped_contents_release_their_blob(self):
+        data = b"released when dropped" * 1000
+        contents = FakeContents(data)
+        blob = contents._extents[0]
+        references = BLOBS.refcount(blob)
+
+        del contents
+
+        assert BLOBS.refcount(blob) == references - 1
+
+    def test_files_written_alike_share_data(self):
+        os = FakeOS()
+        data = b"vendored library" * 1000
+        for name in ("first", "second"):
+            with os.open(name, "wb") as file:
+                file.write(data)
+
+        assert (os.filesystem["first"].contents._extents[0] is
+                os.filesystem["second"].contents._extents[0])
+
+    def test_forks_share_data_until_written(self):
+        os = FakeOS()
+        data = b"forked data" * 1000
+        with os.open("file", "wb") as file:
+            file.write(data)
+
+        forked = FakeOS(filesystem=os.filesystem.fork())
+        with forked.open("file", "r+b") as file:
+            file.write(b"F")
+
+        assert os.filesystem["file"].contents == data
+        assert forked.filesystem["file"].contents == b"F" + data[1:]
+        assert BLOBS.refcount(os.filesystem["file"].contents._extents[0])
+
+    def test_threads_share_the_store(self):
+        data = b"shared between threads"
+        failures = list()
+
+        def churn():
+            os = FakeOS(filesystem=FakeFilesystemWithLocks(FakeFilesystem()))
+            try:
+                for _ in range(2000):
+                    with os.open("file", "wb") as file:
+                        file.write(data)
+
+                    with os.open("file", "ab") as file:
+                        file.write(data)
+
+                    os.remove("file")
+
+            except Exception as error:
+                failures.append(error)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=churn) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        finally:
+            sys.setswitchinterval(interval)
+
+        assert failures == []
+        assert data not in BLOBS
@@ -0,0 +1,74 @@
+import os as _os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from cache import cached
+from fakeos import FakeOS
+from filesystem import FakeFilesystem
+
+
+class SaveCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = _os.path.join(self.directory.name, "tree.img")
+
+    def test_save_and_load(self):
+        os = FakeOS()
+        os.makedirs("/a/b")
+        with os.open("/a/file", "wb") as file:
+            file.write(b"saved")
+
+        os.filesystem.save(self.path)
+        loaded = FakeOS(filesystem=FakeFilesystem.load(self.path))
+
+        assert loaded.listdir("/") == ["a"]
+        assert sorted(loaded.listdir("/a")) == ["b", "file"]
+        with loaded.open("/a/file", "rb") as file:
+            assert file.read() == b"saved"
+
+    def test_load_is_lazy(self):
+        FakeFilesystem.from_manifest(
+            {str(index): {"file": None} for index in range(100)}
+        ).save(self.path)
+
+        filesystem = FakeFilesystem.load(self.path)
+
+        assert len(list(filesystem._index.items())) == 1
+        assert filesystem.has_file(Path("/42/file"))
+        assert len(list(filesystem._index.items())) == 102
+
+
+class CachedCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.builds = list()
+
+        @cached(self.directory.name)
+        def tree(width):
+            self.builds.append(width)
+            return FakeFilesystem.from_manifest(
+                {str(index): {} for index in range(width)})
+
+        self.tree = tree
+
+    def test_builds_once_per_arguments(self):
+        first, second = self.tree(3), self.tree(3)
+
+        assert self.builds == [3]
+        assert sorted(FakeOS(filesystem=first).listdir("/")) == \
+            sorted(FakeOS(filesystem=second).listdir("/")) == ["0", "1", "2"]
+
+        self.tree(4)
+
+        assert self.builds == [3, 4]
+        assert len(_os.listdir(self.directory.name)) == 2
+
+    def test_changes_to_a_loaded_tree_are_not_cached(self):
+        os = FakeOS(filesystem=self.tree(2))
+        os.rmdir("/0")
+
+        assert sorted(FakeOS(filesystem=self.tree(2)).listdir("/")) == \
+            ["0", "1"]
@@ -0,0 +1,164 @@
+import copy
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import binary, integers, lists, tuples
+
+from blobs import BLOBS
+from contents import FakeContents
+from fakeos import FakeOS
+from fakeuser import FakeUser
+
+
+class FakeContentsCase(TestCase):
+    @given(lists(tuples(integers(min_value=0, max_value=64), binary()),
+                 max_size=10))
+    def test_writes_match_a_bytearray(self, writes):
+        contents = FakeContents()
+        expected = bytearray()
+        for offset, data in writes:
+            contents.write(offset, data)
+            if data:
+                expected.extend(bytes(max(offset - len(expected), 0)))
+                expected[offset:offset + len(data)] = data
+
+        assert bytes(contents) == expected
+        assert contents.allocated <= len(expected)
+
+    @given(lists(tuples(integers(min_value=0, max_value=64), binary()),
+                 max_size=10),
+           integers(min_value=0, max_value=128))
+    def test_truncate_matches_a_bytearray(self, writes, size):
+        contents = FakeContents()
+        expected = bytearray()
+        for offset, data in writes:
+            contents.write(offset, data)
+            if data:
+                expected.extend(bytes(max(offset - len(expected), 0)))
+                expected[offset:offset + len(data)] = data
+
+        contents.truncate(size)
+        expected = expected[:size] + bytes(max(size - len(expected), 0))
+
+        assert bytes(contents) == expected
+
+    def test_holes_read_as_zeros(self):
+        contents = FakeContents()
+        contents.write(4, b"ab")
+
+        assert contents.read(0, 10) == b"\0\0\0\0ab"
+        assert contents.allocated == 2
+
+    def test_touching_extents_are_merged(self):
+        contents = FakeContents()
+        contents.write(0, b"ab")
+        contents.write(4, b"ef")
+        contents.write(2, b"cd")
+
+        assert contents._starts == [0]
+        assert contents.getbuffer() == b"abcdef"
+
+    def test_huge_sparse_contents(self):
+        contents = FakeContents(size=100 * 2 ** 30)
+        contents.write(50 * 2 ** 30, b"middle")
+
+        assert len(contents) == 100 * 2 ** 30
+        assert contents.allocated == 6
+        assert contents.read(50 * 2 ** 30 - 1, 8) == b"\0middle\0"
+
+    def test_getbuffer_of_contents_with_holes(self):
+        contents = FakeContents(size=4)
+
+        with self.assertRaises(BufferError):
+            contents.getbuffer()
+
+    def test_appending_only_copies_the_last_blob(self):
+        contents = FakeContents(b"x" * (FakeContents.EXTENT * 3 + 10))
+        blobs = list(contents._extents)
+
+        assert len(blobs) == 4
+
+        contents.write(len(contents), b"appended")
+        contents.seal()
+
+        assert contents._extents[:3] == blobs[:3]
+        assert all(kept is blob
+                   for kept, blob in zip(contents._extents, blobs[:3]))
+        assert bytes(contents) == b"x" * (FakeContents.EXTENT * 3 + 10) + \
+            b"appended"
+
+    def test_appending_after_a_full_blob(self):
+        contents = FakeContents(b"x" * FakeContents.EXTENT)
+        blob = contents._extents[0]
+        contents.write(FakeContents.EXTENT, b"y")
+
+        assert contents._extents[0] is blob
+        assert contents.read(FakeContents.EXTENT - 1, 2) == b"xy"
+
+    def test_getbuffer_joins_blobs(self):
+        data = bytes(range(256)) * (FakeContents.EXTENT // 128)
+        contents = FakeContents(data)
+
+        with contents.getbuffer() as view:
+            assert view == data
+
+    def test_deepcopy_takes_its_own_references(self):
+        contents = FakeContents(b"deep-copied" * 1000)
+        blob = contents._extents[0]
+        references = BLOBS.refcount(blob)
+
+        copied = copy.deepcopy(contents)
+
+        assert BLOBS.refcount(blob) == references + 1
+        del copied
+        assert BLOBS.refcount(blob) == references
+
+    def test_negative_truncate(self):
+        with self.assertRaises(ValueError):
+            FakeContents().truncate(-1)
+
+
+class TruncateCase(TestCase):
+    def test_truncate_grows_without_allocating(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello")
+
+        os.truncate("file", 2 ** 40)
+
+        assert len(os.filesystem["file"].contents) == 2 ** 40
+        assert os.filesystem["file"].contents.allocated == 5
+
+        with os.open("file", "rb") as file:
+            file.seek(2 ** 40 - 2)
+            assert file.read() == b"\0\0"
+
+    def test_truncate_shrinks(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello")
+
+        os.truncate("file", 2)
+
+        assert os.filesystem["file"].contents == b"he"
+
+    def test_truncate_non_existent_file(self):
+        os = FakeOS()
+
+        with self.assertRaises(FileNotFoundError):
+            os.truncate("file", 0)
+
+    def test_truncate_directory(self):
+        os = FakeOS()
+        os.mkdir("directory")
+
+        with self.assertRaises(IsADirectoryError):
+            os.truncate("directory", 0)
+
+    def test_no_permission_to_truncate(self):
+        os = FakeOS(user=FakeUser(uid=1, gid=1))
+        os.open("file", "wb").close()
+        os.chmod("file", 0o400)
+
+        with self.assertRaises(PermissionError):
+            os.truncate("file", 0)
@@ -0,0 +1,130 @@
+from unittest import TestCase
+
+from costs import CostModel, VirtualClock, NANOSECONDS
+from fakeos import FakeOS
+from filesystem import (FakeFilesystem, FakeFilesystemWithCosts,
+                        FakeFilesystemWithPermissions)
+
+MEGABYTE = 10 ** 6
+
+
+class VirtualClockCase(TestCase):
+    def test_advance(self):
+        clock = VirtualClock()
+        clock.advance(NANOSECONDS)
+        clock.advance_to(0)
+
+        assert clock() == NANOSECONDS
+        assert clock.seconds == 1.0
+
+
+class CostModelCase(TestCase):
+    def test_latency_accumulates(self):
+        costs = CostModel(latency=0.001, latencies={"rename": 0.01})
+        for _ in range(10):
+            costs.charge("stat")
+
+        costs.charge("rename")
+        costs.drain()
+
+        assert costs.clock.seconds == 0.02
+
+    def test_bandwidth(self):
+        costs = CostModel(bandwidth=100 * MEGABYTE)
+        for offset in range(0, 100 * MEGABYTE, MEGABYTE):
+            costs.charge("write", MEGABYTE, (1, offset))
+
+        costs.drain()
+
+        assert costs.clock.seconds == 1.0
+
+    def test_seek_penalty(self):
+        sequential, scattered = CostModel(seek=0.01), CostModel(seek=0.01)
+        for block in range(10):
+            sequential.charge("read", 10, (1, block * 10))
+            scattered.charge("read", 10, (1, (9 - block) * 10))
+
+        assert sequential.clock.seconds == 0.01
+        assert scattered.clock.seconds == 0.1
+
+    def test_queue_depth_hides_latency(self):
+        shallow = CostModel(latency=0.01, queue_depth=1)
+        deep = CostModel(latency=0.01, queue_depth=10)
+        for costs in shallow, deep:
+            for _ in range(10):
+                costs.charge("mkdir")
+
+            costs.drain()
+
+        assert shallow.clock.seconds == 0.1
+        assert deep.clock.seconds == 0.01
+
+    def test_queue_depth_does_not_hide_bandwidth(self):
+        costs = CostModel(bandwidth=MEGABYTE, queue_depth=10)
+        for stream in range(10):
+            costs.charge("write", MEGABYTE, (stream, 0))
+
+        costs.drain()
+
+        assert costs.clock.seconds == 10.0
+
+    def test_writes_wait_only_for_room_in_the_queue(self):
+        costs = CostModel(latency=1.0, queue_depth=2)
+        costs.charge("write")
+        costs.charge("write")
+
+        assert costs.clock.seconds == 0.0
+
+        costs.charge("write")
+
+        assert costs.clock.seconds == 1.0
+
+        costs.charge("read")
+
+        assert costs.clock.seconds == 2.0
+
+    def test_queue_depth_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            CostModel(queue_depth=0)
+
+
+class FakeFilesystemWithCostsCase(TestCase):
+    def setUp(self):
+        self.costs = CostModel(latency=0.001, bandwidth=MEGABYTE, seek=0.01)
+        self.os = FakeOS(filesystem=FakeFilesystemWithCosts(
+            FakeFilesystemWithPermissions(FakeFilesystem()), self.costs))
+
+    def test_calls_are_charged(self):
+        self.os.mkdir("/")
+        self.os.mkdir("/a")
+        self.os.listdir("/")
+        self.costs.drain()
+
+        assert self.costs.clock.seconds > 0.002
+
+    def test_reads_and_writes_are_charged(self):
+        self.os.mkdir("/")
+        with self.os.open("/file", "wb") as file:
+            file.write(b"x" * MEGABYTE)
+
+        self.costs.drain()
+        written = self.costs.clock.seconds
+
+        assert written > 1.0
+
+        with self.os.open("/file", "rb") as file:
+            assert len(file.read()) == MEGABYTE
+
+        assert self.costs.clock.seconds - written > 1.0
+
+    def test_timestamps_follow_the_virtual_clock(self):
+        filesystem = FakeFilesystem()
+        filesystem.clock = self.costs.clock
+        os = FakeOS(filesystem=FakeFilesystemWithCosts(
+            FakeFilesystemWithPermissions(filesystem), self.costs))
+        os.mkdir("/")
+        self.costs.clock.advance(5 * NANOSECONDS)
+        os.mkdir("/a")
+
+        assert 5 * NANOSECONDS <= os.stat("/a").st_mtime_ns \
+            <= self.costs.clock()
@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import booleans, integers
+
+from fakeuser import FakeUser
+
+
+class CanAccessCase(TestCase):
+    @given(booleans(), integers(0, 2), integers(0, 2), integers(0, 0o777),
+           integers(0, 7), integers(0, 2), integers(0, 2))
+    def test_matches_the_permission_classes(self, is_sudoer, uid, gid, mode,
+                                            action_mask, file_uid, file_gid):
+        user = FakeUser(is_sudoer=is_sudoer, uid=uid, gid=gid)
+        owner, group, everyone = mode >> 6, mode >> 3 & 7, mode & 7
+
+        assert user._can_access(mode=mode, file_gid=file_gid,
+                                action_mask=action_mask,
+                                file_uid=file_uid) is any([
+            is_sudoer,
+            owner & action_mask == action_mask and file_uid == uid,
+            group & action_mask == action_mask and file_gid == gid,
+            everyone & action_mask == action_mask])
+
+    def test_illegal_modes(self):
+        for mode in (-1, 0o1000):
+            with self.assertRaises(ValueError):
+                FakeUser(is_sudoer=True)._can_access(mode=mode, file_gid=0,
+                                                     action_mask=0b100,
+                                                     file_uid=0)
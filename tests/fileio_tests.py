@@ -0,0 +1,191 @@
+import io
+import os as _os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import binary, text
+
+from fakeos import FakeOS
+from filesystem import FakeFilesystem
+from fakeuser import FakeUser
+
+
+class OpenCase(TestCase):
+    @given(binary())
+    def test_write_and_read(self, data):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            assert file.write(data) == len(data)
+
+        with os.open("file", "rb") as file:
+            assert file.read() == data
+
+    @given(text())
+    def test_text_mode(self, data):
+        os = FakeOS()
+        with os.open("file", "w", encoding="utf-8") as file:
+            file.write(data)
+
+        with os.open("file", encoding="utf-8") as file:
+            read = file.read()
+
+        assert read == data.replace("\r\n", "\n").replace("\r", "\n")
+
+    def test_reading_a_non_existent_file(self):
+        os = FakeOS()
+
+        with self.assertRaises(FileNotFoundError):
+            os.open("file", "rb")
+
+    def test_opening_a_directory(self):
+        os = FakeOS()
+        os.mkdir("directory")
+
+        with self.assertRaises(IsADirectoryError):
+            os.open("directory", "rb")
+
+    def test_exclusive_creation(self):
+        os = FakeOS()
+        os.open("file", "xb").close()
+
+        with self.assertRaises(FileExistsError):
+            os.open("file", "xb")
+
+    def test_invalid_mode(self):
+        os = FakeOS()
+
+        for mode in ("", "rw", "rbt", "q"):
+            with self.assertRaises(ValueError):
+                os.open("file", mode)
+
+    def test_created_file_is_listed(self):
+        os = FakeOS()
+        os.mkdir("/")
+        os.open("/file", "wb").close()
+
+        assert os.listdir("/") == ["file"]
+        assert os.filesystem.has_file(Path("/file"))
+
+    def test_write_truncates(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello world")
+
+        os.open("file", "wb").close()
+
+        with os.open("file", "rb") as file:
+            assert file.read() == b""
+
+    def test_append(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello")
+
+        with os.open("file", "ab") as file:
+            file.seek(0)
+            file.write(b" world")
+
+        assert os.filesystem["file"].contents == b"hello world"
+
+    def test_seek_past_the_end_and_write(self):
+        os = FakeOS()
+        with os.open("file", "w+b") as file:
+            file.seek(3)
+            file.write(b"x")
+            file.seek(0)
+
+            assert file.read() == b"\0\0\0x"
+            assert file.seek(-1, io.SEEK_END) == 3
+            assert file.tell() == 3
+
+    def test_truncate(self):
+        os = FakeOS()
+        with os.open("file", "w+b") as file:
+            file.write(b"hello")
+            file.truncate(2)
+            assert os.filesystem["file"].contents == b"he"
+
+            file.truncate(4)
+            assert os.filesystem["file"].contents == b"he\0\0"
+
+    def test_readinto(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello world")
+
+        buffer = bytearray(5)
+        with os.open("file", "rb") as file:
+            assert file.readinto(buffer) == 5
+            assert buffer == b"hello"
+            file.seek(8)
+            assert file.readinto(buffer) == 3
+            assert buffer[:3] == b"rld"
+            assert file.readinto(buffer) == 0
+
+    def test_getbuffer_does_not_copy(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello")
+
+        with os.open("file", "r+b") as file:
+            with file.getbuffer() as view:
+                view[0:1] = b"j"
+
+        assert os.filesystem["file"].contents == b"jello"
+
+    def test_read_only_file_cannot_be_written(self):
+        os = FakeOS()
+        os.open("file", "wb").close()
+
+        with os.open("file", "rb") as file:
+            with self.assertRaises(io.UnsupportedOperation):
+                file.write(b"hello")
+
+    def test_no_permission_to_read(self):
+        os = FakeOS(user=FakeUser(uid=1, gid=1))
+        os.open("file", "wb").close()
+        os.chmod("file", 0o200)
+
+        with self.assertRaises(PermissionError):
+            os.open("file", "rb")
+
+        os.open("file", "wb").close()
+
+    def test_no_permission_to_write(self):
+        os = FakeOS(user=FakeUser(uid=1, gid=1))
+        os.open("file", "wb").close()
+        os.chmod("file", 0o400)
+
+        with self.assertRaises(PermissionError):
+            os.open("file", "ab")
+
+        os.open("file", "rb").close()
+
+    def test_fork_copies_written_files(self):
+        os = FakeOS()
+        with os.open("file", "wb") as file:
+            file.write(b"hello")
+
+        forked = FakeOS(filesystem=os.filesystem.fork())
+        with forked.open("file", "ab") as file:
+            file.write(b" world")
+
+        assert os.filesystem["file"].contents == b"hello"
+        assert forked.filesystem["file"].contents == b"hello world"
+
+    def test_mirrored_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            with open(_os.path.join(root, "file"), "wb") as file:
+                file.write(b"hello")
+
+            os = FakeOS(filesystem=FakeFilesystem.mirror(root))
+            with os.open(root + "/file", "ab") as file:
+                file.write(b" world")
+
+            with os.open(root + "/file", "rb") as file:
+                assert file.read() == b"hello world"
+
+            with open(_os.path.join(root, "file"), "rb") as file:
+                assert file.read() == b"hello"
@@ -1,5 +1,8 @@
+import errno
 import operator
 import os as _os
+import tempfile
+import tracemalloc
 
 from pathlib import Path
 from string import ascii_letters
@@ -200,6 +203,475 @@ class DirectoryCase(TestCase):
             os.rmdir(path)
 
 
+class IndexCase(TestCase):
+    @given(text(alphabet=ascii_letters, min_size=1),
+           text(alphabet=ascii_letters, min_size=1))
+    def test_directories_and_files_follow_mutations(self, directory, filename):
+        assume(directory != filename)
+        filesystem = FakeFilesystem(directories=[FakeDirectory(Path("/"))],
+                                    files=[FakeFile(Path("/" + filename))])
+        os = FakeOS(filesystem=filesystem)
+        os.mkdir("/" + directory)
+
+        assert [d.path for d in filesystem.directories] == \
+            [Path("/"), Path("/" + directory)]
+        assert [f.path for f in filesystem.files] == [Path("/" + filename)]
+
+        os.rmdir("/" + directory)
+        os.remove("/" + filename)
+
+        assert [d.path for d in filesystem.directories] == [Path("/")]
+        assert filesystem.files == []
+
+    @given(text(alphabet=ascii_letters, min_size=1),
+           text(alphabet=ascii_letters, min_size=1),
+           text(alphabet=ascii_letters, min_size=1))
+    def test_lookup_after_renaming_a_directory(self, old, new, inside):
+        assume(old != new)
+        os = FakeOS()
+        os.makedirs("/" + old + "/" + inside)
+
+        os.rename("/" + old, "/" + new)
+
+        assert os.filesystem.has_directory(Path("/" + new + "/" + inside))
+        assert not os.filesystem.has_directory(Path("/" + old + "/" + inside))
+        assert os.filesystem[Path("/" + new + "/" + inside)].path == \
+            Path("/" + new + "/" + inside)
+
+
+class MemoryCase(TestCase):
+    def test_file_like_objects_have_no_dictionary(self):
+        for file_object in (FakeFile(Path("/a")), FakeDirectory(Path("/a"))):
+            with self.assertRaises(AttributeError):
+                file_object.__dict__
+
+    def test_clone_copies_every_slot(self):
+        file_object = FakeFile(Path("/a/b"), 0o640, uid=1, gid=2,
+                               contents=b"hello")
+        clone = file_object.clone()
+
+        assert (clone.path, clone.mode, clone.uid, clone.gid, clone.ino) == \
+            (Path("/a/b"), 0o640, 1, 2, 0)
+        assert clone.contents == b"hello"
+        assert clone.contents is not file_object.contents
+
+    def test_bytes_per_entry(self):
+        manifest = {"d%d" % i: {"f%d" % j: None for j in range(100)}
+                    for i in range(100)}
+        tracemalloc.start()
+        try:
+            filesystem = FakeFilesystem.from_manifest(manifest)
+            size, _ = tracemalloc.get_traced_memory()
+
+        finally:
+            tracemalloc.stop()
+
+        assert size / len(list(filesystem)) < 600
+
+
+class TreeCase(TestCase):
+    @given(text(alphabet=ascii_letters, min_size=1),
+           sets(text(alphabet=ascii_letters, min_size=1)))
+    def test_directory_children(self, directory, children):
+        os = FakeOS()
+        os.makedirs("/" + directory)
+        for child in children:
+            os.mkdir("/" + directory + "/" + child)
+
+        assert set(os.filesystem["/" + directory].children) == children
+
+    def test_root_is_not_listed_inside_itself(self):
+        os = FakeOS()
+        os.mkdir("/")
+
+        assert os.listdir("/") == []
+        os.rmdir("/")
+
+    def test_rmdir_with_a_file_inside(self):
+        os = FakeOS(filesystem=FakeFilesystem(
+            directories=[FakeDirectory(Path("/"))],
+            files=[FakeFile(Path("/a/b"))]))
+        os.mkdir("/a")
+
+        with self.assertRaises(OSError):
+            os.rmdir("/a")
+
+        os.remove("/a/b")
+        os.rmdir("/a")
+        assert os.listdir("/") == []
+
+    def test_deep_paths(self):
+        filesystem = FakeFilesystem()
+        os = FakeOS(filesystem=filesystem)
+        path = "/" + "/".join(["d"] * 1200)
+        os.makedirs(path)
+        with os.open(path + "/f", "wb"):
+            pass
+
+        assert filesystem[Path(path)].path == Path(path)
+        assert filesystem[Path(path + "/f")].parent == Path(path)
+        assert len(list(filesystem.directories)) == 1201
+        assert len(list(filesystem.files)) == 1
+        assert len(list(filesystem)) == 1202
+
+
+class SnapshotCase(TestCase):
+    def test_restore_undoes_changes(self):
+        os = FakeOS()
+        os.makedirs("/a/b")
+        os.mkdir("/c", mode=0o700)
+        snapshot = os.filesystem.snapshot()
+
+        os.mkdir("/a/b/d")
+        os.chmod("/c", 0o500)
+        os.rename("/a", "/e")
+        os.rmdir("/c")
+        os.setuid(42)
+
+        os.filesystem.restore(snapshot)
+
+        assert sorted(os.listdir("/")) == ["a", "c"]
+        assert os.listdir("/a") == ["b"]
+        assert os.listdir("/a/b") == []
+        assert os.filesystem[Path("/c")].mode == 0o700
+        assert os.filesystem[Path("/a/b")].path == Path("/a/b")
+        assert os.getuid() != 42
+
+    def test_restore_twice(self):
+        os = FakeOS()
+        os.mkdir("/")
+        snapshot = os.filesystem.snapshot()
+
+        for directory in ("a", "b"):
+            os.mkdir("/" + directory)
+            assert os.listdir("/") == [directory]
+            os.filesystem.restore(snapshot)
+
+        assert os.listdir("/") == []
+
+    def test_fork_is_independent(self):
+        os = FakeOS()
+        os.makedirs("/a/b/c")
+        forked = FakeOS(filesystem=os.filesystem.fork())
+
+        mode = os.filesystem[Path("/a/b/c")].mode
+
+        forked.rename("/a/b", "/a/d")
+        forked.chmod("/a/d/c", 0o111)
+        os.mkdir("/a/e")
+
+        assert sorted(os.listdir("/a")) == ["b", "e"]
+        assert forked.listdir("/a") == ["d"]
+        assert os.filesystem[Path("/a/b/c")].mode == mode
+        assert forked.filesystem[Path("/a/d/c")].mode == 0o111
+        assert forked.filesystem[Path("/a/d/c")].path == Path("/a/d/c")
+        assert os.filesystem[Path("/a/b/c")].path == Path("/a/b/c")
+
+    def test_fork_shares_untouched_objects(self):
+        os = FakeOS()
+        os.makedirs("/a/b")
+        os.makedirs("/c/d")
+        forked = os.filesystem.fork()
+
+        forked.mkdir(Path("/a/e"))
+
+        assert forked[Path("/c/d")] is os.filesystem[Path("/c/d")]
+        assert forked[Path("/a/b")] is os.filesystem[Path("/a/b")]
+        assert forked[Path("/a")] is not os.filesystem[Path("/a")]
+
+    def test_open_files_follow_copies(self):
+        os = FakeOS()
+        os.makedirs("/d")
+        with os.open("/d/f", "wb") as file:
+            file.write(b"a")
+            os.filesystem.snapshot()
+            os.rename("/d", "/e")
+            file.write(b"b")
+
+            assert os.fstat(file).st_size == 2
+
+        with os.open("/e/f", "rb") as file:
+            assert file.read() == b"ab"
+
+
+class TransactionCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS()
+        self.os.makedirs("/a/b")
+        self.os.chdir("/a")
+
+    def test_changes_are_kept(self):
+        with self.os.transaction():
+            self.os.mkdir("/a/c")
+            self.os.chmod("/a/b", 0o700)
+
+        assert sorted(self.os.listdir("/a")) == ["b", "c"]
+        assert self.os.stat("/a/b").st_mode & 0o777 == 0o700
+
+    def test_failure_rolls_everything_back(self):
+        with self.assertRaises(FileNotFoundError):
+            with self.os.transaction():
+                for name in ("c", "d", "e"):
+                    self.os.mkdir("/a/" + name)
+
+                self.os.rename("/a/b", "/a/f")
+                self.os.chdir("/a/f")
+                self.os.chmod("/a/missing", 0o700)
+
+        assert self.os.listdir("/a") == ["b"]
+        assert self.os.getcwd() == "/a"
+        assert self.os.stat("/a").st_nlink == 3
+
+    def test_nested_transactions(self):
+        with self.os.transaction():
+            self.os.mkdir("/a/c")
+            with self.assertRaises(FileExistsError):
+                with self.os.transaction():
+                    self.os.mkdir("/a/d")
+                    self.os.mkdir("/a/d")
+
+        assert sorted(self.os.listdir("/a")) == ["b", "c"]
+
+    def test_open_files_write_to_the_committed_file(self):
+        with self.os.open("/a/f", "wb") as file:
+            file.write(b"a")
+            with self.os.transaction():
+                self.os.chmod("/a/f", 0o600)
+
+            file.write(b"b")
+
+        with self.os.open("/a/f", "rb") as file:
+            assert file.read() == b"ab"
+
+    def test_permissions_are_restored(self):
+        self.os.filesystem.set_user(FakeUser(uid=2, gid=2, is_sudoer=False))
+        with self.assertRaises(RuntimeError):
+            with self.os.transaction():
+                self.os.filesystem.set_user(Root())
+                self.os.chmod("/a", 0o600)
+                raise RuntimeError
+
+        assert self.os.listdir("/a/b") == []
+
+
+class PopulateCase(TestCase):
+    def test_from_manifest(self):
+        filesystem = FakeFilesystem.from_manifest({"etc": {"hosts": None},
+                                                   "tmp": {"a": {}}})
+        os = FakeOS(filesystem=filesystem)
+
+        assert sorted(os.listdir("/")) == ["etc", "tmp"]
+        assert os.listdir("/etc") == ["hosts"]
+        assert os.listdir("/tmp/a") == []
+        assert filesystem.has_file(Path("/etc/hosts"))
+
+    def test_populate_in_any_order(self):
+        os = FakeOS()
+        os.filesystem.populate([("/a/b/c", "file", 0o600, 1, 2),
+                                ("/a/b", FakeDirectory),
+                                ("/a", "directory", 0o700),
+                                ("/", "directory")])
+
+        assert os.listdir("/a/b") == ["c"]
+        assert os.filesystem[Path("/a/b/c")].mode == 0o600
+        assert os.filesystem[Path("/a/b/c")].uid == 1
+        assert os.filesystem[Path("/a/b/c")].gid == 2
+        assert os.filesystem[Path("/a")].mode == 0o700
+        assert os.filesystem[Path("/a")].uid == os.getuid()
+
+    def test_populate_with_a_missing_parent(self):
+        os = FakeOS()
+        os.mkdir("/")
+
+        with self.assertRaises(FileNotFoundError):
+            os.filesystem.populate([("/a", "directory"), ("/b/c", "file")])
+
+        assert os.listdir("/") == []
+
+    def test_populate_inside_a_file(self):
+        os = FakeOS()
+        os.filesystem.populate([("/", "directory"), ("/a", "file")])
+
+        with self.assertRaises(NotADirectoryError):
+            os.filesystem.populate([("/a/b", "file")])
+
+        assert not os.filesystem.has(Path("/a/b"))
+
+    def test_populate_an_existing_path(self):
+        os = FakeOS()
+        os.mkdir("/")
+
+        with self.assertRaises(FileExistsError):
+            os.filesystem.populate([("/a", "directory"), ("/", "directory")])
+
+        assert os.listdir("/") == []
+
+
+class MirrorCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        _os.makedirs(_os.path.join(self.root.name, "a", "b"))
+        open(_os.path.join(self.root.name, "a", "file"), "w").close()
+        _os.chmod(_os.path.join(self.root.name, "a", "file"), 0o640)
+
+    def test_mirror_mirrors_the_real_tree(self):
+        os = FakeOS(filesystem=FakeFilesystem.mirror(self.root.name))
+
+        assert os.listdir(self.root.name) == ["a"]
+        assert sorted(os.listdir(self.root.name + "/a")) == ["b", "file"]
+        assert os.filesystem.has_file(Path(self.root.name + "/a/file"))
+        assert os.filesystem[self.root.name + "/a/file"].mode == 0o640
+
+    def test_mirror_is_lazy(self):
+        filesystem = FakeFilesystem.mirror(self.root.name)
+        _os.mkdir(_os.path.join(self.root.name, "late"))
+
+        assert filesystem.has_directory(Path(self.root.name + "/late"))
+        assert sorted(d.name for d in filesystem.directories) == \
+            sorted([Path(self.root.name).name, "a", "late"])
+
+        _os.mkdir(_os.path.join(self.root.name, "later"))
+        assert not filesystem.has_directory(Path(self.root.name + "/later"))
+
+    def test_mirror_does_not_change_the_real_tree(self):
+        os = FakeOS(filesystem=FakeFilesystem.mirror(self.root.name))
+
+        os.mkdir(self.root.name + "/a/b/c")
+        os.remove(self.root.name + "/a/file")
+        os.rename(self.root.name + "/a", self.root.name + "/d")
+
+        assert sorted(os.listdir(self.root.name + "/d")) == ["b"]
+        assert os.listdir(self.root.name + "/d/b") == ["c"]
+        assert sorted(_os.listdir(self.root.name + "/a")) == ["b", "file"]
+        assert _os.listdir(self.root.name + "/a/b") == []
+
+    def test_walk_loads_mirrored_directories(self):
+        os = FakeOS(filesystem=FakeFilesystem.mirror(self.root.name))
+
+        def walked(walk):
+            return sorted((dirpath, sorted(dirnames), sorted(filenames))
+                          for dirpath, dirnames, filenames in walk)
+
+        assert walked(os.walk(self.root.name)) == \
+            walked(_os.walk(self.root.name))
+
+
+class WalkCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS(filesystem=FakeFilesystemWithPermissions(
+            FakeFilesystem.from_manifest({"a": {"b": {"c": None}, "d": None},
+                                          "e": {}, "f": None})))
+
+    def test_walk_top_down(self):
+        walked = [(dirpath, sorted(dirnames), sorted(filenames))
+                  for dirpath, dirnames, filenames in self.os.walk("/")]
+
+        assert walked[0] == ("/", ["a", "e"], ["f"])
+        assert sorted(walked) == [("/", ["a", "e"], ["f"]),
+                                  ("/a", ["b"], ["d"]),
+                                  ("/a/b", [], ["c"]),
+                                  ("/e", [], [])]
+        assert walked.index(("/a", ["b"], ["d"])) < \
+            walked.index(("/a/b", [], ["c"]))
+
+    def test_walk_bottom_up(self):
+        walked = [dirpath for dirpath, _, _ in self.os.walk("/",
+                                                            topdown=False)]
+
+        assert walked[-1] == "/"
+        assert walked.index("/a/b") < walked.index("/a")
+
+    def test_walk_pruning(self):
+        walked = list()
+        for dirpath, dirnames, _ in self.os.walk("/"):
+            walked.append(dirpath)
+            if "a" in dirnames:
+                dirnames.remove("a")
+
+        assert sorted(walked) == ["/", "/e"]
+
+    def test_walk_relative_path(self):
+        self.os.chdir("/a")
+
+        assert [dirpath for dirpath, _, _ in self.os.walk("b")] == ["b"]
+
+    def test_walk_errors(self):
+        errors = list()
+        assert list(self.os.walk("/missing", onerror=errors.append)) == []
+        assert list(self.os.walk("/f", onerror=errors.append)) == []
+
+        assert [type(error) for error in errors] == [FileNotFoundError,
+                                                     NotADirectoryError]
+
+    def test_walk_without_permission_to_list(self):
+        self.os.chmod("/a", 0o666)
+        self.os.filesystem.set_user(FakeUser(gid=2, uid=2, is_sudoer=False))
+        errors = list()
+
+        assert sorted(dirpath for dirpath, _, _ in
+                      self.os.walk("/", onerror=errors.append)) == ["/", "/e"]
+        assert [type(error) for error in errors] == [PermissionError]
+
+    def test_fwalk_yields_the_directories(self):
+        for dirpath, _, _, directory in self.os.fwalk("/"):
+            assert directory is self.os.filesystem[dirpath]
+
+    def test_walk_is_lazy(self):
+        walk = self.os.walk("/")
+        next(walk)
+        self.os.mkdir("/e/late")
+
+        assert ("/e/late", [], []) in list(walk)
+
+
+class ScandirCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS(filesystem=FakeFilesystemWithPermissions(
+            FakeFilesystem.from_manifest({"a": {"b": None}, "c": None})))
+
+    def test_scandir(self):
+        with self.os.scandir("/") as entries:
+            entries = {entry.name: entry for entry in entries}
+
+        assert sorted(entries) == ["a", "c"]
+        assert entries["a"].path == "/a"
+        assert entries["a"].is_dir() and not entries["a"].is_file()
+        assert entries["c"].is_file() and not entries["c"].is_dir()
+        assert not entries["c"].is_symlink()
+        assert _os.fspath(entries["c"]) == "/c"
+
+    def test_scandir_stat(self):
+        with self.os.open("/c", "wb") as file:
+            file.write(b"hello")
+
+        self.os.chmod("/c", 0o640)
+        entry, = (entry for entry in self.os.scandir("/") if entry.name == "c")
+
+        assert entry.stat().st_size == 5
+        assert entry.stat().st_mode & 0o777 == 0o640
+        assert entry.stat() is entry.stat()
+
+    def test_scandir_relative_path(self):
+        self.os.chdir("/a")
+
+        assert [entry.path for entry in self.os.scandir()] == ["./b"]
+
+    def test_closed_scandir_stops(self):
+        entries = self.os.scandir("/")
+        next(entries)
+        entries.close()
+
+        assert list(entries) == []
+
+    def test_scandir_without_permission(self):
+        self.os.chmod("/a", 0o666)
+        self.os.filesystem.set_user(FakeUser(gid=2, uid=2, is_sudoer=False))
+
+        with self.assertRaises(PermissionError):
+            self.os.scandir("/a")
+
+
 class ChownCase(TestCase):
     @given(text(), integers(), integers())
     def test_chown_to_a_directory(self, path: str, uid: int, gid: int):
@@ -329,6 +801,20 @@ class DeviceCase(TestCase):
 
 
 class RenameCase(TestCase):
+    def test_renaming_to_another_spelling_of_itself(self):
+        os = FakeOS()
+        os.makedirs("/x")
+        with os.open("/x/f", "w") as file:
+            file.write("kept")
+
+        os.chdir("/x")
+        os.rename("f", "/x/f")
+        os.rename("/x/../x/f", "/x/f")
+
+        assert os.listdir("/x") == ["f"]
+        with os.open("/x/f") as file:
+            assert file.read() == "kept"
+
     @given(text(alphabet=ascii_letters, min_size=1),
            text(alphabet=ascii_letters, min_size=1))
     def test_renaming_root_directory(self, old, new):
@@ -426,12 +912,42 @@ class RenameCase(TestCase):
         assert set(os.listdir(a)) == {b, e}
         assert os.listdir(a + "/" + e) == [d]
 
+    @given(text(alphabet=ascii_letters, min_size=1),
+           text(alphabet=ascii_letters, min_size=1),
+           lists(text(alphabet=ascii_letters, min_size=1), min_size=1,
+                 max_size=5))
+    def test_renaming_moves_every_descendant(self, old, new, inside):
+        assume(old != new)
+        os = FakeOS()
+        os.makedirs("/" + old + "/" + "/".join(inside))
+        deepest = os.filesystem["/" + old + "/" + "/".join(inside)]
+
+        os.rename("/" + old, "/" + new)
+
+        assert deepest.path == Path("/" + new + "/" + "/".join(inside))
+        assert os.filesystem["/" + new + "/" + "/".join(inside)] is deepest
+        assert not os.filesystem.has(Path("/" + old + "/" + inside[0]))
+
     @given(text(alphabet=ascii_letters, min_size=1))
     def test_renaming_to_the_same_thing(self, path):
         os = FakeOS()
         os.mkdir(path)
         os.rename(path, path)
 
+    @given(text(alphabet=ascii_letters, min_size=1),
+           lists(text(alphabet=ascii_letters, min_size=1), min_size=1,
+                 max_size=3))
+    def test_renaming_into_itself(self, name, inside):
+        os = FakeOS()
+        os.makedirs("/" + name + "/b")
+
+        with self.assertRaises(OSError) as raised:
+            os.rename("/" + name, "/" + name + "/" + "/".join(inside))
+
+        assert raised.exception.errno == errno.EINVAL
+        assert os.listdir("/") == [name]
+        assert os.listdir("/" + name) == ["b"]
+
 
 class AccessCase(TestCase):
     def test_access_when_root(self):
@@ -650,6 +1166,168 @@ class PermissionsCase(TestCase):
             os.listdir("/")
 
 
+class SearchPermissionCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS(filesystem=FakeFilesystemWithPermissions(
+            FakeFilesystem.from_manifest({"a": {"b": {"c": None}}})))
+        self.user = FakeUser(gid=2, uid=2, is_sudoer=False)
+        self.os.filesystem.set_user(self.user)
+
+    def test_every_ancestor_must_be_searchable(self):
+        self.os.filesystem.set_user(Root())
+        self.os.chmod("/a", 0o666)
+        self.os.filesystem.set_user(self.user)
+
+        for operation in (lambda: self.os.stat("/a/b/c"),
+                          lambda: self.os.listdir("/a/b"),
+                          lambda: self.os.open("/a/b/c", "rb"),
+                          lambda: self.os.remove("/a/b/c"),
+                          lambda: self.os.mkdir("/a/b/d")):
+            with self.assertRaises(PermissionError):
+                operation()
+
+        assert self.os.stat("/a").st_mode & 0o777 == 0o666
+
+    def test_access_needs_every_ancestor_to_be_searchable(self):
+        self.os.filesystem.set_user(Root())
+        self.os.chmod("/a", 0o600)
+        self.os.filesystem.set_user(self.user)
+
+        assert self.os.access("/a", FakeOS.F_OK)
+        assert not self.os.access("/a/b/c", FakeOS.F_OK)
+        assert not self.os.access("/a/b", FakeOS.R_OK)
+
+    def test_chdir_needs_the_directory_to_be_searchable(self):
+        self.os.filesystem.set_user(Root())
+        self.os.chmod("/a", 0o600)
+        self.os.filesystem.set_user(self.user)
+
+        cwd = self.os.getcwd()
+        for path in ("/a/b", "/a"):
+            with self.assertRaises(PermissionError):
+                self.os.chdir(path)
+
+        assert self.os.getcwd() == cwd
+
+    def test_chmod_invalidates_the_subtree(self):
+        assert self.os.listdir("/a/b") == ["c"]
+
+        self.os.chmod("/a", 0o666)
+
+        with self.assertRaises(PermissionError):
+            self.os.listdir("/a/b")
+
+        self.os.filesystem.set_user(Root())
+        self.os.chmod("/a", 0o777)
+        self.os.filesystem.set_user(self.user)
+
+        assert self.os.listdir("/a/b") == ["c"]
+
+    def test_chown_invalidates_the_subtree(self):
+        self.os.chmod("/a", 0o700)
+        self.os.filesystem.set_user(Root())
+        self.os.chown("/a", uid=2)
+        self.os.filesystem.set_user(self.user)
+
+        assert self.os.listdir("/a/b") == ["c"]
+
+        self.os.chown("/a", uid=3)
+
+        with self.assertRaises(PermissionError):
+            self.os.listdir("/a/b")
+
+    def test_rename_invalidates_the_subtree(self):
+        assert self.os.listdir("/a/b") == ["c"]
+
+        self.os.filesystem.set_user(Root())
+        self.os.makedirs("/d/b", mode=0o777)
+        self.os.chmod("/d", 0o666)
+        self.os.rename("/a", "/old")
+        self.os.rename("/d", "/a")
+        self.os.filesystem.set_user(self.user)
+
+        with self.assertRaises(PermissionError):
+            self.os.listdir("/a/b")
+
+    def test_switching_users(self):
+        self.os.filesystem.set_user(Root())
+        self.os.chmod("/a", 0o700)
+        self.os.chown("/a", uid=2, gid=2)
+        self.os.filesystem.set_user(self.user)
+
+        assert self.os.listdir("/a/b") == ["c"]
+
+        self.os.setuid(3)
+
+        with self.assertRaises(PermissionError):
+            self.os.listdir("/a/b")
+
+
+class ResolveCase(TestCase):
+    def setUp(self):
+        self.inner = FakeFilesystem.from_manifest(
+            {"a": {"b": {"c": None}}, "d": None})
+        self.os = FakeOS(filesystem=FakeFilesystemWithPermissions(self.inner))
+        self.os.filesystem.set_user(FakeUser(gid=2, uid=2, is_sudoer=False))
+        self.resolved = list()
+        key = self.inner._key
+
+        def counting_key(path):
+            self.resolved.append(path)
+            return key(path)
+
+        self.inner._key = counting_key
+
+    def test_every_call_resolves_its_path_once(self):
+        operations = (
+            lambda: self.os.stat("/a/b/c"),
+            lambda: self.os.listdir("/a/b"),
+            lambda: list(self.os.scandir("/a")),
+            lambda: self.os.open("/a/b/c", "rb").close(),
+            lambda: self.os.open("/a/b/e", "wb").close(),
+            lambda: self.os.truncate("/a/b/e", 3),
+            lambda: self.os.chmod("/a/b/e", 0o600),
+            lambda: self.os.chown("/a/b/e", 2, 2),
+            lambda: self.os.access("/a/b/e", FakeOS.R_OK),
+            lambda: self.os.remove("/a/b/e"),
+            lambda: self.os.mkdir("/a/f"),
+            lambda: self.os.rmdir("/a/f"),
+            lambda: self.os.makedirs("/a/g/h/i"),
+            lambda: list(self.os.walk("/a")),
+            lambda: self.os.chdir("/a/b"))
+        for operation in operations:
+            self.resolved.clear()
+            operation()
+
+            assert len(self.resolved) == 1
+
+    def test_rename_resolves_both_paths_once(self):
+        self.os.rename("/a/b/c", "/a/c")
+
+        assert len(self.resolved) == 2
+
+    def test_handle(self):
+        handle = self.inner.resolve(Path("/a/b/../b/c"))
+
+        assert handle.key == "/a/b/c"
+        assert handle.target is self.inner[Path("/a/b/c")]
+        assert handle.parent is self.inner[Path("/a/b")]
+        assert self.inner.resolve(handle) is handle
+
+    def test_handle_of_a_missing_path(self):
+        handle = self.inner.resolve(Path("/a/missing"))
+
+        assert handle.target is None
+        assert handle.parent is self.inner[Path("/a")]
+
+    def test_missing_path_is_not_found_after_checking_permissions(self):
+        with self.assertRaises(FileNotFoundError):
+            self.os.chmod("/a/missing", 0o600)
+
+        with self.assertRaises(FileNotFoundError):
+            self.os.rename("/a/missing", "/a/other")
+
+
 class UserAndGroupCase(TestCase):
     @given(integers())
     def test_gid(self, gid: int):
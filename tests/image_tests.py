@@ -0,0 +1,148 @@
+import multiprocessing
+from pathlib import Path
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import binary, dictionaries, text
+
+from fakeos import FakeOS
+from filesystem import FakeFilesystem
+from image import FakeImage
+
+NAMES = text(min_size=1).filter(lambda name: "/" not in name and
+                                name not in (".", ".."))
+
+
+def build():
+    """Return a FakeOS holding a small tree."""
+    os = FakeOS(filesystem=FakeFilesystem.from_manifest(
+        {"etc": {"hosts": None}, "tmp": {}, "usr": {"lib": {"a": None}}}))
+    with os.open("/etc/hosts", "wb") as file:
+        file.write(b"127.0.0.1 localhost")
+
+    os.chmod("/usr/lib", 0o750)
+    os.chown("/usr/lib", 3, 4)
+    return os
+
+
+def walked(os):
+    return [(dirpath, sorted(dirnames), sorted(filenames))
+            for dirpath, dirnames, filenames in os.walk("/")]
+
+
+class ImageCase(TestCase):
+    def setUp(self):
+        self.os = build()
+        self.image = FakeImage(self.os.filesystem.image())
+
+    def test_image_holds_the_tree(self):
+        os = FakeOS(filesystem=FakeFilesystem.from_image(self.image))
+
+        assert walked(os) == walked(self.os)
+        for path in ("/", "/usr/lib", "/etc/hosts"):
+            stat, original = os.stat(path), self.os.stat(path)
+            assert stat[:1] + stat[2:] == original[:1] + original[2:]
+
+        assert os.stat("/usr/lib").st_uid == 3
+        assert os.stat("/usr/lib").st_mode & 0o777 == 0o750
+        assert os.stat("/etc/hosts").st_size == 19
+        with os.open("/etc/hosts", "rb") as file:
+            assert file.read() == b"127.0.0.1 localhost"
+
+    def test_image_is_loaded_lazily(self):
+        filesystem = FakeFilesystem.from_image(self.image)
+
+        assert len(list(filesystem._index.items())) == 1
+
+        list(filesystem.listdir(Path("/usr")))
+
+        assert len(list(filesystem._index.items())) == 5
+
+    def test_changes_stay_in_the_filesystem(self):
+        first = FakeOS(filesystem=FakeFilesystem.from_image(self.image))
+        second = FakeOS(filesystem=FakeFilesystem.from_image(self.image))
+
+        first.rename("/usr/lib", "/usr/lib64")
+        with first.open("/etc/hosts", "ab") as file:
+            file.write(b" first")
+
+        assert second.listdir("/usr") == ["lib"]
+        with second.open("/etc/hosts", "rb") as file:
+            assert file.read() == b"127.0.0.1 localhost"
+
+    def test_image_of_a_subtree(self):
+        image = FakeImage(self.os.filesystem.image(Path("/usr")))
+        os = FakeOS(filesystem=FakeFilesystem.from_image(image))
+
+        assert os.listdir("/usr/lib") == ["a"]
+        assert not os.filesystem.has(Path("/etc"))
+
+    def test_sparse_files_keep_their_holes(self):
+        with self.os.open("/sparse", "wb") as file:
+            file.truncate(100 * 2 ** 30)
+            file.seek(50 * 2 ** 30)
+            file.write(b"middle")
+
+        image = self.os.filesystem.image()
+
+        assert len(image) < 2 ** 20
+
+        os = FakeOS(filesystem=FakeFilesystem.from_image(FakeImage(image)))
+
+        assert os.stat("/sparse").st_size == 100 * 2 ** 30
+        assert len(os.filesystem.image()) == len(image)
+        with os.open("/sparse", "rb") as file:
+            file.seek(50 * 2 ** 30 - 1)
+            assert file.read(8) == b"\0middle\0"
+            assert file.file_object.contents.allocated == 6
+
+    def test_not_an_image(self):
+        with self.assertRaises(ValueError):
+            FakeImage(bytes(64))
+
+    @given(dictionaries(NAMES, binary(), max_size=20))
+    def test_round_trip(self, files):
+        os = FakeOS()
+        os.mkdir("/")
+        for name, data in files.items():
+            with os.open("/" + name, "wb") as file:
+                file.write(data)
+
+        copy = FakeOS(filesystem=FakeFilesystem.from_image(
+            FakeImage(os.filesystem.image())))
+
+        assert sorted(copy.listdir("/")) == sorted(files)
+        for name, data in files.items():
+            with copy.open("/" + name, "rb") as file:
+                assert file.read() == data
+
+
+def list_shared(name, queue):
+    os = FakeOS(filesystem=FakeFilesystem.attach(name))
+    queue.put(walked(os))
+
+
+class SharedImageCase(TestCase):
+    def setUp(self):
+        self.os = build()
+        self.memory = self.os.filesystem.share()
+        self.addCleanup(self.memory.unlink)
+        self.addCleanup(self.memory.close)
+
+    def test_attach(self):
+        os = FakeOS(filesystem=FakeFilesystem.attach(self.memory.name))
+
+        assert walked(os) == walked(self.os)
+
+    def test_attach_from_another_process(self):
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        process = context.Process(target=list_shared,
+                                  args=(self.memory.name, queue))
+        process.start()
+        listing = queue.get(timeout=30)
+        process.join(timeout=30)
+
+        assert listing == walked(self.os)
+        assert process.exitcode == 0
+        assert bytes(self.memory.buf[:8]).startswith(b"FAKEOS")
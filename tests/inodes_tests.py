@@ -0,0 +1,135 @@
+from stat import S_ISDIR, S_ISREG
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import integers, lists
+
+from fakeos import FakeOS
+from filesystem import FakeFilesystem
+from inodes import InodeTable
+
+
+class InodeTableCase(TestCase):
+    @given(lists(integers(min_value=0, max_value=2 ** 62), min_size=1,
+                 max_size=3000))
+    def test_rows_keep_their_values(self, values):
+        table = InodeTable()
+        inos = [table.allocate(value, value, value, value) for value in values]
+
+        assert inos == list(range(1, len(values) + 1))
+        for ino, value in zip(inos, values):
+            assert table.row(ino) == (value,) * 4
+
+    def test_frozen_pages_are_copied_on_write(self):
+        table = InodeTable()
+        ino = table.allocate(1, 2, 3, 4)
+        frozen = InodeTable(*table.freeze())
+
+        table[ino, "mtime"] = 30
+
+        assert table.row(ino) == (1, 2, 30, 4)
+        assert frozen.row(ino) == (1, 2, 3, 4)
+
+    def test_missing_inode(self):
+        table = InodeTable()
+
+        with self.assertRaises(KeyError):
+            table.row(1)
+
+        with self.assertRaises(KeyError):
+            table.row(0)
+
+
+class StatCase(TestCase):
+    def setUp(self):
+        self.now = 10 ** 9
+        filesystem = FakeFilesystem()
+        filesystem.clock = lambda: self.now
+        self.os = FakeOS(filesystem=filesystem)
+        self.os.mkdir("/")
+
+    def test_stat_a_file(self):
+        with self.os.open("/file", "wb") as file:
+            file.write(b"hello")
+
+        self.os.chmod("/file", 0o640)
+        stat = self.os.stat("/file")
+
+        assert S_ISREG(stat.st_mode)
+        assert stat.st_mode & 0o777 == 0o640
+        assert stat.st_size == 5
+        assert stat.st_nlink == 1
+        assert stat.st_mtime_ns == 10 ** 9
+        assert stat.st_mtime == 1
+
+    def test_stat_a_directory(self):
+        self.os.mkdir("/a")
+        self.os.mkdir("/a/b")
+        self.os.mkdir("/a/c")
+        self.os.open("/a/file", "wb").close()
+
+        stat = self.os.stat("/a")
+
+        assert S_ISDIR(stat.st_mode)
+        assert stat.st_nlink == 4
+
+        self.os.rmdir("/a/c")
+
+        assert self.os.stat("/a").st_nlink == 3
+
+    def test_inode_numbers_are_unique(self):
+        self.os.mkdir("/a")
+        self.os.open("/b", "wb").close()
+
+        inodes = {self.os.stat(path).st_ino for path in ("/", "/a", "/b")}
+
+        assert len(inodes) == 3 and 0 not in inodes
+
+    def test_renaming_keeps_the_inode(self):
+        self.os.open("/a", "wb").close()
+        ino = self.os.stat("/a").st_ino
+        self.os.rename("/a", "/b")
+
+        assert self.os.stat("/b").st_ino == ino
+
+    def test_timestamps(self):
+        self.os.mkdir("/a")
+        self.now = 2 * 10 ** 9
+        with self.os.open("/a/file", "wb") as file:
+            self.now = 3 * 10 ** 9
+            file.write(b"hello")
+
+        assert self.os.stat("/a").st_mtime_ns == 2 * 10 ** 9
+        assert self.os.stat("/a/file").st_atime_ns == 2 * 10 ** 9
+        assert self.os.stat("/a/file").st_mtime_ns == 3 * 10 ** 9
+
+        self.now = 4 * 10 ** 9
+        self.os.chmod("/a/file", 0o600)
+
+        assert self.os.stat("/a/file").st_mtime_ns == 3 * 10 ** 9
+        assert self.os.stat("/a/file").st_ctime_ns == 4 * 10 ** 9
+
+    def test_fstat(self):
+        with self.os.open("/file", "w") as file:
+            file.write("hello")
+            file.flush()
+
+            assert self.os.fstat(file).st_size == 5
+
+    def test_lstat(self):
+        self.os.mkdir("/a")
+
+        assert self.os.lstat("/a") == self.os.stat("/a")
+
+    def test_stat_a_non_existent_file(self):
+        with self.assertRaises(FileNotFoundError):
+            self.os.stat("/missing")
+
+    def test_fork_has_its_own_timestamps(self):
+        self.os.open("/file", "wb").close()
+        forked = FakeOS(filesystem=self.os.filesystem.fork())
+        self.now = 2 * 10 ** 9
+        forked.chmod("/file", 0o600)
+
+        assert self.os.stat("/file").st_ctime_ns == 10 ** 9
+        assert forked.stat("/file").st_ctime_ns == 2 * 10 ** 9
@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import dictionaries, text, integers
+
+from layers import LayeredDict
+
+
+class LayeredDictCase(TestCase):
+    @given(dictionaries(text(), integers()))
+    def test_frozen_layers_are_not_changed(self, items):
+        layered = LayeredDict()
+        for key, value in items.items():
+            layered[key] = value
+
+        layers = layered.freeze()
+        for key in items:
+            layered[key] = None
+            del layered[key]
+
+        assert dict(LayeredDict(layers).items()) == items
+        assert dict(layered.items()) == dict()
+
+    def test_owns(self):
+        layered = LayeredDict()
+        layered["a"] = 1
+        assert layered.owns("a")
+
+        layered.freeze()
+        assert not layered.owns("a")
+        assert layered["a"] == 1
+
+        layered["a"] = 2
+        assert layered.owns("a")
+
+    def test_deleting_a_frozen_key(self):
+        layered = LayeredDict()
+        layered["a"] = 1
+        layered.freeze()
+
+        assert layered.pop("a") == 1
+        assert "a" not in layered
+        assert layered.get("a") is None
+
+        with self.assertRaises(KeyError):
+            del layered["a"]
+
+    def test_layers_are_compacted(self):
+        layered = LayeredDict()
+        for value in range(LayeredDict.MAX_LAYERS + 1):
+            layered[value] = value
+            layered.freeze()
+
+        assert len(layered.layers) == 1
+        assert dict(layered.items()) == {value: value for value in
+                                         range(LayeredDict.MAX_LAYERS + 1)}
+
+    def test_compacting_leaves_big_layers_alone(self):
+        layered = LayeredDict()
+        for value in range(1000):
+            layered[value] = value
+
+        layered.freeze()
+        base = layered.layers[-1]
+        del layered[0]
+        for value in range(1, LayeredDict.MAX_LAYERS + 1):
+            layered[value] = -value
+            layered.freeze()
+
+        assert layered.layers[-1] is base
+        assert len(layered.layers) == 2
+        assert 0 not in layered
+        assert layered[1] == -1
+        assert layered[999] == 999
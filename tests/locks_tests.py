@@ -0,0 +1,219 @@
+import copy
+import os as _os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase
+
+from fakeos import FakeOS
+from filesystem import FakeFilesystem, FakeFilesystemWithLocks, \
+    FakeFilesystemWithPermissions
+from locks import ReadWriteLock
+
+
+def run(*targets):
+    """Run every target in a thread of its own and return their errors."""
+    errors = list()
+
+    def guarded(target):
+        try:
+            target()
+
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append(error)
+
+    threads = [threading.Thread(target=guarded, args=(target,))
+               for target in targets]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join(timeout=30)
+
+    return errors
+
+
+class ReadWriteLockCase(TestCase):
+    def setUp(self):
+        self.lock = ReadWriteLock()
+
+    def test_readers_do_not_wait_for_each_other(self):
+        barrier = threading.Barrier(4, timeout=5)
+
+        def read():
+            with self.lock.reading():
+                barrier.wait()
+
+        assert run(*[read] * 4) == []
+
+    def test_writer_waits_for_readers(self):
+        written = threading.Event()
+
+        def write():
+            with self.lock.writing():
+                written.set()
+
+        with self.lock.reading():
+            thread = threading.Thread(target=write)
+            thread.start()
+
+            assert not written.wait(0.1)
+
+        assert written.wait(5)
+        thread.join()
+
+    def test_waiting_writer_keeps_new_readers_out(self):
+        events = list()
+        writing = threading.Event()
+
+        def write():
+            writing.set()
+            with self.lock.writing():
+                events.append("write")
+
+        def read():
+            with self.lock.reading():
+                events.append("read")
+
+        with self.lock.reading():
+            writer = threading.Thread(target=write)
+            writer.start()
+            writing.wait(5)
+            while not self.lock._waiting:
+                pass
+
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(0.1)
+
+            assert events == []
+
+        writer.join(5)
+        reader.join(5)
+
+        assert events == ["write", "read"]
+
+    def test_reentrance(self):
+        with self.lock.writing():
+            with self.lock.writing():
+                with self.lock.reading():
+                    pass
+
+        with self.lock.reading():
+            with self.lock.reading():
+                with self.assertRaises(RuntimeError):
+                    self.lock.acquire_write()
+
+        with self.lock.writing():
+            pass
+
+
+class ThreadSafeFilesystemCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS(filesystem=FakeFilesystemWithLocks(
+            FakeFilesystemWithPermissions(FakeFilesystem())))
+        self.os.mkdir("/")
+
+    def test_concurrent_changes_and_listings(self):
+        def change(name):
+            def target():
+                for index in range(200):
+                    self.os.makedirs("/%s/%d" % (name, index))
+                    self.os.rename("/%s/%d" % (name, index),
+                                   "/%s/moved%d" % (name, index))
+                    self.os.rmdir("/%s/moved%d" % (name, index))
+
+            return target
+
+        def read():
+            for _ in range(200):
+                for _ in self.os.walk("/"):
+                    pass
+
+                self.os.listdir("/")
+                self.os.access("/", FakeOS.R_OK)
+
+        assert run(change("a"), change("b"), read, read) == []
+        assert sorted(self.os.listdir("/")) == ["a", "b"]
+        assert self.os.listdir("/a") == []
+        assert self.os.stat("/a").st_nlink == 2
+
+    def test_mirrored_directory_is_loaded_once(self):
+        with tempfile.TemporaryDirectory() as root:
+            names = {str(index) for index in range(200)}
+            for name in names:
+                open(_os.path.join(root, name), "wb").close()
+
+            os = FakeOS(filesystem=FakeFilesystemWithLocks(
+                FakeFilesystem.mirror(Path(root))))
+            listings = list()
+
+            def read():
+                listings.append(os.listdir(root))
+
+            assert run(*[read] * 8) == []
+            assert all(set(listing) == names for listing in listings)
+            assert len(os.filesystem[Path(root)].children) == len(names)
+
+    def test_reading_while_appending(self):
+        with self.os.open("/log", "wb") as log:
+            log.write(b"line\n")
+
+        appended = threading.Event()
+
+        def append():
+            try:
+                with self.os.open("/log", "ab") as log:
+                    for _ in range(5000):
+                        log.write(b"line\n")
+
+            finally:
+                appended.set()
+
+        def read():
+            while not appended.is_set():
+                with self.os.open("/log", "rb") as log:
+                    while log.read(64):
+                        pass
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        assert run(append, read, read, read) == []
+        assert self.os.stat("/log").st_size == 5001 * len(b"line\n")
+
+    def test_permissions_checked_outside_the_lock(self):
+        os = FakeOS(filesystem=FakeFilesystemWithPermissions(
+            FakeFilesystemWithLocks(FakeFilesystem())))
+        os.mkdir("/")
+
+        def churn():
+            for _ in range(500):
+                for call, args in ((os.mkdir, ("/a",)),
+                                   (os.rename, ("/a", "/b")),
+                                   (os.rmdir, ("/b",))):
+                    try:
+                        call(*args)
+
+                    except OSError:
+                        pass
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        assert run(*[churn] * 8) == []
+        assert os.stat("/").st_nlink == 2 + len(os.listdir("/"))
+
+    def test_deepcopy(self):
+        filesystem = FakeFilesystem()
+        os = FakeOS(filesystem=filesystem)
+        os.makedirs("/a/b")
+
+        copied = FakeOS(filesystem=copy.deepcopy(filesystem))
+        copied.mkdir("/a/c")
+
+        assert os.listdir("/a") == ["b"]
+        assert sorted(copied.listdir("/a")) == ["b", "c"]
@@ -0,0 +1,113 @@
+import copy
+from pathlib import Path
+from string import ascii_letters
+from unittest import TestCase
+
+from hypothesis import given
+from hypothesis.strategies import text, lists
+
+from fakeos import FakeOS
+from resolver import PathResolver, parent_of, name_of, child_of
+
+
+class PathResolverCase(TestCase):
+    def test_absolute_path(self):
+        resolver = PathResolver(cwd=Path("/somewhere"))
+
+        assert resolver.key(Path("/a/b")) == "/a/b"
+        assert resolver.key("/a/b/") == "/a/b"
+
+    def test_relative_path(self):
+        resolver = PathResolver(cwd=Path("/somewhere"))
+
+        assert resolver.key(Path("a/b")) == "/somewhere/a/b"
+        assert resolver.key(".") == "/somewhere"
+
+    def test_dots_are_collapsed(self):
+        resolver = PathResolver(cwd=Path("/x/y"))
+
+        assert resolver.key("a/./b/../c") == "/x/y/a/c"
+        assert resolver.key("../..") == "/"
+        assert resolver.key("/../..") == "/"
+
+    def test_changing_cwd_invalidates_keys(self):
+        resolver = PathResolver(cwd=Path("/x"))
+        assert resolver.key("a") == "/x/a"
+
+        resolver.cwd = Path("y")
+
+        assert resolver.cwd == Path("/x/y")
+        assert resolver.key("a") == "/x/y/a"
+
+    def test_deepcopy_resolves_against_its_own_cwd(self):
+        resolver = PathResolver(cwd=Path("/x"))
+        assert resolver.key("a") == "/x/a"
+
+        copied = copy.deepcopy(resolver)
+        copied.cwd = Path("/y")
+
+        assert copied.key("a") == "/y/a"
+        assert resolver.key("a") == "/x/a"
+
+    def test_deepcopied_filesystem_follows_its_own_chdir(self):
+        os = FakeOS()
+        os.makedirs("/a/b")
+        copied = FakeOS(filesystem=copy.deepcopy(os.filesystem))
+
+        copied.chdir("/a")
+
+        assert copied.listdir(".") == ["b"]
+        assert os.getcwd() != "/a"
+
+    def test_keys_are_interned(self):
+        resolver = PathResolver(cwd=Path("/"))
+
+        assert resolver.key("/a/b") is resolver.key("a/../a/b")
+
+    def test_cache_is_bounded(self):
+        resolver = PathResolver(cwd=Path("/"), cache_size=2)
+        for name in "abcdef":
+            resolver.key(name)
+
+        assert resolver._canonical.cache_info().currsize == 2
+
+    @given(lists(text(alphabet=ascii_letters, min_size=1), min_size=1))
+    def test_key_helpers(self, names):
+        key = "/" + "/".join(names)
+
+        assert child_of(parent_of(key), name_of(key)) == key
+        assert name_of(key) == names[-1]
+
+
+class WorkingDirectoryCase(TestCase):
+    @given(text(alphabet=ascii_letters, min_size=1),
+           text(alphabet=ascii_letters, min_size=1))
+    def test_relative_paths_follow_chdir(self, directory, inside):
+        os = FakeOS(cwd=Path("/"))
+        os.mkdir("/")
+        os.mkdir(directory)
+        os.chdir(directory)
+        os.mkdir(inside)
+
+        assert os.getcwd() == "/" + directory
+        assert os.listdir(".") == [inside]
+        assert os.listdir("/" + directory) == [inside]
+        assert os.listdir("..") == [directory]
+
+    def test_only_relative_paths_may_skip_a_missing_cwd(self):
+        os = FakeOS(cwd=Path("/missing"))
+        os.mkdir("relative")
+
+        with self.assertRaises(FileNotFoundError):
+            os.mkdir("/missing/absolute")
+
+        with self.assertRaises(FileNotFoundError):
+            os.open("/missing/file", "w")
+
+        with self.assertRaises(FileNotFoundError):
+            os.filesystem.populate([("/missing/entry", "file")])
+
+        os.filesystem.populate([("entry", "file")])
+
+        assert os.filesystem.has_directory(Path("/missing/relative"))
+        assert os.filesystem.has_file(Path("/missing/entry"))
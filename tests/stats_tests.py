@@ -0,0 +1,128 @@
+import threading
+from collections import Counter
+from unittest import TestCase
+
+from fakeos import FakeOS
+from filesystem import FakeFilesystem, FakeFilesystemWithLocks, \
+    FakeFilesystemWithPermissions
+from stats import CallStats
+
+
+class CallStatsCase(TestCase):
+    def test_record(self):
+        stats = CallStats()
+        stats.record("access", ["/a"], 1000)
+        stats.record("access", ["/a"], 3000)
+        stats.record("access", ["/b"], 1500)
+
+        access = stats.stats()["access"]
+
+        assert access.calls == 3
+        assert access.paths == Counter({"/a": 2, "/b": 1})
+        assert access.histogram == {1024: 1, 2048: 1, 4096: 1}
+        assert access.nanoseconds == 5500
+
+        stats.reset()
+
+        assert stats.stats() == {}
+
+
+class FakeOSStatsCase(TestCase):
+    def setUp(self):
+        self.os = FakeOS()
+        self.os.mkdir("/")
+
+    def test_disabled_by_default(self):
+        self.os.mkdir("/a")
+
+        assert self.os.stats() == {}
+        assert "mkdir" not in vars(self.os)
+
+    def test_enable_reset_and_disable(self):
+        self.os.enable_stats()
+        for name in "abc":
+            self.os.mkdir("/" + name)
+            self.os.access("/" + name, FakeOS.R_OK)
+
+        self.os.rename("/a", "/d")
+
+        stats = self.os.stats()
+
+        assert stats["mkdir"].calls == stats["access"].calls == 3
+        assert stats["rename"].paths == Counter({"/a": 1, "/d": 1})
+        assert sum(stats["access"].histogram.values()) == 3
+
+        self.os.reset_stats()
+        self.os.listdir("/")
+
+        assert list(self.os.stats()) == ["listdir"]
+
+        self.os.disable_stats()
+        self.os.listdir("/")
+
+        assert self.os.stats()["listdir"].calls == 1
+        assert "listdir" not in vars(self.os)
+
+    def test_measure(self):
+        self.os.enable_stats()
+        self.os.mkdir("/a")
+        with self.os.measure() as outer:
+            self.os.mkdir("/b")
+            with self.os.measure() as inner:
+                self.os.listdir("/")
+
+        self.os.listdir("/")
+
+        assert outer.stats()["mkdir"].calls == 1
+        assert outer.stats()["listdir"].calls == 1
+        assert list(inner.stats()) == ["listdir"]
+        assert self.os.stats()["mkdir"].calls == 2
+        assert self.os.stats()["listdir"].calls == 2
+
+    def test_only_the_outermost_call_is_recorded(self):
+        with self.os.open("/file", "w"):
+            pass
+
+        with self.os.measure() as stats:
+            self.os.unlink("/file")
+
+        assert list(stats.stats()) == ["unlink"]
+
+    def test_generators_are_recorded_once(self):
+        self.os.makedirs("/a/b/c")
+        with self.os.measure() as stats:
+            steps = list(self.os.walk("/"))
+
+        assert len(steps) == 4
+        assert stats.stats()["walk"].calls == 1
+        assert stats.stats()["walk"].paths == Counter({"/": 1})
+
+    def test_errors_are_recorded(self):
+        with self.os.measure() as stats:
+            with self.assertRaises(FileNotFoundError):
+                self.os.rmdir("/missing")
+
+        assert stats.stats()["rmdir"].calls == 1
+
+    def test_calls_from_several_threads_are_all_recorded(self):
+        os = FakeOS(filesystem=FakeFilesystemWithLocks(
+            FakeFilesystemWithPermissions(FakeFilesystem())))
+        os.mkdir("/")
+
+        def work(thread):
+            for index in range(500):
+                os.mkdir("/%d-%d" % (thread, index))
+                os.access("/%d-%d" % (thread, index), FakeOS.R_OK)
+                os.rmdir("/%d-%d" % (thread, index))
+
+        with os.measure() as stats:
+            threads = [threading.Thread(target=work, args=(thread,))
+                       for thread in range(8)]
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        assert sum(operation.calls
+                   for operation in stats.stats().values()) == 8 * 500 * 3